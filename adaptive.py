@@ -0,0 +1,132 @@
+"""Evaluate several row checks in an order learned while scanning.
+
+The filters left for an `NEODatabase` to check row by row are ANDed together,
+so the best order runs first the checks that are cheap and that reject many
+rows. That order depends on the data, not on the order of the command-line
+options, so an `AdaptiveChecks` learns it:
+
+- On a sample of `SAMPLE_SIZE` rows, every check is evaluated and timed, and
+  its pass rate is recorded.
+- The checks are then ordered by their cost per rejected row - the time of a
+  call divided by the fraction of rows it rejects - and evaluated in that
+  order, stopping at the first failure, for the next `RESAMPLE_INTERVAL` rows.
+- Another sample is taken after that, so the order follows any shift in the
+  distribution of the data during a long scan.
+
+Each order is kept in `history`, and logged at the DEBUG level (the main
+module's `--debug` option prints it).
+"""
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# The number of rows on which every check is evaluated and timed.
+SAMPLE_SIZE = 256
+
+# The number of rows checked in a learned order before sampling again.
+RESAMPLE_INTERVAL = 65536
+
+
+class AdaptiveChecks:
+    """A conjunction of predicates on row IDs that reorders itself.
+
+    An `AdaptiveChecks` is a 1-argument callable on a row ID, which returns
+    whether every check passes on that row.
+    """
+
+    def __init__(self, checks, labels, sample_size=SAMPLE_SIZE,
+                 interval=RESAMPLE_INTERVAL):
+        """Create a new `AdaptiveChecks`.
+
+        :param checks: A collection of 1-argument callables on a row ID.
+        :param labels: A description of each check, for the history.
+        :param sample_size: The number of rows in each sample.
+        :param interval: The number of rows between two samples.
+        """
+        self.checks = list(checks)
+        self.labels = list(labels)
+        self.sample_size = sample_size
+        self.interval = interval
+        # The checks in their current order.
+        self.ordered = list(self.checks)
+        # One `(rows, labels, pass_rates, costs)` tuple per learned order:
+        # the number of rows checked before it, the labels in order, and the
+        # pass rate and seconds per call of each check, in the same order.
+        self.history = []
+        self.rows = 0
+        self._start_sample()
+
+    def _start_sample(self):
+        """Start evaluating every check on the next rows."""
+        self._sampling = True
+        self._countdown = self.sample_size
+        self._passed = [0] * len(self.checks)
+        self._seconds = [0.0] * len(self.checks)
+
+    def _end_phase(self):
+        """Switch between sampling and checking in the learned order."""
+        if not self._sampling:
+            self.rows += self.interval
+            self._start_sample()
+            return
+
+        self.rows += self.sample_size
+        pass_rates = [passed / self.sample_size for passed in self._passed]
+        costs = [seconds / self.sample_size for seconds in self._seconds]
+
+        def rank(position):
+            rejected = 1 - pass_rates[position]
+            if rejected <= 0:
+                return float('inf'), costs[position]
+            return costs[position] / rejected, costs[position]
+
+        order = sorted(range(len(self.checks)), key=rank)
+        self.ordered = [self.checks[position] for position in order]
+        self.history.append((self.rows,
+                             [self.labels[position] for position in order],
+                             [pass_rates[position] for position in order],
+                             [costs[position] for position in order]))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Checking in this order after %d rows: %s",
+                         self.rows, describe_order(*self.history[-1][1:]))
+        self._sampling = False
+        self._countdown = self.interval
+
+    def __call__(self, row):
+        """Return whether every check passes on a row."""
+        self._countdown -= 1
+        if self._countdown < 0:
+            self._end_phase()
+            self._countdown -= 1
+
+        if not self._sampling:
+            for check in self.ordered:
+                if not check(row):
+                    return False
+            return True
+
+        result = True
+        clock = time.perf_counter
+        for position, check in enumerate(self.checks):
+            start = clock()
+            passed = check(row)
+            self._seconds[position] += clock() - start
+            if passed:
+                self._passed[position] += 1
+            else:
+                result = False
+        return result
+
+
+def describe_order(labels, pass_rates, costs):
+    """Describe an order of checks on one line.
+
+    :param labels: The labels of the checks, in order.
+    :param pass_rates: The fraction of sampled rows passing each check.
+    :param costs: The seconds per call of each check.
+    :return: A string such as `distance <= 0.1 (passes 3%, 0.21us)`.
+    """
+    return ', '.join(f"{label} (passes {rate:.0%}, {cost * 1e6:.2f}us)"
+                     for label, rate, cost in zip(labels, pass_rates, costs))
@@ -0,0 +1,209 @@
+"""Summarize streams of close approaches without collecting them.
+
+The `Accumulator` class folds close approaches one at a time into counts,
+minimum, maximum and mean distances and velocities, and the set of distinct
+NEOs. The `summarize` function keeps one accumulator per group, keyed by one
+of the functions in `GROUP_KEYS`, and makes a single pass over a stream of
+matching approaches. The `summarize_rows` function does the same over rows of
+`columns.ApproachColumns`, reading the columns without building any
+`CloseApproach`.
+
+The main module uses these results for the `stats` subcommand.
+"""
+from datetime import date
+import math
+
+
+# The metrics an `Accumulator` can report, in display order.
+METRICS = ('count', 'neos',
+           'min_distance', 'mean_distance', 'max_distance',
+           'min_velocity', 'mean_velocity', 'max_velocity')
+
+# How to compute a group from the day ordinal of an approach.
+DAY_GROUPS = {
+    'day': date.fromordinal,
+    'month': lambda day: '{0.year:04d}-{0.month:02d}'.format(
+        date.fromordinal(day)),
+    'year': lambda day: date.fromordinal(day).year,
+}
+
+# How to compute the group of a linked `CloseApproach`.
+GROUP_KEYS = {
+    'day': lambda approach: DAY_GROUPS['day'](approach.day),
+    'month': lambda approach: DAY_GROUPS['month'](approach.day),
+    'year': lambda approach: DAY_GROUPS['year'](approach.day),
+    'neo': lambda approach: approach.neo.designation,
+    'hazardous': lambda approach: approach.neo.hazardous,
+}
+
+
+class UnsupportedMetricError(ValueError):
+    """An aggregate metric or grouping is unsupported."""
+
+
+class Accumulator:
+    """Running statistics over a stream of close approaches."""
+
+    __slots__ = ('count', 'designations', 'min_distance', 'max_distance',
+                 'sum_distance', 'min_velocity', 'max_velocity',
+                 'sum_velocity')
+
+    def __init__(self, track_neos=True):
+        """Create a new, empty `Accumulator`.
+
+        :param track_neos: Whether to remember the distinct NEOs seen, for the
+        'neos' metric.
+        """
+        self.count = 0
+        self.designations = set() if track_neos else None
+        self.min_distance = self.min_velocity = math.inf
+        self.max_distance = self.max_velocity = -math.inf
+        self.sum_distance = self.sum_velocity = 0.0
+
+    def add(self, approach):
+        """Fold a single `CloseApproach` into the statistics."""
+        self.add_values(approach._designation, approach.distance,
+                        approach.velocity)
+
+    def add_values(self, neo, distance, velocity):
+        """Fold the attributes of a single close approach into the statistics.
+
+        :param neo: A value identifying the approach's NEO, such as its
+        designation or its row, the same for every approach of an NEO.
+        :param distance: The nominal approach distance, in au.
+        :param velocity: The relative approach velocity, in km/s.
+        """
+        self.count += 1
+        if self.designations is not None:
+            self.designations.add(neo)
+        self.sum_distance += distance
+        self.sum_velocity += velocity
+        if distance < self.min_distance:
+            self.min_distance = distance
+        if distance > self.max_distance:
+            self.max_distance = distance
+        if velocity < self.min_velocity:
+            self.min_velocity = velocity
+        if velocity > self.max_velocity:
+            self.max_velocity = velocity
+
+    def result(self, metrics=METRICS):
+        """Report the requested metrics.
+
+        Minimums, maximums and means of an empty accumulator are None.
+
+        :param metrics: A collection of names from `METRICS`.
+        :return: A dictionary mapping each metric name to its value.
+        """
+        count = self.count
+        values = {
+            'count': count,
+            'neos': len(self.designations or ()),
+            'min_distance': self.min_distance if count else None,
+            'mean_distance': self.sum_distance / count if count else None,
+            'max_distance': self.max_distance if count else None,
+            'min_velocity': self.min_velocity if count else None,
+            'mean_velocity': self.sum_velocity / count if count else None,
+            'max_velocity': self.max_velocity if count else None,
+        }
+        return {metric: values[metric] for metric in metrics}
+
+
+def check_aggregate(group_by, metrics):
+    """Raise an `UnsupportedMetricError` for unknown groupings or metrics."""
+    if group_by is not None and group_by not in GROUP_KEYS:
+        raise UnsupportedMetricError(f"Can't group by {group_by!r}.")
+    for metric in metrics:
+        if metric not in METRICS:
+            raise UnsupportedMetricError(f"Unknown metric {metric!r}.")
+
+
+def summarize(approaches, group_by=None, metrics=METRICS):
+    """Fold a stream of linked close approaches into (grouped) statistics.
+
+    :param approaches: An iterable of linked `CloseApproach`es.
+    :param group_by: None, or one of the keys of `GROUP_KEYS`.
+    :param metrics: A collection of names from `METRICS`.
+    :return: A dictionary mapping each metric to its value if `group_by` is
+    None. Otherwise, a dictionary mapping each group, in sorted order, to
+    such a dictionary.
+    """
+    check_aggregate(group_by, metrics)
+    track_neos = 'neos' in metrics
+    if group_by is None:
+        total = Accumulator(track_neos)
+        for approach in approaches:
+            total.add(approach)
+        return total.result(metrics)
+
+    key = GROUP_KEYS[group_by]
+    groups = {}
+    for approach in approaches:
+        group = key(approach)
+        accumulator = groups.get(group)
+        if accumulator is None:
+            accumulator = groups[group] = Accumulator(track_neos)
+        accumulator.add(approach)
+    return {group: groups[group].result(metrics) for group in sorted(groups)}
+
+
+def row_group_key(group_by, columns, neos):
+    """Build a function computing the group of a row of `ApproachColumns`.
+
+    :param group_by: One of the keys of `GROUP_KEYS`.
+    :param columns: The `columns.ApproachColumns` of the rows.
+    :param neos: The `NearEarthObject`s that the columns' `neo_rows` refer to.
+    :return: A 1-argument callable on a row ID, giving the same group as the
+    function of `GROUP_KEYS` on the row's `CloseApproach`.
+    """
+    neo_rows = columns.neo_rows
+    if group_by == 'neo':
+        return lambda row: neos[neo_rows[row]].designation
+    if group_by == 'hazardous':
+        hazardous = columns.neo_hazardous
+        return lambda row: bool(hazardous[neo_rows[row]])
+    # Many rows share a day, so each day's group is only computed once.
+    groups, group_of_day, day = {}, DAY_GROUPS[group_by], columns.day
+
+    def key(row):
+        ordinal = day(row)
+        group = groups.get(ordinal)
+        if group is None:
+            group = groups[ordinal] = group_of_day(ordinal)
+        return group
+    return key
+
+
+def summarize_rows(rows, columns, neos, group_by=None, metrics=METRICS):
+    """Fold rows of `ApproachColumns` into (grouped) statistics.
+
+    The statistics are those of `summarize` on the rows' close approaches,
+    but they're computed from the columns, and no `CloseApproach` is built.
+
+    :param rows: An iterable of row IDs.
+    :param columns: The `columns.ApproachColumns` of the rows.
+    :param neos: The `NearEarthObject`s that the columns' `neo_rows` refer to.
+    :param group_by: None, or one of the keys of `GROUP_KEYS`.
+    :param metrics: A collection of names from `METRICS`.
+    :return: The same structure as `summarize`.
+    """
+    check_aggregate(group_by, metrics)
+    track_neos = 'neos' in metrics
+    neo_rows = columns.neo_rows
+    distances, velocities = columns.distances, columns.velocities
+    if group_by is None:
+        total = Accumulator(track_neos)
+        add = total.add_values
+        for row in rows:
+            add(neo_rows[row], distances[row], velocities[row])
+        return total.result(metrics)
+
+    key = row_group_key(group_by, columns, neos)
+    groups = {}
+    for row in rows:
+        group = key(row)
+        accumulator = groups.get(group)
+        if accumulator is None:
+            accumulator = groups[group] = Accumulator(track_neos)
+        accumulator.add_values(neo_rows[row], distances[row], velocities[row])
+    return {group: groups[group].result(metrics) for group in sorted(groups)}
@@ -0,0 +1,288 @@
+"""Store the attributes of close approaches as typed columns.
+
+An `ApproachColumns` holds one compact column per approach attribute - the
+time in minutes since the epoch, the distance, the velocity, and the row of
+the approach's NEO in the database's NEO collection - plus the diameter and
+hazard flag of every NEO. Each column is any indexable sequence of numbers:
+an `array` built from `CloseApproach` objects, or a `memoryview` over a
+memory-mapped file or a shared memory segment.
+
+The `NEODatabase` builds its indexes from these columns, and uses `predicate`
+to evaluate filters on a row without touching its `CloseApproach` (and
+`interval_predicate` to evaluate both bounds on a column at once).
+
+An `ApproachSequence` wraps such columns as a read-only sequence of
+`CloseApproach` objects that are only built when a row is accessed, and only
+cached for a while.
+"""
+import functools
+import operator
+from array import array
+
+from helpers import EPOCH_ORDINAL, MINUTES_PER_DAY
+from models import CloseApproach
+
+
+# The number of recently used `CloseApproach` objects an `ApproachSequence`
+# keeps, besides those of the NEOs whose approaches were collected.
+CACHE_SIZE = 1 << 12
+
+
+def _growable(column):
+    """Return a column as an `array`, copying it if it's a `memoryview`."""
+    if isinstance(column, array):
+        return column
+    return array(column.format, column.tobytes())
+
+
+class ApproachColumns:
+    """Typed columns of close approach attributes, indexed by row."""
+
+    def __init__(self, minutes, distances, velocities, neo_rows, neos,
+                 neo_diameters=None, neo_hazardous=None):
+        """Create a new `ApproachColumns`.
+
+        :param minutes: The time of each approach, in minutes since the epoch.
+        :param distances: The nominal distance of each approach, in au.
+        :param velocities: The relative velocity of each approach, in km/s.
+        :param neo_rows: The position of each approach's NEO in `neos`.
+        :param neos: An indexable collection of `NearEarthObject`s.
+        :param neo_diameters: The diameter of each NEO (NaN if unknown), or
+        None to read them from `neos`.
+        :param neo_hazardous: Whether each NEO is potentially hazardous, as
+        0 or 1, or None to read them from `neos`.
+        """
+        self.minutes = minutes
+        self.distances = distances
+        self.velocities = velocities
+        self.neo_rows = neo_rows
+        if neo_diameters is None:
+            neo_diameters = array('d', (neo.diameter for neo in neos))
+        if neo_hazardous is None:
+            neo_hazardous = bytes(bool(neo.hazardous) for neo in neos)
+        self.neo_diameters = neo_diameters
+        self.neo_hazardous = neo_hazardous
+
+    @classmethod
+    def from_approaches(cls, approaches, neos, neo_row_by_designation):
+        """Build the columns of a collection of `CloseApproach` objects.
+
+        :param approaches: An iterable of `CloseApproach`es.
+        :param neos: An indexable collection of `NearEarthObject`s.
+        :param neo_row_by_designation: A dictionary mapping each designation
+        to the position of its NEO in `neos`.
+        :return: A new `ApproachColumns`.
+        """
+        minutes, distances = array('q'), array('d')
+        velocities, neo_rows = array('d'), array('i')
+        for approach in approaches:
+            minutes.append(approach.minutes)
+            distances.append(approach.distance)
+            velocities.append(approach.velocity)
+            neo_rows.append(neo_row_by_designation[approach._designation])
+        return cls(minutes, distances, velocities, neo_rows, neos)
+
+    @classmethod
+    def concatenate(cls, parts, neos):
+        """Copy the rows of several `ApproachColumns` into new columns.
+
+        :param parts: A collection of `ApproachColumns` over the same NEOs.
+        :param neos: An indexable collection of `NearEarthObject`s.
+        :return: A new `ApproachColumns`, with the rows of each part in turn.
+        """
+        columns = []
+        for name, typecode in (('minutes', 'q'), ('distances', 'd'),
+                               ('velocities', 'd'), ('neo_rows', 'i')):
+            column = array(typecode)
+            for part in parts:
+                column.frombytes(memoryview(getattr(part, name)).cast('B'))
+            columns.append(column)
+        return cls(*columns, neos)
+
+    def extend(self, minutes, distances, velocities, neo_rows):
+        """Append rows to the columns.
+
+        Columns over a read-only buffer (such as a mapped file) are first
+        copied into arrays, once.
+
+        :param minutes: The times of the new approaches, in minutes since the
+        epoch.
+        :param distances: The nominal distances of the new approaches, in au.
+        :param velocities: The relative velocities of the new approaches, in
+        km/s.
+        :param neo_rows: The positions of the new approaches' NEOs.
+        """
+        self.minutes = _growable(self.minutes)
+        self.distances = _growable(self.distances)
+        self.velocities = _growable(self.velocities)
+        self.neo_rows = _growable(self.neo_rows)
+        self.minutes.extend(minutes)
+        self.distances.extend(distances)
+        self.velocities.extend(velocities)
+        self.neo_rows.extend(neo_rows)
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.distances)
+
+    def day(self, row):
+        """Return the day ordinal (as in `date.toordinal`) of a row."""
+        return EPOCH_ORDINAL + self.minutes[row] // MINUTES_PER_DAY
+
+    def values(self, attribute):
+        """Return a column of sortable values, indexed by row.
+
+        :param attribute: One of 'time' (in minutes), 'distance', 'velocity'
+        or 'diameter' (NaN if unknown).
+        :return: An indexable sequence of numbers.
+        """
+        if attribute == 'time':
+            return self.minutes
+        if attribute == 'distance':
+            return self.distances
+        if attribute == 'velocity':
+            return self.velocities
+        if attribute == 'diameter':
+            diameters = self.neo_diameters
+            return [diameters[neo] for neo in self.neo_rows]
+        raise KeyError(attribute)
+
+    def getter(self, attribute):
+        """Return a function fetching a sortable value of a row.
+
+        :param attribute: One of the attributes accepted by `values`.
+        :return: A 1-argument callable on a row ID.
+        """
+        if attribute == 'diameter':
+            diameters, neo_rows = self.neo_diameters, self.neo_rows
+            return lambda row: diameters[neo_rows[row]]
+        return self.values(attribute).__getitem__
+
+    def predicate(self, approach_filter):
+        """Translate a filter into a predicate on row IDs.
+
+        :param approach_filter: An `AttributeFilter`.
+        :return: A 1-argument callable on a row ID, or None if the filter
+        doesn't compare one of these columns.
+        """
+        attribute = getattr(approach_filter, 'attribute', None)
+        if attribute is None:
+            return None
+        op, value = approach_filter.op, approach_filter.value
+
+        if attribute == 'date':
+            minutes, ordinal = self.minutes, value.toordinal()
+            return lambda row: op(
+                EPOCH_ORDINAL + minutes[row] // MINUTES_PER_DAY, ordinal)
+        if attribute == 'distance':
+            distances = self.distances
+            return lambda row: op(distances[row], value)
+        if attribute == 'velocity':
+            velocities = self.velocities
+            return lambda row: op(velocities[row], value)
+        if attribute == 'diameter':
+            diameters, neo_rows = self.neo_diameters, self.neo_rows
+            return lambda row: op(diameters[neo_rows[row]], value)
+        if attribute == 'hazardous':
+            hazardous, neo_rows = self.neo_hazardous, self.neo_rows
+            return lambda row: op(bool(hazardous[neo_rows[row]]), value)
+        return None
+
+    def interval_predicate(self, lower, upper):
+        """Translate a lower and an upper bound into one predicate on row IDs.
+
+        The column is read once per row, in a single chained comparison.
+        Bounds on days become bounds on the minutes column.
+
+        :param lower: An `AttributeFilter` comparing with `>=` or `>`.
+        :param upper: An `AttributeFilter` comparing the same attribute with
+        `<=` or `<`.
+        :return: A 1-argument callable on a row ID.
+        """
+        if lower.attribute == 'date':
+            minutes = self.minutes
+            low, high = (
+                (day - EPOCH_ORDINAL) * MINUTES_PER_DAY for day in (
+                    lower.value.toordinal() + (lower.op is operator.gt),
+                    upper.value.toordinal() + (upper.op is operator.le)))
+            return lambda row: low <= minutes[row] < high
+
+        get, low, high = self.getter(lower.attribute), lower.value, upper.value
+        if lower.op is operator.ge:
+            if upper.op is operator.le:
+                return lambda row: low <= get(row) <= high
+            return lambda row: low <= get(row) < high
+        if upper.op is operator.le:
+            return lambda row: low < get(row) <= high
+        return lambda row: low < get(row) < high
+
+
+def _build_approach(columns, neos, row):
+    """Build the linked `CloseApproach` of a row of `ApproachColumns`."""
+    neo = neos[columns.neo_rows[row]]
+    approach = CloseApproach(neo.designation, columns.minutes[row],
+                             columns.distances[row], columns.velocities[row])
+    approach.neo = neo
+    return approach
+
+
+class ApproachSequence:
+    """A read-only sequence of close approaches backed by `ApproachColumns`.
+
+    The columns are available in `columns`, so an `NEODatabase` can index
+    them directly. `CloseApproach` objects are built (and linked to their
+    NEO) on access to a row. Only the `cache_size` most recently used ones
+    are kept, so paging through results doesn't rebuild them but a
+    long-running database doesn't grow back to one object per row; the
+    approaches pinned with `keep`, those of the NEOs whose `.approaches` were
+    collected, are always returned for their rows instead.
+    """
+
+    def __init__(self, columns, neos, cache_size=CACHE_SIZE):
+        """Create a new `ApproachSequence`.
+
+        :param columns: An `ApproachColumns`.
+        :param neos: The collection of `NearEarthObject`s that the columns'
+        `neo_rows` refer to.
+        :param cache_size: The number of recently used approaches to keep.
+        """
+        self.columns = columns
+        self._neos = neos
+        self._kept = {}
+        self._recent = functools.lru_cache(cache_size)(
+            functools.partial(_build_approach, columns, neos))
+
+    def keep(self, rows, approaches=None):
+        """Pin the approaches of some rows, to return them for these rows.
+
+        :param rows: An iterable of row IDs.
+        :param approaches: The `CloseApproach`es of the rows, or None to
+        build them (or take them from the cache).
+        :return: A list of the pinned approaches, in the order of `rows`.
+        """
+        rows = list(rows)
+        if approaches is None:
+            approaches = map(self.__getitem__, rows)
+        approaches = list(approaches)
+        self._kept.update(zip(rows, approaches))
+        return approaches
+
+    def __len__(self):
+        """Return the number of approaches."""
+        return len(self.columns)
+
+    def __getitem__(self, row):
+        """Return the linked `CloseApproach` of a row."""
+        size = len(self.columns)
+        if row < 0:
+            row += size
+        approach = self._kept.get(row)
+        if approach is None:
+            if not 0 <= row < size:
+                raise IndexError("ApproachSequence index out of range")
+            approach = self._recent(row)
+        return approach
+
+    def __iter__(self):
+        """Iterate over every approach, in row order."""
+        return map(self.__getitem__, range(len(self)))
@@ -0,0 +1,70 @@
+"""Encode the position of a paged query into an opaque resume token.
+
+A database's `paginate` method returns a page of results along with a token
+recording where the scan stopped - the last row returned, and for a sorted
+query on SQLite, its sort value. Passing the token back resumes the scan right
+after that row, so fetching the next page costs about as much as fetching the
+first one, however deep into the results it is.
+
+A token is URL-safe text. It also carries a fingerprint of the query it was
+issued for, so resuming a different query (or the same query on the other
+backend) is an error rather than a silently wrong page.
+
+The main module prints the token of a `query` with more results, to be passed
+back with `--resume`, and the shell's `next` command resumes the last query.
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+
+class TokenError(ValueError):
+    """A resume token is malformed, or was issued for another query."""
+
+
+def query_fingerprint(backend, filters, sort_by, descending):
+    """Identify a query, for the tokens of its pages.
+
+    :param backend: The name of the database class answering the query.
+    :param filters: The filters of the query.
+    :param sort_by: The attribute the results are sorted by, or None.
+    :param descending: Whether the results are sorted from the largest down.
+    :return: A short hexadecimal string.
+    """
+    text = '\n'.join([backend, str(sort_by), str(bool(descending))]
+                     + sorted(str(f) for f in filters))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def encode_token(query, **position):
+    """Encode the position of a query into a token.
+
+    :param query: The fingerprint of the query, from `query_fingerprint`.
+    :param position: The values recording the position, such as `row`.
+    :return: A token string.
+    """
+    state = dict(position, query=query)
+    text = json.dumps(state, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+def decode_token(token, query):
+    """Decode a token issued for a query.
+
+    :param token: A token string from `encode_token`.
+    :param query: The fingerprint of the query being resumed.
+    :return: A dictionary of the position recorded in the token, with at
+    least a non-negative integer `row`.
+    :raise TokenError: If the token is malformed or from another query.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise TokenError(f"{token!r} isn't a resume token.")
+    if not isinstance(state, dict) or \
+            not isinstance(state.get('row'), int) or state['row'] < 0:
+        raise TokenError(f"{token!r} isn't a resume token.")
+    if state.pop('query', None) != query:
+        raise TokenError("This resume token was issued for another query.")
+    return state
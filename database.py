@@ -15,14 +15,97 @@ data on NEOs and close approaches extracted by `extract.load_neos` and
 
 You'll edit this file in Tasks 2 and 3.
 """
+import functools
+import heapq
+import itertools
+import logging
+import math
 import pathlib
+import threading
+import time
+from adaptive import SAMPLE_SIZE, AdaptiveChecks
+from aggregates import METRICS, summarize_rows
+from columns import ApproachColumns
+from cursors import TokenError, decode_token, encode_token, query_fingerprint
+from explain import QueryPlan
+from expressions import AllOf, AnyOf, Expression
+from filters import LOWER_BOUNDS, UPPER_BOUNDS, normalize_filters
 from extract import load_neos, load_approaches
+from indexes import (SortedIndex, bitmap_bytes, bitmap_from_rows, has_row,
+                     iter_rows, popcount, rank_key)
+from snapshots import Snapshot
+from streaming import BATCH_SIZE, QUEUE_SIZE, stream_batches
+from subscriptions import Subscriptions
 
 here = pathlib.Path('.')
 here = here.resolve()
 TEST_CAD_FILE = here / 'tests' / 'test-cad-2020.json'
 TEST_NEO_FILE = here / 'tests' / 'test-neos-2020.csv'
 
+logger = logging.getLogger(__name__)
+
+
+class _CompiledFilter:
+    """A filter whose predicate on row IDs was already built by `_select`."""
+
+    def __init__(self, approach_filter, row_check):
+        self.approach_filter = approach_filter
+        self.row_check = row_check
+
+    def __call__(self, approach):
+        """Invoke `self(approach)`."""
+        return self.approach_filter(approach)
+
+    def __str__(self):
+        """Describe the filter."""
+        return str(self.approach_filter)
+
+
+class LinkStats:
+    """How the close approaches of an `NEODatabase` were joined to its NEOs."""
+
+    def __init__(self, approaches, orphans, neos, seconds):
+        """Create a new `LinkStats`.
+
+        :param approaches: The number of approaches joined, orphans included.
+        :param orphans: The number of approaches whose NEO wasn't found.
+        :param neos: The number of NEOs with at least one approach.
+        :param seconds: The duration of the join, in seconds.
+        """
+        self.approaches = approaches
+        self.orphans = orphans
+        self.neos = neos
+        self.seconds = seconds
+
+    @property
+    def linked(self):
+        """Return the number of approaches linked to their NEO."""
+        return self.approaches - self.orphans
+
+    @property
+    def throughput(self):
+        """Return the number of approaches joined per second."""
+        return self.approaches / self.seconds if self.seconds else math.inf
+
+    def __str__(self):
+        """Describe the join."""
+        return (f"Linked {self.linked} close approaches to {self.neos} NEOs "
+                f"in {self.seconds:.3f}s ({self.throughput:,.0f} approaches "
+                f"per second); set aside {self.orphans} orphans.")
+
+
+def _pinned(method):
+    """Run a read method of an `NEODatabase` on its current snapshot.
+
+    :param method: A method reading the indexes of the database.
+    :return: The method, called on the `NEODatabase.snapshot` taken when it
+    was called.
+    """
+    @functools.wraps(method)
+    def pinned(self, *args, **kwargs):
+        return method(self.snapshot(), *args, **kwargs)
+    return pinned
+
 
 class NEODatabase:
     """A database of near-Earth objects and their close approaches.
@@ -51,31 +134,252 @@ class NEODatabase:
         attribute of
         each close approach references the appropriate NEO.
 
+        The approaches may instead be a `columns.ApproachSequence` (such as a
+        `mapped.MappedApproaches`), which provides its own `columns`. Its
+        `CloseApproach` objects are then only built when they are returned,
+        and each NEO's `.approaches` is only populated when the NEO is looked
+        up.
+
+        Approaches whose designation matches no NEO don't abort the load:
+        they're left out of the database and set aside in `orphans`. How the
+        join went is recorded in `link_stats`.
+
         :param neos: A collection of `NearEarthObject`s.
         :param approaches: A collection of `CloseApproach`es.
         """
-        self._neos = neos
-        self._approaches = approaches
+        self._neos = neos = list(neos)
+        self._neo_row_by_designation = {neo.designation: row
+                                        for row, neo in enumerate(neos)}
 
         self._neo_by_designation = {neo.designation: neo for neo in neos}
-        self._neo_by_name = {neo.name: neo for neo in neos if neo.name}
+        self._neo_by_name = {}
+        for neo in neos:
+            if neo.name:
+                self._neo_by_name.setdefault(neo.name, neo)
 
-        self.link_neos_with_approaches(self._neo_by_designation,
-                                       self._neo_by_name)
+        # Where the approaches come from, if not the whole data set, such as
+        # the partitions chosen by `partitions.load_partitions`.
+        self._source = getattr(approaches, 'source', None)
+
+        # The approaches left out because their NEO wasn't found, and the
+        # `LinkStats` of the join, if the approaches weren't joined already.
+        self.orphans = []
+        self.link_stats = None
+
+        columns = getattr(approaches, 'columns', None)
+        self._lazy = columns is not None
+        if self._lazy:
+            self._approaches = approaches
+        else:
+            self._approaches = list(approaches)
+            self.link_stats = self.link_neos_with_approaches(
+                self._neo_by_designation, self._neo_by_name)
+            logger.debug("%s", self.link_stats)
+            if self.orphans:
+                logger.warning("Set aside %d close approaches of unknown "
+                               "NEOs, such as %r.", len(self.orphans),
+                               self.orphans[0]._designation)
+            columns = ApproachColumns.from_approaches(
+                self._approaches, neos, self._neo_row_by_designation)
+        self._columns = columns
+
+        # The current version of the indexes over the approach rows: the
+        # bitmap index, the zone map, the sorted indexes and the rows of each
+        # NEO (see `snapshots`). It's replaced, never modified, by writers.
+        self._snapshot = Snapshot.build(columns, len(neos))
+        # Held by writers, one at a time; readers never take it.
+        self._writing = threading.Lock()
+        # The database whose snapshots this one reads: itself, unless it's
+        # a snapshot returned by `snapshot`.
+        self._database = self
+
+        # The standing queries notified of appended approaches.
+        self._subscriptions = Subscriptions()
+
+    @property
+    def _size(self):
+        """The number of approach rows in the snapshot."""
+        return self._snapshot.size
+
+    @property
+    def _bitmaps(self):
+        """The `BitmapIndex` of the snapshot."""
+        return self._snapshot.bitmaps
+
+    @property
+    def _zones(self):
+        """The `ZoneMap` of the snapshot."""
+        return self._snapshot.zones
+
+    @property
+    def _sorted_indexes(self):
+        """The `SortedIndex`es of the snapshot, by attribute."""
+        return self._snapshot.sorted_indexes
+
+    @property
+    def _rows_by_neo(self):
+        """The approach rows of each NEO, by the NEO's position in `_neos`."""
+        return self._snapshot.rows_by_neo
+
+    def snapshot(self):
+        """Pin the current version of the database, for reading.
+
+        The returned database answers queries from the approaches and
+        indexes as they are now, without any lock, however many approaches
+        are appended afterwards. Every query already pins the version current
+        when it starts; pinning one explicitly makes several queries agree,
+        such as a `count` and the `query` it precedes.
+
+            snapshot = db.snapshot()
+            total = snapshot.count(filters)
+            results = snapshot.query(filters)
+
+        Writes to the returned database, such as `append_approaches`, go to
+        this database and don't change the snapshot.
+
+        :return: An `NEODatabase` reading the current snapshot. A snapshot
+        returns itself.
+        """
+        if self._database is not self:
+            return self
+        database = object.__new__(type(self))
+        database.__dict__.update(self.__dict__)
+        return database
 
     def link_neos_with_approaches(self, neo_by_designation, neo_by_name):
         """
         Link together the NEOs and their close approaches.
 
+        Approaches whose NEO isn't found are orphans. Rather than aborting
+        the join, they're removed from the database's approaches and set
+        aside in `orphans`, unlinked.
+
         :param neo_by_designation: dict of neo designations and associtated
          neo.
         :param neo_by_names: dict of neo names and associated neos.
+        :return: A `LinkStats`.
         """
+        start = time.perf_counter()
+        total = len(self._approaches)
+        orphans = self.orphans
+        find = neo_by_designation.get
         for approach in self._approaches:
-            neo = self._neo_by_designation[approach._designation]
+            neo = find(approach._designation)
+            if neo is None:
+                orphans.append(approach)
+                continue
             approach.neo = neo
             neo.approaches.append(approach)
+        if orphans:
+            self._approaches = [approach for approach in self._approaches
+                                if approach.neo is not None]
+        linked = sum(1 for neo in neo_by_designation.values()
+                     if neo.approaches)
+        return LinkStats(total, len(orphans), linked,
+                         time.perf_counter() - start)
+
+    def append_approaches(self, approaches):
+        """Add new close approaches to the database without reloading it.
+
+        The new approaches are linked to their NEOs, appended after the
+        existing rows, and added to the bitmap index and to every sorted
+        index, visiting only the new rows. Results of queries made afterwards
+        include them, and the subscriptions registered with `subscribe`
+        receive those that match their filters.
 
+        For a mapped database, the new approaches are only kept in memory,
+        and the first append copies the mapped columns into arrays.
+
+        The indexes are extended into a new version of the database's
+        snapshot, published once it's complete (see `snapshots`): queries
+        running meanwhile keep reading the version they started with.
+        Appends from several threads run one at a time.
+
+        :param approaches: An iterable of unlinked `CloseApproach`es, each of
+        an NEO already in the database.
+        :return: The number of approaches added.
+        :raise KeyError: If an approach's NEO isn't in the database. No
+        approach is added then.
+        """
+        if self._database is not self:
+            return self._database.append_approaches(approaches)
+        approaches = list(approaches)
+        try:
+            neo_rows = [self._neo_row_by_designation[approach._designation]
+                        for approach in approaches]
+        except KeyError as err:
+            raise KeyError(f"No NEO with designation {err.args[0]!r}.") \
+                from None
+
+        with self._writing:
+            start = self._snapshot.size
+            self._columns.extend(
+                (approach.minutes for approach in approaches),
+                (approach.distance for approach in approaches),
+                (approach.velocity for approach in approaches),
+                neo_rows)
+            if not self._lazy:
+                self._approaches.extend(approaches)
+            for row, (approach, neo_row) in enumerate(
+                    zip(approaches, neo_rows), start):
+                neo = self._neos[neo_row]
+                approach.neo = neo
+                # The approaches of a mapped database's NEO are only
+                # collected once the NEO is looked up; until then, its rows
+                # suffice, and the new approaches are built from the columns.
+                if not self._lazy:
+                    neo.approaches.append(approach)
+                elif neo.approaches:
+                    neo.approaches.append(approach)
+                    self._approaches.keep([row], [approach])
+            self._snapshot = self._snapshot.extend(self._columns, start)
+
+        if self._subscriptions:
+            self._subscriptions.notify(
+                start, approaches, lambda f: self._row_checks((f,))[0][0])
+        return len(approaches)
+
+    def subscribe(self, filters, target, loop=None):
+        """Register a standing query on the approaches added from now on.
+
+        After each call to `append_approaches`, the new approaches, and only
+        those, are evaluated against the filters; each filter shared by
+        several subscriptions is evaluated once (see `subscriptions`).
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param target: A 1-argument callable, called with the list of new
+        matching `CloseApproach`es after each append that has any, or an
+        `asyncio.Queue` to put each new match into.
+        :param loop: With a queue, the event loop running its consumers, if
+        approaches are appended from another thread.
+        :return: A `subscriptions.Subscription`, to pass to `unsubscribe`.
+        """
+        return self._subscriptions.add(filters, target, loop)
+
+    def unsubscribe(self, subscription):
+        """Cancel a subscription returned by `subscribe`.
+
+        :param subscription: A `subscriptions.Subscription`.
+        """
+        self._subscriptions.remove(subscription)
+
+    def _linked(self, neo):
+        """Populate the `.approaches` of an NEO of a mapped database.
+
+        :param neo: A `NearEarthObject` of this database, or None.
+        :return: The same NEO.
+        """
+        if neo is not None and self._lazy and not neo.approaches:
+            # An append mustn't run between choosing the rows and linking
+            # them, or its approaches would be left out.
+            database = self._database
+            with database._writing:
+                if not neo.approaches:
+                    rows = database._rows_by_neo[
+                        self._neo_row_by_designation[neo.designation]]
+                    neo.approaches.extend(self._approaches.keep(rows))
+        return neo
 
     def get_neo_by_designation(self, designation):
         """
@@ -91,13 +395,7 @@ class NEODatabase:
         :return: The `NearEarthObject` with the desired primary designation, or
         `None`.
         """
-        for neo in self._neos:
-            if designation != neo.designation:
-                continue
-            else:
-                print("Designation input : ", designation)
-                print("Neo Designation : ", neo.designation)
-                return neo
+        return self._linked(self._neo_by_designation.get(designation))
 
     def get_neo_by_name(self, name):
         """Find and return an NEO by its name.
@@ -113,14 +411,273 @@ class NEODatabase:
         :param name: The name, as a string, of the NEO to search for.
         :return: The `NearEarthObject` with the desired name, or `None`.
         """
-        for neo in self._neos:
-            if name != neo.name:
-                continue
+        return self._linked(self._neo_by_name.get(name))
+
+    def _select(self, filters, plan=None):
+        """Choose the approach rows to visit for a collection of filters.
+
+        Each filter is first offered to the bitmap index (or, for date
+        filters, to the zone map), and the blocks of rows that the zone map
+        rules out are dropped. NEO-level filters
+        that the index can't answer exactly are pushed down to the NEOs: they
+        are evaluated together once per NEO, and the rows of the matching
+        NEOs' approaches become an exact selection for all of them.
+        Expression trees are answered by `_select_expression`.
+
+        The filters are first simplified by `normalize_filters`; if they
+        can't all match, no row is selected and no index is consulted.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param plan: A `QueryPlan` to describe the selection in, or None.
+        :return: A tuple `(exact, candidates, residual)`: a bitmap of the rows
+        known to match every filter, a bitmap of the rows that might match
+        (or None to visit every row), and the filters that must still be
+        evaluated on the candidate rows that aren't exact.
+        """
+        filters = normalize_filters(filters)
+        if plan is not None:
+            plan.normalized = filters if filters is None \
+                else [str(f) for f in filters]
+        if filters is None:
+            return 0, 0, []
+        exact, candidates = self._bitmaps.all, None
+        pushed, residual = [], []
+        for f in filters:
+            if isinstance(f, Expression):
+                exact_f, candidates_f, check, _ = self._select_expression(f)
+            else:
+                (exact_f, candidates_f), check = self._select_filter(f), None
+            if candidates_f is None or exact_f != candidates_f:
+                if getattr(f, 'level', None) == 'neo':
+                    pushed.append(f)
+                    continue
+                residual.append(f if check is None
+                                else _CompiledFilter(f, check))
+            if plan is not None:
+                plan.access.append(self._describe(f, exact_f, candidates_f))
+            exact &= exact_f
+            if candidates_f is not None:
+                candidates = candidates_f if candidates is None \
+                    else candidates & candidates_f
+
+        # Skip the blocks of rows that the zone map rules out.
+        zone = self._zones.select(filters)
+        if zone is not None:
+            if plan is not None:
+                plan.access.append(f"zone map: skips all but "
+                                   f"{popcount(zone)} rows")
+            exact &= zone
+            candidates = zone if candidates is None else candidates & zone
+
+        if pushed:
+            if plan is not None:
+                plan.access.append(f"{', '.join(map(str, pushed))}: "
+                                   f"pushed down to the NEOs")
+            rows = bitmap_from_rows(
+                (row for neo, rows in zip(self._neos, self._rows_by_neo)
+                 if all(f.matches_neo(neo) for f in pushed)
+                 for row in rows),
+                self._bitmaps.size)
+            exact &= rows
+            candidates = rows if candidates is None else candidates & rows
+
+        if candidates is None:
+            return 0, None, residual
+        return exact, candidates, residual
+
+    def _select_filter(self, f):
+        """Select the rows of a single filter.
+
+        A date filter is answered from the zone map when its partly matching
+        blocks hold fewer rows than the filter matches; then only those rows
+        are checked one by one, instead of collecting every matching row from
+        the bitmap index. On time-ordered data, that's at most a block or two.
+
+        :param f: A filter.
+        :return: A tuple `(exact, candidates)`, as from
+        `BitmapIndex.select_filter`.
+        """
+        width = self._bitmaps.count_dates((f,))
+        if width is None or width > self._zones.block_size:
+            zone = self._zones.select_filter(f)
+            if zone is not None:
+                exact, candidates = zone
+                if width is None or popcount(candidates & ~exact) < width:
+                    return exact, candidates
+        return self._bitmaps.select_filter(f)
+
+    def _describe(self, f, exact, candidates):
+        """Describe how `_select` answered a filter, for a `QueryPlan`.
+
+        :param f: A filter or an expression tree.
+        :param exact: The bitmap of the rows known to match `f`.
+        :param candidates: The bitmap of the rows that might match `f`, or
+        None.
+        :return: A string.
+        """
+        if candidates is None:
+            return f"{f}: checked on every row"
+        if isinstance(f, Expression):
+            path = 'bitmap set operations'
+        else:
+            path = 'bitmap index'
+            width = self._bitmaps.count_dates((f,))
+            if width is None or width > self._zones.block_size:
+                zone = self._zones.select_filter(f)
+                if zone is not None and (
+                        width is None or popcount(zone[1] & ~zone[0]) < width):
+                    path = 'zone map'
+        text = f"{f}: {path}, {popcount(exact)} rows match"
+        if exact != candidates:
+            text += f", {popcount(candidates & ~exact)} to check"
+        return text
+
+    def _select_expression(self, node):
+        """Select the rows of a node of an expression tree.
+
+        Each leaf filter is answered by `_select_filter`, and the rows of the
+        children of a node are combined with set operations on their bitmaps.
+        The children are then checked row by row in order of cost and of
+        selectivity: for an AND, those with the fewest candidates first; for
+        an OR, those with the most exact matches first. A subtree whose rows
+        are known exactly is checked by bitmap lookup alone.
+
+        :param node: An `Expression`, or a filter at a leaf.
+        :return: A tuple `(exact, candidates, check, cost)`: bitmaps of the
+        rows known to match and of the rows that might match (never None), a
+        predicate on row IDs that decides any row, and its relative cost.
+        """
+        everything = self._bitmaps.all
+        if not isinstance(node, Expression):
+            exact, candidates = self._select_filter(node)
+            if candidates is None:
+                candidates = everything
+            (check, _), cost = self._row_checks((node,))[0], 1
+        else:
+            parts = [self._select_expression(child)
+                     for child in node.children]
+            exacts = [part[0] for part in parts]
+            candidate_sets = [part[1] for part in parts]
+            cost = sum(part[3] for part in parts)
+            if isinstance(node, AllOf):
+                exact = candidates = everything
+                for exact_child, candidates_child in zip(exacts,
+                                                         candidate_sets):
+                    exact &= exact_child
+                    candidates &= candidates_child
+                parts.sort(key=lambda part: (part[3], popcount(part[1])))
             else:
-                print("Found neo name : ", neo.name)
-                return neo
+                exact = candidates = 0
+                for exact_child, candidates_child in zip(exacts,
+                                                         candidate_sets):
+                    exact |= exact_child
+                    candidates |= candidates_child
+                parts.sort(key=lambda part: (part[3], -popcount(part[0])))
+            checks = [part[2] for part in parts]
+            if isinstance(node, AllOf):
+                def check(row):
+                    return all(child(row) for child in checks)
+            elif isinstance(node, AnyOf):
+                def check(row):
+                    return any(child(row) for child in checks)
+            else:
+                exact, candidates = (everything & ~candidates,
+                                     everything & ~exact)
+
+                def check(row):
+                    return not any(child(row) for child in checks)
+
+        if exact == candidates:
+            rows = bitmap_bytes(exact, self._bitmaps.size)
+            check, cost = (lambda row: has_row(rows, row)), 0
+        return exact, candidates, check, cost
+
+    def create_sorted_index(self, sort_by):
+        """Build (or rebuild) a sorted index on an approach attribute.
+
+        Sorted queries on `sort_by` then stream rows in index order instead of
+        sorting or ranking the matches.
+
+        The index is added to a new version of the snapshot. Called on a
+        snapshot, it indexes the snapshot's rows, and the database only gets
+        the index if no approaches were appended since.
+
+        :param sort_by: One of 'time', 'distance', 'velocity' or 'diameter'.
+        """
+        database = self._database
+        with self._writing:
+            current = self._snapshot
+            snapshot = current.with_index(sort_by, SortedIndex(
+                self._columns, sort_by, size=current.size))
+            if database._snapshot is current:
+                database._snapshot = snapshot
+            self._snapshot = snapshot
+
+    @_pinned
+    def explain(self, filters=(), sort_by=None, descending=False,
+                limit=None, offset=0):
+        """Describe how `query` would answer a query, without running it.
+
+        The plan lists the normalized filters, how `_select` answers each of
+        them, and how the results are ordered. It counts the rows known to
+        match and the rows left to check, and estimates the number of results
+        from the pass rate of the remaining checks on a sample of up to
+        `adaptive.SAMPLE_SIZE` rows to check.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param sort_by: An attribute to sort by, as for `query`.
+        :param descending: Whether to sort from the largest value down.
+        :param limit: The maximum number of results, as for `query`.
+        :param offset: The number of results to skip, as for `query`.
+        :return: A `QueryPlan`, whose planning time is recorded.
+        """
+        start = time.perf_counter()
+        filters = tuple(filters)
+        plan = QueryPlan(filters)
+        plan.source = self._source
+        plan.total = self._size
+        exact, candidates, residual = self._select(filters, plan)
+        if candidates is None and not residual:
+            exact, rows, plan.candidates = self._bitmaps.all, (), 0
+        elif candidates is None:
+            rows, plan.candidates = range(plan.total), plan.total
+        else:
+            rows = iter_rows(candidates & ~exact)
+            plan.candidates = popcount(candidates & ~exact)
+        plan.exact = popcount(exact)
+
+        plan.estimated = plan.exact
+        if plan.candidates:
+            checks = [check for check, _ in self._row_checks(residual)]
+            step = max(1, plan.candidates // SAMPLE_SIZE)
+            sample = list(itertools.islice(rows, 0, None, step))
+            passed = sum(1 for row in sample
+                         if all(check(row) for check in checks))
+            plan.estimated += round(plan.candidates * passed / len(sample))
 
-    def query(self, filters=()):
+        direction = ', descending' if descending else ''
+        stop = offset + limit if limit else None
+        if sort_by is None:
+            plan.order = 'internal order'
+        elif sort_by in self._sorted_indexes:
+            plan.order = f"sorted index on {sort_by}{direction}"
+        elif stop:
+            plan.order = (f"top {stop} by {sort_by}{direction}, in a "
+                          f"bounded heap")
+        else:
+            plan.order = f"sort every match by {sort_by}{direction}"
+        if offset:
+            plan.order += f", skipping the first {offset}"
+        if stop and (sort_by is None or sort_by in self._sorted_indexes):
+            plan.order += f", stopping after match {stop}"
+        plan.record('planning', start)
+        return plan
+
+    @_pinned
+    def query(self, filters=(), sort_by=None, descending=False, limit=None,
+              offset=0, plan=None):
         """
         Query approaches to generate those that match a collection of filters.
 
@@ -129,17 +686,360 @@ class NEODatabase:
 
         If no arguments are provided, generate all known close approaches.
 
-        The `CloseApproach` objects are generated in internal order, which
-        isn't guaranteed to be sorted meaningfully, although is often sorted
-        by time.
+        Unless `sort_by` is given, the `CloseApproach` objects are generated
+        in internal order, which isn't guaranteed to be sorted meaningfully,
+        although is often sorted by time.
+
+        The filters are first answered from the bitmap index and the NEOs
+        where possible (see `_select`), so only the rows that might match are
+        visited, and only the filters not already answered are evaluated on
+        them, in an order learned from the rows as they are scanned.
+
+        Sorted results are streamed from a sorted index on `sort_by` if one
+        exists. Otherwise, if `limit` is given, the top `offset + limit`
+        matches are kept in a bounded heap; only unlimited queries without an
+        index sort every match. Approaches of NEOs with an unknown diameter
+        come last when sorting by diameter.
+
+        When the results are streamed, the scan stops at the last result
+        within `limit`, and the first `offset` matches are skipped as row
+        IDs: no `CloseApproach` is built for them.
 
         :param filters: A collection of filters capturing user-specified
         criteria.
+        :param sort_by: An attribute to sort by: 'time', 'distance',
+        'velocity' or 'diameter'.
+        :param descending: Whether to sort from the largest value down.
+        :param limit: The maximum number of results. If 0 or None, don't
+        limit the results at all.
+        :param offset: The number of results to skip before the first one.
+        :param plan: A `QueryPlan` from `explain` to record the rows examined
+        and the order of the row checks in, or None.
         :return: A stream of matching `CloseApproach` objects.
+        :raise ValueError: If `limit` or `offset` is negative.
         """
-        for approach in self._approaches:
-            if all(f(approach) for f in filters):
-                yield approach
+        if (limit or 0) < 0 or offset < 0:
+            raise ValueError("The limit and the offset can't be negative.")
+        stop = offset + limit if limit else None
+        exact, candidates, residual = self._select(tuple(filters))
+        index = None if sort_by is None else self._sorted_indexes.get(sort_by)
+        if sort_by is None or index is not None:
+            rows = self._scan_rows(exact, candidates, residual,
+                                   None if index is None
+                                   else index.scan(self._columns, descending),
+                                   plan)
+            return map(self._approaches.__getitem__,
+                       itertools.islice(rows, offset, stop))
+
+        matches = self._scan(exact, candidates, residual, plan=plan)
+        key = rank_key(sort_by, descending)
+        if stop:
+            rank = heapq.nlargest if descending else heapq.nsmallest
+            return iter(rank(stop, matches, key=key)[offset:])
+        return iter(sorted(matches, key=key, reverse=descending)[offset:])
+
+    def aquery(self, filters=(), sort_by=None, descending=False, limit=None,
+               offset=0, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE,
+               executor=None):
+        """Query approaches from asyncio code, in batches.
+
+        The query - selecting, sorting and scanning the rows - runs in an
+        executor, a batch at a time, so the event loop is never blocked by
+        it, and batches are only computed ahead of the consumer up to
+        `queue_size` (see `streaming.stream_batches`). Closing the generator
+        or cancelling its consumer stops the scan.
+
+        The query reads the snapshot of the database taken when `aquery` is
+        called, so approaches may be appended while it runs.
+
+            async for batch in db.aquery(filters, batch_size=500):
+                await response.write(...)
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param sort_by: An attribute to sort by, as for `query`.
+        :param descending: Whether to sort from the largest value down.
+        :param limit: The maximum number of results, as for `query`.
+        :param offset: The number of results to skip, as for `query`.
+        :param batch_size: The maximum number of approaches in each batch.
+        :param queue_size: The maximum number of batches computed ahead.
+        :param executor: A `concurrent.futures.Executor`, or None for the
+        loop's default executor.
+        :return: An async generator of non-empty lists of matching
+        `CloseApproach` objects. It raises the errors of `query` when
+        iterated.
+        """
+        snapshot = self.snapshot()
+
+        def results():
+            yield from snapshot.query(filters, sort_by, descending, limit,
+                                      offset)
+        return stream_batches(results(), batch_size, queue_size, executor)
+
+    @_pinned
+    def paginate(self, filters=(), sort_by=None, descending=False, size=10,
+                 offset=0, token=None):
+        """Fetch a page of the results of a query, and a token for the next.
+
+        The token records the last row of the page, and the next page resumes
+        the scan right after it: in internal order, from the next candidate
+        row, and in sorted order, from the row's position in the sorted index
+        on `sort_by`, found by binary search. A page then costs about as much
+        as the first one, however deep it is. A query sorted by an attribute
+        without a sorted index ranks the matches after the token's position
+        in a bounded heap instead, which scans the matches but never sorts
+        them all: each CLI `--resume` runs in a new process, where building
+        the index would cost more than the page. A database kept for many
+        pages, like the shell's, can build it with `create_sorted_index`.
+
+        Row IDs don't change when approaches are added, so a token stays
+        valid after `append_approaches`; the new approaches that come after
+        its position appear in the later pages.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param sort_by: An attribute to sort by, as for `query`.
+        :param descending: Whether to sort from the largest value down.
+        :param size: The maximum number of results in the page.
+        :param offset: The number of results to skip before the first page.
+        It's ignored when resuming from a token.
+        :param token: The token returned with the previous page of the same
+        query, or None for the first page.
+        :return: A tuple `(approaches, token)`: a list of at most `size`
+        matching `CloseApproach` objects, and the token of the next page, or
+        None if there are no more results.
+        :raise cursors.TokenError: If the token is malformed or was issued
+        for another query.
+        """
+        if size < 1 or offset < 0:
+            raise ValueError("The page size must be positive, and the offset "
+                             "can't be negative.")
+        filters = tuple(filters)
+        query = query_fingerprint('memory', filters, sort_by, descending)
+        after = None
+        if token is not None:
+            after, offset = decode_token(token, query)['row'], 0
+            if after >= self._size:
+                raise TokenError("This resume token is past the last row.")
+        exact, candidates, residual = self._select(filters)
+        stop = offset + size + 1
+
+        index = None if sort_by is None else self._sorted_indexes.get(sort_by)
+        if sort_by is not None and index is None:
+            rows = self._scan_rows(exact, candidates, residual)
+            key = self._row_rank_key(sort_by, descending)
+            if after is not None:
+                # Keep the rows ranked after the token's row; the keys of
+                # different rows are never equal.
+                bound = key(after)
+                rows = (row for row in rows
+                        if (key(row) < bound if descending
+                            else key(row) > bound))
+            rank = heapq.nlargest if descending else heapq.nsmallest
+            rows = rank(stop, rows, key=key)[offset:]
+        else:
+            scan = None
+            if sort_by is not None:
+                start = 0 if after is None else \
+                    index.position(self._columns, after, descending)
+                scan = index.scan(self._columns, descending, start)
+            elif after is not None and candidates is None:
+                scan = range(after + 1, self._size)
+            elif after is not None:
+                # Drop the rows up to `after` from the selection.
+                mask = ~((1 << (after + 1)) - 1)
+                exact, candidates = exact & mask, candidates & mask
+            rows = list(itertools.islice(
+                self._scan_rows(exact, candidates, residual, scan), offset,
+                stop))
+
+        page = [self._approaches[row] for row in rows[:size]]
+        if len(rows) <= size:
+            return page, None
+        return page, encode_token(query, row=rows[size - 1])
+
+    def _row_rank_key(self, sort_by, descending):
+        """Build a key function on row IDs in the order of a sorted index.
+
+        Rows with a missing value come last. Whichever the direction, rows
+        with equal values, or with missing ones, come in row order.
+
+        :param sort_by: One of the keys of `SORT_KEYS`.
+        :param descending: Whether the key is for `heapq.nlargest`.
+        :return: A 1-argument key function on a row ID.
+        """
+        get = self._columns.getter(sort_by)
+
+        def key(row):
+            value = get(row)
+            if value != value:
+                return (False, 0, -row) if descending else (True, 0, row)
+            return (True, value, -row) if descending else (False, value, row)
+        return key
+
+    def _scan(self, exact, candidates, residual, rows=None, plan=None):
+        """Generate the approaches of the rows selected by `_select`.
+
+        :param exact: A bitmap of the rows known to match.
+        :param candidates: A bitmap of the rows that might match, or None.
+        :param residual: The filters to evaluate on inexact candidate rows.
+        :param rows: An iterable of row IDs to visit in order, or None to
+        visit the candidate rows in internal order.
+        :param plan: A `QueryPlan` to record the rows examined in, or None.
+        :return: An iterator of the matching `CloseApproach` objects.
+        """
+        return map(self._approaches.__getitem__,
+                   self._scan_rows(exact, candidates, residual, rows, plan))
+
+    def _scan_rows(self, exact, candidates, residual, rows=None, plan=None):
+        """Generate the matching rows among those selected by `_select`.
+
+        :param exact: A bitmap of the rows known to match.
+        :param candidates: A bitmap of the rows that might match, or None.
+        :param residual: The filters to evaluate on inexact candidate rows.
+        :param rows: An iterable of row IDs to visit in order, or None to
+        visit the candidate rows in internal order.
+        :param plan: A `QueryPlan` to record the rows examined in, or None.
+        :yield: The row IDs of the matching approaches.
+        """
+        matches = self._row_matcher(residual)
+        if plan is not None:
+            plan.check_orders = getattr(matches, 'history', [])
+        if candidates is None:
+            if rows is None:
+                rows = range(self._size)
+            if plan is not None:
+                rows = plan.examine(rows)
+            for row in rows:
+                if matches(row):
+                    yield row
+            return
+
+        size = self._bitmaps.size
+        exact = bitmap_bytes(exact, size)
+        if rows is None:
+            rows = iter_rows(candidates)
+        else:
+            candidates = bitmap_bytes(candidates, size)
+            rows = (row for row in rows if has_row(candidates, row))
+        if plan is not None:
+            rows = plan.examine(rows)
+        for row in rows:
+            if has_row(exact, row) or matches(row):
+                yield row
+
+    def _row_matcher(self, filters):
+        """Build a single predicate on row IDs for a collection of filters.
+
+        With several checks, the order in which they run is learned from the
+        rows themselves (see `adaptive.AdaptiveChecks`).
+
+        :param filters: A collection of filters.
+        :return: A 1-argument callable on a row ID.
+        """
+        checks = self._row_checks(filters)
+        if not checks:
+            return lambda row: True
+        if len(checks) == 1:
+            return checks[0][0]
+        return AdaptiveChecks(*zip(*checks))
+
+    def _row_checks(self, filters):
+        """Translate filters into predicates on row IDs.
+
+        Filters on an approach column are evaluated on the column itself (a
+        lower and an upper bound together, in a single comparison), and
+        expression trees with the predicate built by `_select`; any other
+        filter is evaluated on the row's `CloseApproach`.
+
+        :param filters: A collection of filters.
+        :return: A list of `(check, label)` tuples: a 1-argument callable on
+        a row ID, and a description of the filters it checks.
+        """
+        # A lower and an upper bound on the same column become one check.
+        lower, upper = {}, {}
+        for f in filters:
+            attribute = getattr(f, 'attribute', None)
+            if attribute is not None and f.op in LOWER_BOUNDS:
+                lower.setdefault(attribute, f)
+            elif attribute is not None and f.op in UPPER_BOUNDS:
+                upper.setdefault(attribute, f)
+        intervals = {lower[attribute]: upper[attribute]
+                     for attribute in lower.keys() & upper.keys()}
+        skipped = set(intervals.values())
+
+        approaches, checks = self._approaches, []
+        for f in filters:
+            if f in skipped:
+                continue
+            if f in intervals:
+                checks.append((self._columns.interval_predicate(
+                    f, intervals[f]), f"{f} and {intervals[f]}"))
+                continue
+            check = getattr(f, 'row_check', None) or \
+                self._columns.predicate(f)
+            if check is None:
+                check = (lambda f: lambda row: f(approaches[row]))(f)
+            checks.append((check, str(f)))
+        return checks
+
+    @_pinned
+    def count(self, filters=(), plan=None):
+        """Count the close approaches that match a collection of filters.
+
+        Filters that can't all match count zero at once. Date-only filters
+        are counted from the width of their day range in the bitmap index.
+        When every filter is answered exactly by the bitmap index or by the
+        NEOs, the count is the popcount of the selected rows.
+        Otherwise, only the rows that might match are checked, and no result
+        objects or strings are produced.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param plan: A `QueryPlan` from `explain` to record the rows examined
+        and the order of the row checks in, or None.
+        :return: The number of matching `CloseApproach` objects.
+        """
+        filters = normalize_filters(filters)
+        if plan is not None:
+            plan.examined = 0
+        if filters is None:
+            return 0
+        width = self._bitmaps.count_dates(filters)
+        if width is not None:
+            return width
+
+        exact, candidates, residual = self._select(filters)
+        rows = range(self._size) if candidates is None \
+            else iter_rows(candidates & ~exact)
+        matches = self._row_matcher(residual)
+        if plan is not None:
+            rows = plan.examine(rows)
+            plan.check_orders = getattr(matches, 'history', [])
+        return popcount(exact) + sum(map(bool, map(matches, rows)))
+
+    @_pinned
+    def aggregate(self, filters=(), group_by=None, metrics=METRICS):
+        """Summarize the close approaches that match a collection of filters.
+
+        The matching rows are folded into running statistics in a single
+        pass, one `Accumulator` per group, reading their distances, velocities,
+        times and NEOs from the columns: no `CloseApproach` is built, except
+        to evaluate filters that can't be evaluated on the columns.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param group_by: None, or one of 'day', 'month', 'year', 'neo' or
+        'hazardous'.
+        :param metrics: A collection of metric names from
+        `aggregates.METRICS`.
+        :return: A dictionary mapping each metric to its value if `group_by`
+        is None. Otherwise, a dictionary mapping each group, in sorted order,
+        to such a dictionary.
+        """
+        rows = self._scan_rows(*self._select(tuple(filters)))
+        return summarize_rows(rows, self._columns, self._neos, group_by,
+                              metrics)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,118 @@
+"""Describe how a database answers a query, and what it cost.
+
+A `QueryPlan` is filled in by the `explain` method of an `NEODatabase` (or a
+`SQLiteNEODatabase`): the filters as given and as normalized, where the
+approaches come from, the access path taken for each filter and for the sort
+order, and how many rows are known to match, might match, and are estimated
+to match.
+
+To analyze a query, the plan is then passed to `query` or `count`, which
+record the rows examined and the order in which row checks ran, and the
+caller records how long each stage - planning, filtering, formatting and
+writing - took with `record`.
+
+The main module prints plans with `--explain` and the shell's `explain`
+command.
+"""
+import time
+
+from adaptive import describe_order
+
+
+# The stages of a query that are timed, in display order.
+STAGES = ('planning', 'filtering', 'formatting', 'writing')
+
+
+class QueryPlan:
+    """The plan of a query, and what happened when it ran."""
+
+    def __init__(self, filters):
+        """Create a new, empty `QueryPlan`.
+
+        :param filters: The filters of the query, as given.
+        """
+        self.filters = [str(f) for f in filters]
+        # The filters as simplified by `normalize_filters`, or None if they
+        # can't all match.
+        self.normalized = []
+        # Where the approaches come from, if not the whole data set.
+        self.source = None
+        # One line per filter (or group of filters) on how it is answered.
+        self.access = []
+        # How the results are ordered.
+        self.order = 'internal order'
+        self.total = None
+        self.exact = None
+        self.candidates = None
+        self.estimated = None
+        # Filled in when the query runs.
+        self.examined = None
+        self.returned = None
+        self.check_orders = []
+        self.timings = {}
+
+    def record(self, stage, start):
+        """Add the time elapsed since `start` to a stage.
+
+        :param stage: One of `STAGES`.
+        :param start: A value of `time.perf_counter()`.
+        :return: The current value of `time.perf_counter()`, to start the
+        next stage.
+        """
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + now - start
+        return now
+
+    def examine(self, rows):
+        """Count the rows of an iterable in `examined` as they are consumed.
+
+        :param rows: An iterable of row IDs.
+        :yield: The same row IDs.
+        """
+        self.examined = 0
+        for row in rows:
+            self.examined += 1
+            yield row
+
+    def lines(self):
+        """Describe the plan, one line at a time.
+
+        :return: A list of strings.
+        """
+        lines = [f"Filters:     {', '.join(self.filters) or 'none'}"]
+        if self.normalized is None:
+            lines.append("Normalized:  the filters can't all match")
+        else:
+            normalized = ', '.join(self.normalized) or 'none'
+            lines.append(f"Normalized:  {normalized}")
+        if self.source:
+            lines.append(f"Source:      {self.source}")
+        if self.normalized is None:
+            steps = ['none, no row can match']
+        else:
+            steps = self.access or ['full scan']
+        for position, step in enumerate(steps):
+            lines.append(f"{'Access:' if not position else '':13}{step}")
+        lines.append(f"Order:       {self.order}")
+        if self.total is not None:
+            rows = [f"{self.total} in total"]
+            if self.exact is not None:
+                rows.append(f"{self.exact} known to match")
+            if self.candidates is not None:
+                rows.append(f"{self.candidates} to check")
+            lines.append(f"Rows:        {', '.join(rows)}")
+        if self.estimated is not None:
+            lines.append(f"Estimated:   {self.estimated} rows")
+        if self.examined is not None:
+            lines.append(f"Examined:    {self.examined} rows")
+        if self.returned is not None:
+            lines.append(f"Returned:    {self.returned} rows")
+        for rows, labels, pass_rates, costs in self.check_orders:
+            lines.append(f"Checks:      after {rows} rows: "
+                         f"{describe_order(labels, pass_rates, costs)}")
+        if self.timings:
+            timings = ', '.join(f"{stage} {self.timings[stage] * 1e3:.2f}ms"
+                                for stage in STAGES
+                                if stage in self.timings)
+            lines.append(f"Time:        {timings}")
+        return lines
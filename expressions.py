@@ -0,0 +1,324 @@
+"""Parse boolean filter expressions, such as the `--where` option of `query`.
+
+An expression combines comparisons on the attributes of close approaches with
+AND, OR, NOT and parentheses:
+
+    hazardous OR diameter > 1 km AND NOT velocity < 5
+
+NOT binds tighter than AND, which binds tighter than OR, so the example above
+reads `hazardous OR (diameter > 1 AND (NOT velocity < 5))`. Keywords are
+case-insensitive.
+
+Each comparison names an attribute - `date`, `distance` (in au), `velocity`
+(in km/s), `diameter` (in km) or `hazardous` - then one of `<`, `<=`, `>`,
+`>=`, `=` (or `==`) and `!=`, then a value: a date in YYYY-MM-DD format, a
+number optionally followed by its unit, or `true` or `false`. A bare
+`hazardous` means `hazardous = true`.
+
+The `parse_expression` function compiles an expression into a tree of
+`AllOf`, `AnyOf` and `NoneOf` nodes over the `AttributeFilter`s of the
+`filters` module. A tree is itself a filter: calling it on a `CloseApproach`
+evaluates its branches with short-circuiting, cheapest first. An
+`NEODatabase` additionally answers each branch from its indexes and combines
+the selected rows with set operations, so only rows that no index can decide
+are evaluated.
+"""
+import datetime
+import operator
+import re
+
+from filters import (CalendarDayFilter, DiameterFilter, DistanceFilter,
+                     HazardousFilter, VelocityFilter)
+
+
+class ExpressionError(ValueError):
+    """A filter expression can't be parsed."""
+
+
+# The filter class built for a comparison on each attribute, and the unit
+# that may follow a number compared with it.
+ATTRIBUTES = {
+    'date': (CalendarDayFilter, None),
+    'distance': (DistanceFilter, 'au'),
+    'velocity': (VelocityFilter, 'km/s'),
+    'diameter': (DiameterFilter, 'km'),
+    'hazardous': (HazardousFilter, None),
+}
+
+COMPARATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+BOOLEANS = {'true': True, 'yes': True, 'false': False, 'no': False}
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<date>\d{4}-\d{2}-\d{2})
+      | (?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+      | (?P<comparator><=|>=|==|!=|<|>|=)
+      | (?P<paren>[()])
+      | (?P<word>[A-Za-z_][A-Za-z_/]*)
+    )""", re.VERBOSE)
+
+
+class Expression:
+    """A general superclass for the nodes of a filter expression tree.
+
+    Like an `AttributeFilter`, a node is a 1-argument callable on a
+    `CloseApproach`. It has no `attribute`, so code that only understands
+    plain filters evaluates it row by row. A node whose every leaf compares
+    an attribute of the NEO has `level = 'neo'` and can be evaluated once per
+    NEO with `matches_neo`.
+    """
+
+    attribute = None
+
+    def __init__(self, children):
+        """Create a new node.
+
+        :param children: A collection of child nodes or `AttributeFilter`s.
+        The cheapest children come first.
+        """
+        self.children = sorted(children, key=cost)
+        levels = {getattr(child, 'level', None) for child in self.children}
+        self.level = 'neo' if levels == {'neo'} else 'approach'
+
+    def leaves(self):
+        """Generate the `AttributeFilter`s of this tree, in order."""
+        for child in self.children:
+            if isinstance(child, Expression):
+                yield from child.leaves()
+            else:
+                yield child
+
+    def __str__(self):
+        """Describe the node in the syntax of `parse_expression`."""
+        text = f" {self.keyword} ".join(str(child) for child in self.children)
+        return f"({text})"
+
+    def __repr__(self):
+        """Represent the node in string format."""
+        children = ', '.join(repr(child) for child in self.children)
+        return f"{self.__class__.__name__}({children})"
+
+
+class AllOf(Expression):
+    """Match the approaches that satisfy every child (AND)."""
+
+    keyword = 'AND'
+
+    def __call__(self, approach):
+        """Invoke `self(approach)`."""
+        return all(child(approach) for child in self.children)
+
+    def matches_neo(self, neo):
+        """Evaluate this node on a `NearEarthObject` instead of an approach.
+
+        :param neo: A `NearEarthObject`.
+        :return: Whether every approach of this NEO satisfies the node.
+        """
+        return all(child.matches_neo(neo) for child in self.children)
+
+
+class AnyOf(Expression):
+    """Match the approaches that satisfy at least one child (OR)."""
+
+    keyword = 'OR'
+
+    def __call__(self, approach):
+        """Invoke `self(approach)`."""
+        return any(child(approach) for child in self.children)
+
+    def matches_neo(self, neo):
+        """Evaluate this node on a `NearEarthObject` instead of an approach.
+
+        :param neo: A `NearEarthObject`.
+        :return: Whether this NEO satisfies at least one child.
+        """
+        return any(child.matches_neo(neo) for child in self.children)
+
+
+class NoneOf(Expression):
+    """Match the approaches that satisfy no child (NOT).
+
+    The parser only builds `NoneOf` nodes with a single child. Several
+    children are described joined by OR, as in `NOT (a OR b)`.
+    """
+
+    keyword = 'OR'
+
+    def __str__(self):
+        """Describe the node in the syntax of `parse_expression`."""
+        if len(self.children) == 1:
+            return f"NOT {self.children[0]}"
+        return f"NOT {super().__str__()}"
+
+    def __call__(self, approach):
+        """Invoke `self(approach)`."""
+        return not any(child(approach) for child in self.children)
+
+    def matches_neo(self, neo):
+        """Evaluate this node on a `NearEarthObject` instead of an approach.
+
+        :param neo: A `NearEarthObject`.
+        :return: Whether this NEO satisfies no child.
+        """
+        return not any(child.matches_neo(neo) for child in self.children)
+
+
+def cost(node):
+    """Estimate the relative cost of evaluating a node on one approach.
+
+    :param node: A node of an expression tree, or an `AttributeFilter`.
+    :return: The number of comparisons in the node.
+    """
+    if isinstance(node, Expression):
+        return sum(cost(child) for child in node.children)
+    return 1
+
+
+def tokenize(text):
+    """Split an expression into tokens.
+
+    :param text: An expression.
+    :return: A list of `(kind, text)` tuples, where `kind` is a group name
+    of `_TOKEN`.
+    """
+    tokens, position, text = [], 0, text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise ExpressionError(f"Unexpected {text[position:].strip()!r} "
+                                  f"in {text!r}.")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """A recursive-descent parser over the tokens of an expression."""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        """Return the next token, or `(None, None)` at the end."""
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def take(self):
+        """Consume and return the next token."""
+        token = self.peek()
+        if token[0] is None:
+            raise ExpressionError(f"Unexpected end of {self.text!r}.")
+        self.position += 1
+        return token
+
+    def keyword(self, word):
+        """Consume the next token if it's the keyword `word`."""
+        kind, text = self.peek()
+        if kind == 'word' and text.upper() == word:
+            self.position += 1
+            return True
+        return False
+
+    def parse(self):
+        """Parse the whole expression."""
+        node = self.any_of()
+        kind, text = self.peek()
+        if kind is not None:
+            raise ExpressionError(f"Unexpected {text!r} in {self.text!r}.")
+        return node
+
+    def any_of(self):
+        children = [self.all_of()]
+        while self.keyword('OR'):
+            children.append(self.all_of())
+        return children[0] if len(children) == 1 else AnyOf(children)
+
+    def all_of(self):
+        children = [self.negation()]
+        while self.keyword('AND'):
+            children.append(self.negation())
+        return children[0] if len(children) == 1 else AllOf(children)
+
+    def negation(self):
+        if self.keyword('NOT'):
+            return NoneOf([self.negation()])
+        if self.peek() == ('paren', '('):
+            self.take()
+            node = self.any_of()
+            if self.take() != ('paren', ')'):
+                raise ExpressionError(f"Missing ')' in {self.text!r}.")
+            return node
+        return self.comparison()
+
+    def comparison(self):
+        kind, name = self.take()
+        if kind != 'word' or name.lower() not in ATTRIBUTES:
+            raise ExpressionError(f"Expected one of {', '.join(ATTRIBUTES)} "
+                                  f"in {self.text!r}, not {name!r}.")
+        attribute = name.lower()
+        cls, unit = ATTRIBUTES[attribute]
+        if self.peek()[0] != 'comparator':
+            if attribute == 'hazardous':
+                return cls(True)
+            raise ExpressionError(f"Expected a comparison after {name!r} in "
+                                  f"{self.text!r}.")
+        op = COMPARATORS[self.take()[1]]
+        value = self.value(attribute, unit)
+
+        if attribute == 'hazardous':
+            if op is operator.eq:
+                return cls(value)
+            if op is operator.ne:
+                return cls(not value)
+            raise ExpressionError(f"hazardous can only be compared with = or "
+                                  f"!= in {self.text!r}.")
+        if op is operator.ne:
+            return NoneOf([cls(operator.eq, value)])
+        return cls(op, value)
+
+    def value(self, attribute, unit):
+        kind, text = self.take()
+        if attribute == 'hazardous':
+            if kind == 'word' and text.lower() in BOOLEANS:
+                return BOOLEANS[text.lower()]
+            raise ExpressionError(f"Expected true or false in {self.text!r}, "
+                                  f"not {text!r}.")
+        if attribute == 'date':
+            if kind == 'date':
+                try:
+                    return datetime.datetime.strptime(text, '%Y-%m-%d').date()
+                except ValueError:
+                    pass
+            raise ExpressionError(f"Expected a date in YYYY-MM-DD format in "
+                                  f"{self.text!r}, not {text!r}.")
+        if kind != 'number':
+            raise ExpressionError(f"Expected a number in {self.text!r}, not "
+                                  f"{text!r}.")
+        if self.peek()[0] == 'word' and self.peek()[1].lower() == unit:
+            self.take()
+        return float(text)
+
+
+def parse_expression(text):
+    """Compile a filter expression into a filter.
+
+    :param text: An expression, as described in the module docstring.
+    :return: An `Expression` tree, or a single `AttributeFilter` if the
+    expression is a single comparison.
+    :raise ExpressionError: If the expression can't be parsed.
+    """
+    if not text.strip():
+        raise ExpressionError("The expression is empty.")
+    return _Parser(text).parse()
@@ -11,6 +11,18 @@ The `load_approaches` function extracts close approach data from a JSON file,
 formatted as described in the project instructions, into a collection of
 `CloseApproach` objects.
 
+Designations are interned as they are loaded (see `sys.intern`): the
+designation of every `CloseApproach` is the same string object as the
+designation of its `NearEarthObject`, rather than a copy parsed from each JSON
+record. The approaches then only hold a reference to it, and linking them to
+their NEOs by designation compares the strings by identity.
+
+Both functions optionally take a collection of filters, as from
+`create_filters`, and drop the rows that fail them while parsing - before any
+`CloseApproach` is built - so that memory and load time scale with the subset
+that is kept. The `prune_neos` function then drops the NEOs left without any
+approach.
+
 The main module calls these functions with the arguments provided at the
 command line, and uses the resulting collections to build an `NEODatabase`.
 
@@ -18,7 +30,10 @@ You'll edit this file in Task 2.
 """
 import csv
 import json
+import sys
 
+from filters import normalize_filters
+from helpers import cd_to_minutes, minutes_to_ordinal
 from models import NearEarthObject, CloseApproach
 
 import pathlib
@@ -29,48 +44,103 @@ TEST_CAD_FILE = here / 'tests' / 'test-cad-2020.json'
 TEST_NEO_FILE = here / 'tests' / 'test-neos-2020.csv'
 
 
-def load_neos(neo_csv_path):
+def load_neos(neo_csv_path, filters=()):
     """
     Read near-Earth object information from a CSV file.
 
     :param neo_csv_path: A path to a CSV file containing data about
     near-Earth objects.
+    :param filters: A collection of filters. NEOs that fail a NEO-level
+    filter (on diameter or hazardousness) are left out; other filters are
+    ignored.
     :return: A collection of `NearEarthObject`s.
     """
+    neo_filters = _neo_filters(filters)
     neos = []
     # print("####################START##########################")
     with open(neo_csv_path, 'r') as infile:
         reader = csv.DictReader(infile)
         for elem in reader:
             # print(elem)
-            neo = NearEarthObject(elem['pdes'], elem['name'],
+            neo = NearEarthObject(sys.intern(elem['pdes']), elem['name'],
                                   elem['diameter'], elem['pha'])
             # print(neo.__repr__())
-            neos.append(neo)
+            if all(f.matches_neo(neo) for f in neo_filters):
+                neos.append(neo)
     # print(neos)
     return neos
 
 
-def load_approaches(cad_json_path):
+def load_approaches(cad_json_path, filters=(), neos=None):
     """
     Read close approach data from a JSON file.
 
+    Filters on the date, distance or velocity of an approach are checked on
+    the parsed fields of each record, cheapest first, and failing records are
+    skipped. Filters on the NEO are only applied when `neos` is given; filters
+    with no `attribute` are ignored.
+
     :param cad_json_path: A path to a JSON file containing data
     about close approaches.
+    :param filters: A collection of filters.
+    :param neos: A collection of `NearEarthObject`s, or None. If given, only
+    the approaches of those NEOs that pass the NEO-level filters are kept.
     :return: A collection of `CloseApproach`es.
     """
+    filters = normalize_filters(filters)
+    if filters is None:
+        return []
+    by_attribute = {}
+    for f in filters:
+        by_attribute.setdefault(getattr(f, 'attribute', None), []).append(f)
+    date_filters = by_attribute.get('date', ())
+    distance_filters = by_attribute.get('distance', ())
+    velocity_filters = by_attribute.get('velocity', ())
+    designations = None
+    if neos is not None:
+        neo_filters = _neo_filters(filters)
+        designations = {neo.designation for neo in neos
+                        if all(f.matches_neo(neo) for f in neo_filters)}
+
     approaches = []
     with open(cad_json_path, 'r') as infile:
         contents = json.load(infile)
         for elem in contents['data']:
             designation = elem[0]
-            time = elem[3]
-            distance = elem[4]
-            velocity = elem[7]
+            if designations is not None and designation not in designations:
+                continue
+            distance = float(elem[4])
+            if not all(f.matches_value(distance) for f in distance_filters):
+                continue
+            velocity = float(elem[7])
+            if not all(f.matches_value(velocity) for f in velocity_filters):
+                continue
+            time = cd_to_minutes(elem[3])
+            if date_filters:
+                day = minutes_to_ordinal(time)
+                if not all(f.matches_value(day) for f in date_filters):
+                    continue
 
             # print(designation, time, distance, velocity)
-            ca = CloseApproach(designation, time, distance, velocity)
+            ca = CloseApproach(sys.intern(designation), time, distance,
+                               velocity)
             approaches.append(ca)
             # print(approaches)
 
     return approaches
+
+
+def prune_neos(neos, approaches):
+    """Drop the NEOs that have no close approach.
+
+    :param neos: A collection of `NearEarthObject`s.
+    :param approaches: A collection of `CloseApproach`es.
+    :return: A list of the NEOs with at least one approach, in order.
+    """
+    designations = {approach._designation for approach in approaches}
+    return [neo for neo in neos if neo.designation in designations]
+
+
+def _neo_filters(filters):
+    """Return the NEO-level filters of a collection of filters."""
+    return [f for f in filters if getattr(f, 'level', None) == 'neo']
@@ -11,6 +11,12 @@ from a comparator (from the `operator` module), a reference value, and a class
 method `get` that subclasses can override to fetch an attribute of interest
 from the supplied `CloseApproach`.
 
+`DistanceFilter`, `VelocityFilter`, `DiameterFilter`, `CalendarDayFilter` and
+`HazardousFilter` take any comparator, for use by the `expressions` module.
+
+The `normalize_filters` function merges the bounds on each attribute into a
+single interval, and detects sets of filters that can't match anything.
+
 The `limit` function simply limits the maximum number of values produced by an
 iterator.
 
@@ -21,6 +27,17 @@ import operator
 from itertools import islice
 
 
+# The symbol of each comparator, to describe filters.
+SYMBOLS = {
+    operator.lt: '<',
+    operator.le: '<=',
+    operator.gt: '>',
+    operator.ge: '>=',
+    operator.eq: '=',
+    operator.ne: '!=',
+}
+
+
 class UnsupportedCriterionError(NotImplementedError):
     """A filter criterion is unsupported."""
 
@@ -39,8 +56,20 @@ class AttributeFilter:
 
     Concrete subclasses can override the `get` classmethod to provide custom
     behavior to fetch a desired attribute from the given `CloseApproach`.
+
+    Concrete subclasses also name the attribute they compare in the
+    `attribute` class attribute (one of 'date', 'distance', 'velocity',
+    'diameter' or 'hazardous'), so that the `NEODatabase` can answer them from
+    its indexes. Filters with no `attribute` are always evaluated row by row.
+
+    Filters on an attribute of the NEO rather than of the approach itself set
+    `level = 'neo'` and override the `get_neo` classmethod, so that they can
+    be evaluated once per NEO with `matches_neo`.
     """
 
+    attribute = None
+    level = 'approach'
+
     def __init__(self, op, value):
         """Construct a new `AttributeFilter` from an binary predicate and a...
 
@@ -74,13 +103,93 @@ class AttributeFilter:
         """
         raise UnsupportedCriterionError
 
+    @classmethod
+    def get_neo(cls, neo):
+        """Get an attribute of interest from a near-Earth object.
+
+        NEO-level subclasses must override this method to get an attribute of
+        interest from the supplied `NearEarthObject`.
+
+        :param neo: A `NearEarthObject` on which to evaluate this filter.
+        :return: The value of an attribute of interest, comparable to
+        `self.value` via `self.op`.
+        """
+        raise UnsupportedCriterionError
+
+    def matches_value(self, value):
+        """Evaluate this filter on a value of its attribute.
+
+        This lets rows be filtered before any `CloseApproach` is built.
+
+        :param value: A value of the attribute named by `attribute`.
+        :return: Whether `value OP self.value`.
+        """
+        return self.op(value, self.value)
+
+    def matches_neo(self, neo):
+        """Evaluate this filter on a `NearEarthObject` instead of an approach.
+
+        :param neo: A `NearEarthObject`.
+        :return: Whether every approach of this NEO satisfies the filter.
+        """
+        return self.op(self.get_neo(neo), self.value)
+
+    def __str__(self):
+        """Describe the filter as a comparison, e.g. `distance <= 0.1`."""
+        name = self.attribute or self.__class__.__name__
+        symbol = SYMBOLS.get(self.op, self.op.__name__)
+        return f"{name} {symbol} {self.value}"
+
     def __repr__(self):
         """Represent the AttributeFilter in string format."""
         return f"{self.__class__.__name__}(op=operator.{self.op.__name__}, " \
                f"value={self.value})"
 
 
-class DateFilter(AttributeFilter):
+class CalendarDayFilter(AttributeFilter):
+    """A general superclass for filters on the day of a close approach.
+
+    Close approaches store their time as an integer number of minutes, so
+    these filters compare integer day ordinals (as in `date.toordinal`)
+    instead of building a `date` for every approach. The reference `date`
+    stays available as `value`, and its ordinal is kept in `ordinal`.
+    """
+
+    attribute = 'date'
+
+    def __init__(self, op, value):
+        """Construct a new `CalendarDayFilter`.
+
+        :param op: A 2-argument predicate comparator (such as `operator.le`).
+        :param value: The reference `date` to compare against.
+        """
+        super().__init__(op, value)
+        self.ordinal = value.toordinal()
+
+    def __call__(self, approach):
+        """Invoke `self(approach)`."""
+        return self.op(approach.day, self.ordinal)
+
+    @classmethod
+    def get(cls, approach):
+        """Get an attribute of interest from a close approach.
+
+        :param approach: A `CloseApproach` on which to evaluate this filter.
+        :return: The day ordinal of the approach, comparable to
+        `self.ordinal` via `self.op`.
+        """
+        return approach.day
+
+    def matches_value(self, value):
+        """Evaluate this filter on a day ordinal.
+
+        :param value: A day ordinal, as from `date.toordinal`.
+        :return: Whether `value OP self.ordinal`.
+        """
+        return self.op(value, self.ordinal)
+
+
+class DateFilter(CalendarDayFilter):
     """
     Return close approaches on the given date.
 
@@ -103,13 +212,13 @@ class DateFilter(AttributeFilter):
         """Get an attribute of interest from a close approach.
 
         :param approach: A `CloseApproach` on which to evaluate this filter.
-        :return: The value of an attribute of interest, comparable to
-        `self.value` via `self.op`.
+        :return: The day ordinal of the approach, comparable to
+        `self.ordinal` via `self.op`.
         """
-        return approach.time.date()
+        return approach.day
 
 
-class StartDateFilter(AttributeFilter):
+class StartDateFilter(CalendarDayFilter):
     """
     Return approaches on or after the given date.
 
@@ -130,13 +239,13 @@ class StartDateFilter(AttributeFilter):
         """Get an attribute of interest from a close approach.
 
         :param approach: A `CloseApproach` on which to evaluate this filter.
-        :return: The value of an attribute of interest, comparable to
-        `self.value` via `self.op`.
+        :return: The day ordinal of the approach, comparable to
+        `self.ordinal` via `self.op`.
         """
-        return approach.time.date()
+        return approach.day
 
 
-class EndDateFilter(AttributeFilter):
+class EndDateFilter(CalendarDayFilter):
     """
     Return close approaches on or before the given date.
 
@@ -157,10 +266,10 @@ class EndDateFilter(AttributeFilter):
         """Get an attribute of interest from a close approach.
 
         :param approach: A `CloseApproach` on which to evaluate this filter.
-        :return: The value of an attribute of interest, comparable to
-        `self.value` via `self.op`.
+        :return: The day ordinal of the approach, comparable to
+        `self.ordinal` via `self.op`.
         """
-        return approach.time.date()
+        return approach.day
 
 
 class MinimumDistanceFilter(AttributeFilter):
@@ -170,6 +279,8 @@ class MinimumDistanceFilter(AttributeFilter):
     farther away from Earth as the given distance.
     """
 
+    attribute = 'distance'
+
     def __init__(self, the_input):
         """
         Check if approach's distance >= the_input.
@@ -197,6 +308,8 @@ class MaximumDistanceFilter(AttributeFilter):
     nearer to Earth as the given distance.
     """
 
+    attribute = 'distance'
+
     def __init__(self, the_input):
         """
         Check if approach's distance <= the_input.
@@ -225,6 +338,8 @@ class MaximumVelocityFilter(AttributeFilter):
     velocity.
     """
 
+    attribute = 'velocity'
+
     def __init__(self, the_input):
         """
         Check if approach's velocity <= the_input.
@@ -253,6 +368,8 @@ class MinimumVelocityFilter(AttributeFilter):
     velocity
     """
 
+    attribute = 'velocity'
+
     def __init__(self, the_input):
         """
         Check if approach's velocity >= the_input.
@@ -280,6 +397,9 @@ class MaximumDiameterFilter(AttributeFilter):
     as large or smaller than the given size.
     """
 
+    attribute = 'diameter'
+    level = 'neo'
+
     def __init__(self, the_input):
         """
         Check if approach's velocity <= the_input.
@@ -296,7 +416,17 @@ class MaximumDiameterFilter(AttributeFilter):
         :return: The value of an attribute of interest, comparable to
         `self.value` via `self.op`.
         """
-        return approach.neo.diameter
+        return cls.get_neo(approach.neo)
+
+    @classmethod
+    def get_neo(cls, neo):
+        """Get an attribute of interest from a near-Earth object.
+
+        :param neo: A `NearEarthObject` on which to evaluate this filter.
+        :return: The value of an attribute of interest, comparable to
+        `self.value` via `self.op`.
+        """
+        return neo.diameter
 
 
 class MinimumDiameterFilter(AttributeFilter):
@@ -307,6 +437,9 @@ class MinimumDiameterFilter(AttributeFilter):
     as large or larger than the given size.
     """
 
+    attribute = 'diameter'
+    level = 'neo'
+
     def __init__(self, the_input):
         """
         Check if approach's velocity >= the_input.
@@ -323,12 +456,84 @@ class MinimumDiameterFilter(AttributeFilter):
         :return: The value of an attribute of interest, comparable to
         `self.value` via `self.op`.
         """
-        return approach.neo.diameter
+        return cls.get_neo(approach.neo)
+
+    @classmethod
+    def get_neo(cls, neo):
+        """Get an attribute of interest from a near-Earth object.
+
+        :param neo: A `NearEarthObject` on which to evaluate this filter.
+        :return: The value of an attribute of interest, comparable to
+        `self.value` via `self.op`.
+        """
+        return neo.diameter
+
+
+class DistanceFilter(AttributeFilter):
+    """Compare the nominal approach distance, in astronomical units."""
+
+    attribute = 'distance'
+
+    @classmethod
+    def get(cls, approach):
+        """Get an attribute of interest from a close approach.
+
+        :param approach: A `CloseApproach` on which to evaluate this filter.
+        :return: The value of an attribute of interest, comparable to
+        `self.value` via `self.op`.
+        """
+        return approach.distance
+
+
+class VelocityFilter(AttributeFilter):
+    """Compare the relative approach velocity, in kilometers per second."""
+
+    attribute = 'velocity'
+
+    @classmethod
+    def get(cls, approach):
+        """Get an attribute of interest from a close approach.
+
+        :param approach: A `CloseApproach` on which to evaluate this filter.
+        :return: The value of an attribute of interest, comparable to
+        `self.value` via `self.op`.
+        """
+        return approach.velocity
+
+
+class DiameterFilter(AttributeFilter):
+    """Compare the diameter of the NEO of an approach, in kilometers."""
+
+    attribute = 'diameter'
+    level = 'neo'
+
+    @classmethod
+    def get(cls, approach):
+        """Get an attribute of interest from a close approach.
+
+        :param approach: A `CloseApproach` on which to evaluate this filter.
+        :return: The value of an attribute of interest, comparable to
+        `self.value` via `self.op`.
+        """
+        return cls.get_neo(approach.neo)
+
+    @classmethod
+    def get_neo(cls, neo):
+        """Get an attribute of interest from a near-Earth object.
+
+        :param neo: A `NearEarthObject` on which to evaluate this filter.
+        :return: The value of an attribute of interest, comparable to
+        `self.value` via `self.op`.
+        """
+        return neo.diameter
 
 
 class HazardousFilter(AttributeFilter):
     """Return close approaches of NEOs who are or are not hazardous."""
 
+    attribute = 'hazardous'
+    level = 'neo'
+
     def __init__(self, the_input):
         """
         Check if approach's velocity == the_input.
@@ -345,7 +550,17 @@ class HazardousFilter(AttributeFilter):
         :return: The value of an attribute of interest, comparable to
         `self.value` via `self.op`.
         """
-        return approach.neo.hazardous
+        return cls.get_neo(approach.neo)
+
+    @classmethod
+    def get_neo(cls, neo):
+        """Get an attribute of interest from a near-Earth object.
+
+        :param neo: A `NearEarthObject` on which to evaluate this filter.
+        :return: The value of an attribute of interest, comparable to
+        `self.value` via `self.op`.
+        """
+        return neo.hazardous
 
 
 def create_filters(
@@ -420,16 +635,93 @@ def create_filters(
     return filters
 
 
-def limit(iterator, n=None):
+# The comparators of lower and upper bounds, and the attributes compared with
+# them that `normalize_filters` merges into intervals.
+LOWER_BOUNDS = (operator.ge, operator.gt)
+UPPER_BOUNDS = (operator.le, operator.lt)
+INTERVAL_ATTRIBUTES = ('date', 'distance', 'velocity', 'diameter')
+
+
+def _bound_key(approach_filter):
+    """Return the value compared by a filter on an interval attribute."""
+    if approach_filter.attribute == 'date':
+        return approach_filter.value.toordinal()
+    return approach_filter.value
+
+
+def normalize_filters(filters):
+    """Simplify a collection of filters before any approach is visited.
+
+    On each of the date, distance, velocity and diameter, only the tightest
+    lower bound and the tightest upper bound are kept - or a single equality,
+    which implies them. Repeated hazardous filters are merged too. Filters
+    that can't be compared this way (such as expression trees) are kept
+    unchanged, after the others.
+
+    :param filters: A collection of filters capturing user-specified
+    criteria.
+    :return: A list of filters matching the same approaches, or None if no
+    approach can match them all - for example, with a start date after the
+    end date.
+    """
+    equal, lower, upper, other = {}, {}, {}, []
+    hazardous = None
+    for f in filters:
+        attribute = getattr(f, 'attribute', None)
+        op = getattr(f, 'op', None)
+        if attribute == 'hazardous' and op is operator.eq:
+            if hazardous is not None and hazardous.value != f.value:
+                return None
+            hazardous = hazardous or f
+        elif attribute not in INTERVAL_ATTRIBUTES:
+            other.append(f)
+        elif op is operator.eq:
+            known = equal.setdefault(attribute, f)
+            if _bound_key(known) != _bound_key(f):
+                return None
+        elif op in LOWER_BOUNDS:
+            # The larger bound is tighter; on a tie, the strict one.
+            known = lower.get(attribute)
+            if known is None or (_bound_key(f), op is operator.gt) > \
+                    (_bound_key(known), known.op is operator.gt):
+                lower[attribute] = f
+        elif op in UPPER_BOUNDS:
+            known = upper.get(attribute)
+            if known is None or (_bound_key(f), op is operator.le) < \
+                    (_bound_key(known), known.op is operator.le):
+                upper[attribute] = f
+        else:
+            other.append(f)
+
+    normalized = []
+    for attribute in INTERVAL_ATTRIBUTES:
+        bounds = [f for f in (lower.get(attribute), upper.get(attribute))
+                  if f is not None]
+        if attribute in equal:
+            f = equal[attribute]
+            value = f.value if attribute != 'date' else f.value.toordinal()
+            if not all(bound.matches_value(value) for bound in bounds):
+                return None
+            bounds = [f]
+        elif len(bounds) == 2:
+            low, high = map(_bound_key, bounds)
+            strict = bounds[0].op is operator.gt or bounds[1].op is operator.lt
+            if low > high or (low == high and strict):
+                return None
+        normalized.extend(bounds)
+    if hazardous is not None:
+        normalized.append(hazardous)
+    return normalized + other
+
+
+def limit(iterator, n=None, offset=0):
     """Produce a limited stream of values from an iterator.
 
     If `n` is 0 or None, don't limit the iterator at all.
 
     :param iterator: An iterator of values.
     :param n: The maximum number of values to produce.
-    :yield: The first (at most) `n` values from the iterator.
+    :param offset: The number of values to skip first.
+    :yield: The first (at most) `n` values from the iterator after `offset`.
     """
-    if n != 0 or None:
-        return islice(iterator, n)
-    else:
-        return iterator
+    return islice(iterator, offset, offset + n if n else None)
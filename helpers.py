@@ -9,10 +9,27 @@ The `datetime_to_str` function converts a Python `datetime` into a string.
 Although `datetime`s already have human-readable string representations, those
 representations display seconds, but NASA's data (and our datetimes!) don't
 provide that level of resolution, so the output format also will not.
+
+Internally, times can also be stored compactly as an integer number of
+minutes since the Unix epoch (1970-01-01 00:00 UTC). The `cd_to_minutes`
+function parses a `cd` field straight into minutes, without building a
+`datetime`. The `datetime_to_minutes` and `minutes_to_datetime` functions
+convert between the two, and `minutes_to_ordinal` gives the proleptic
+Gregorian ordinal of the day.
 """
 import datetime
 
 
+EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+MINUTES_PER_DAY = 24 * 60
+
+# The English month abbreviations used in NASA's `cd` field.
+MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+MONTHS = {name: number for number, name in enumerate(MONTH_NAMES, start=1)}
+
+
 def cd_to_datetime(calendar_date):
     """Convert a NASA-formatted calendar date/time description into a datetime.
 
@@ -31,6 +48,43 @@ def cd_to_datetime(calendar_date):
     return datetime.datetime.strptime(calendar_date, "%Y-%b-%d %H:%M")
 
 
+def cd_to_minutes(calendar_date):
+    """Convert a NASA-formatted calendar date/time into epoch minutes.
+
+    This is equivalent to `datetime_to_minutes(cd_to_datetime(...))`, but
+    slices the fixed-width fields instead of running `strptime`, which makes
+    it several times faster on the full close approach data set.
+
+    :param calendar_date: A calendar date in YYYY-bb-DD hh:mm format.
+    :return: The integer number of minutes since 1970-01-01 00:00.
+    """
+    if len(calendar_date) != 17 or calendar_date[4] != '-' \
+            or calendar_date[8] != '-' or calendar_date[14] != ':':
+        raise ValueError(f"Invalid calendar date {calendar_date!r}.")
+    try:
+        month = MONTHS[calendar_date[5:8]]
+    except KeyError:
+        raise ValueError(f"Invalid calendar date {calendar_date!r}.") from None
+    hour, minute = int(calendar_date[12:14]), int(calendar_date[15:17])
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid calendar date {calendar_date!r}.")
+    day = datetime.date(int(calendar_date[:4]), month,
+                        int(calendar_date[9:11])).toordinal()
+    return (day - EPOCH_ORDINAL) * MINUTES_PER_DAY + hour * 60 + minute
+
+
+def datetime_to_cd(dt):
+    """Format a naive Python datetime like NASA's `cd` field.
+
+    This is the inverse of `cd_to_datetime`, independent of the locale.
+
+    :param dt: A naive Python datetime.
+    :return: That datetime, in YYYY-bb-DD hh:mm format.
+    """
+    return f"{dt.year:04d}-{MONTH_NAMES[dt.month - 1]}-{dt.day:02d} " \
+           f"{dt.hour:02d}:{dt.minute:02d}"
+
+
 def datetime_to_str(dt):
     """Convert a naive Python datetime into a human-readable string.
 
@@ -44,3 +98,30 @@ def datetime_to_str(dt):
     :return: That datetime, as a human-readable string without seconds.
     """
     return datetime.datetime.strftime(dt, "%Y-%m-%d %H:%M")
+
+
+def datetime_to_minutes(dt):
+    """Convert a naive Python datetime into minutes since the epoch.
+
+    :param dt: A naive Python datetime, with no seconds.
+    :return: The integer number of minutes since 1970-01-01 00:00.
+    """
+    return (dt - EPOCH) // datetime.timedelta(minutes=1)
+
+
+def minutes_to_datetime(minutes):
+    """Convert minutes since the epoch into a naive Python datetime.
+
+    :param minutes: An integer number of minutes since 1970-01-01 00:00.
+    :return: The corresponding naive `datetime`.
+    """
+    return EPOCH + datetime.timedelta(minutes=minutes)
+
+
+def minutes_to_ordinal(minutes):
+    """Return the day ordinal (as in `date.toordinal`) of a time in minutes.
+
+    :param minutes: An integer number of minutes since 1970-01-01 00:00.
+    :return: The proleptic Gregorian ordinal of that day.
+    """
+    return EPOCH_ORDINAL + minutes // MINUTES_PER_DAY
@@ -0,0 +1,733 @@
+"""Maintain auxiliary indexes over the close approaches of an `NEODatabase`.
+
+A bitmap is a Python `int` used as a bitset over approach row IDs: bit `i` is
+set when the approach at position `i` of the database's approach collection
+belongs to the set. Bitmaps are combined with `&` and `|`, and counting the
+set bits of a bitmap counts the matching approaches without touching them.
+
+The `BitmapIndex` class keeps bitmaps for approaches of hazardous and
+non-hazardous NEOs, of NEOs with a known diameter, and of fixed bucket ranges
+of diameter, velocity and distance. It also keeps the rows of each calendar
+day, so that date filters select whole days at once.
+
+The `SortedIndex` class keeps the approach rows in order of one attribute, so
+that sorted results can be streamed without sorting the matches.
+
+The `NEODatabase` asks a `BitmapIndex` to `select_filter` the rows of each
+filter before it looks at a single `CloseApproach`.
+"""
+import bisect
+import copy
+import math
+import operator
+from itertools import islice
+
+from helpers import minutes_to_ordinal
+
+
+# Upper edges of the value buckets. Bucket `i` holds the values in
+# `[edges[i - 1], edges[i])`; the first and last buckets are open-ended.
+DISTANCE_EDGES = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3,
+                  0.4, 0.5)
+VELOCITY_EDGES = (1.0, 2.5, 5.0, 7.5, 10.0, 12.5, 15.0, 20.0, 25.0, 30.0,
+                  40.0, 50.0, 75.0)
+DIAMETER_EDGES = (0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0, 10.0)
+
+# The number of approach rows summarized by each block of a `ZoneMap`.
+BLOCK_SIZE = 4096
+
+# The attributes whose range a `ZoneMap` records for each block.
+ZONE_ATTRIBUTES = ('date', 'distance', 'velocity', 'diameter')
+
+# The positions of the set bits of every byte value.
+_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1)
+              for byte in range(256))
+
+
+def popcount(bitmap):
+    """Count the rows in a bitmap.
+
+    :param bitmap: A bitmap of approach rows.
+    :return: The number of set bits.
+    """
+    return bin(bitmap).count('1')
+
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count  # noqa: F811 - native on Python 3.10+.
+
+
+def bitmap_from_rows(rows, size):
+    """Build a bitmap from an iterable of row IDs.
+
+    :param rows: An iterable of row IDs, each less than `size`.
+    :param size: The number of rows in the table.
+    :return: A bitmap with the bits of the given rows set.
+    """
+    buffer = bytearray((size + 7) >> 3)
+    for row in rows:
+        buffer[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def full_bitmap(size):
+    """Return a bitmap with the bits of all `size` rows set."""
+    return (1 << size) - 1
+
+
+def bitmap_bytes(bitmap, size):
+    """Return the bytes of a bitmap, for constant-time membership tests.
+
+    :param bitmap: A bitmap of approach rows.
+    :param size: The number of rows in the table.
+    :return: A `bytes` object of `ceil(size / 8)` bytes, little-endian.
+    """
+    return bitmap.to_bytes((size + 7) >> 3, 'little')
+
+
+def has_row(data, row):
+    """Test whether a row is set in the bytes of a bitmap.
+
+    :param data: The bytes of a bitmap, as returned by `bitmap_bytes`.
+    :param row: A row ID.
+    :return: Whether the row's bit is set.
+    """
+    return data[row >> 3] >> (row & 7) & 1
+
+
+def iter_rows(bitmap):
+    """Generate the row IDs set in a bitmap, in ascending order.
+
+    :param bitmap: A bitmap of approach rows.
+    :yield: The ID of each row whose bit is set.
+    """
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, 'little')
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset << 3
+            for bit in _BITS[byte]:
+                yield base + bit
+
+
+def _bucket_of(value, edges):
+    """Return the bucket of a value, or None if the value is NaN."""
+    if math.isnan(value):
+        return None
+    return bisect.bisect_right(edges, value)
+
+
+def _bucket_match(op, value, low, high):
+    """Classify how a bucket `[low, high)` satisfies `x OP value`.
+
+    :return: 'all' if every value in the bucket matches, 'none' if none does,
+    'some' if the rows of the bucket must be checked one by one, or None if
+    the comparator isn't understood.
+    """
+    if op is operator.ge:
+        return 'all' if low >= value else 'none' if high <= value else 'some'
+    if op is operator.gt:
+        return 'all' if low > value else 'none' if high <= value else 'some'
+    if op is operator.le:
+        return 'all' if high <= value else 'none' if low > value else 'some'
+    if op is operator.lt:
+        return 'all' if high <= value else 'none' if low >= value else 'some'
+    if op is operator.eq:
+        return 'some' if low <= value < high else 'none'
+    return None
+
+
+def value_range(values):
+    """Return the smallest and largest known (non-NaN) values.
+
+    :param values: An iterable of numbers.
+    :return: A `(low, high)` tuple, or `(None, None)` if no value is known.
+    """
+    known = [value for value in values if value == value]
+    if not known:
+        return None, None
+    return min(known), max(known)
+
+
+def range_match(op, value, low, high):
+    """Classify how a closed range `[low, high]` satisfies `x OP value`.
+
+    :param op: A 2-argument predicate comparator (such as `operator.le`).
+    :param value: The reference value of the comparison.
+    :param low: The smallest value of the range, or None if the range is
+    empty.
+    :param high: The largest value of the range.
+    :return: 'all' if every value of the range matches, 'none' if none does,
+    'some' if values must be checked one by one, or None if the comparator
+    isn't understood.
+    """
+    if low is None:
+        return 'none'
+    if op is operator.ge:
+        return 'all' if low >= value else 'none' if high < value else 'some'
+    if op is operator.gt:
+        return 'all' if low > value else 'none' if high <= value else 'some'
+    if op is operator.le:
+        return 'all' if high <= value else 'none' if low > value else 'some'
+    if op is operator.lt:
+        return 'all' if high < value else 'none' if low >= value else 'some'
+    if op is operator.eq:
+        if value < low or value > high:
+            return 'none'
+        return 'all' if low == high else 'some'
+    return None
+
+
+def range_may_match(op, value, low, high):
+    """Return whether some `x` in `[low, high]` may satisfy `x OP value`.
+
+    :param op: A 2-argument predicate comparator (such as `operator.le`).
+    :param value: The reference value of the comparison.
+    :param low: The smallest value of the range, or None if the range is
+    empty.
+    :param high: The largest value of the range.
+    :return: False if no value of the range matches; True otherwise, or if
+    the comparator isn't understood.
+    """
+    return range_match(op, value, low, high) != 'none'
+
+
+def filters_may_match(filters, lows, highs):
+    """Return whether some row of a range of rows may match every filter.
+
+    :param filters: A collection of filters.
+    :param lows: A dictionary mapping 'date' (a day ordinal), 'distance',
+    'velocity' and 'diameter' to the smallest value among the rows, or to
+    None if no row has a known value.
+    :param highs: A dictionary mapping the same attributes to the largest
+    value among the rows.
+    :return: False if the filters rule out every row; True otherwise.
+    """
+    for approach_filter in filters:
+        attribute = getattr(approach_filter, 'attribute', None)
+        if attribute not in lows:
+            continue
+        value = approach_filter.value
+        if attribute == 'date':
+            value = value.toordinal()
+        if not range_may_match(approach_filter.op, value, lows[attribute],
+                               highs[attribute]):
+            return False
+    return True
+
+
+def _day_range(op, ordinal, days):
+    """Return the slice `[start, stop)` of sorted `days` matching `d OP day`.
+
+    :return: A `(start, stop)` tuple, or None if the comparator isn't
+    understood.
+    """
+    if op is operator.eq:
+        return (bisect.bisect_left(days, ordinal),
+                bisect.bisect_right(days, ordinal))
+    if op is operator.ge:
+        return bisect.bisect_left(days, ordinal), len(days)
+    if op is operator.gt:
+        return bisect.bisect_right(days, ordinal), len(days)
+    if op is operator.le:
+        return 0, bisect.bisect_right(days, ordinal)
+    if op is operator.lt:
+        return 0, bisect.bisect_left(days, ordinal)
+    return None
+
+
+class BitmapIndex:
+    """Bitmaps over the approach rows of an `NEODatabase`.
+
+    The index is built from the columns of the approaches, kept up to date
+    as rows are appended, and answers `select_filter` calls: which rows are
+    known to match a filter, and which rows could possibly match it.
+    """
+
+    def __init__(self, columns):
+        """Create a new `BitmapIndex`.
+
+        :param columns: The `ApproachColumns` of the database's approaches.
+        """
+        self.size = 0
+        self.all = self.hazardous = self.not_hazardous = 0
+        self.diameter_known = 0
+        self.buckets = {
+            'distance': (DISTANCE_EDGES, [0] * (len(DISTANCE_EDGES) + 1)),
+            'velocity': (VELOCITY_EDGES, [0] * (len(VELOCITY_EDGES) + 1)),
+            'diameter': (DIAMETER_EDGES, [0] * (len(DIAMETER_EDGES) + 1)),
+        }
+        self._rows_by_day = {}
+        self._days = []
+        # The number of rows before each day, for counting day ranges.
+        self._day_offsets = [0]
+        self.append(columns, 0)
+
+    def append(self, columns, start):
+        """Add the rows appended to the columns since row `start`.
+
+        Only the new rows are visited. The bitmaps are immutable `int`s, so
+        each one that gains rows is rebuilt with a single shift and `|`.
+
+        :param columns: The `ApproachColumns` of the database's approaches.
+        :param start: The first new row; rows before it are already indexed.
+        """
+        size = len(columns)
+        if size <= start:
+            return
+        hazardous, known = [], []
+        distances = [[] for _ in range(len(DISTANCE_EDGES) + 1)]
+        velocities = [[] for _ in range(len(VELOCITY_EDGES) + 1)]
+        diameters = [[] for _ in range(len(DIAMETER_EDGES) + 1)]
+        rows_by_day, new_rows_by_day, new_days = self._rows_by_day, {}, []
+
+        neo_hazardous, neo_diameters = columns.neo_hazardous, \
+            columns.neo_diameters
+        neo_buckets = [_bucket_of(diameter, DIAMETER_EDGES)
+                       for diameter in neo_diameters]
+        neo_rows = columns.neo_rows
+        for row in range(start, size):
+            neo = neo_rows[row]
+            if neo_hazardous[neo]:
+                hazardous.append(row)
+            bucket = neo_buckets[neo]
+            if bucket is not None:
+                known.append(row)
+                diameters[bucket].append(row)
+            distances[_bucket_of(columns.distances[row], DISTANCE_EDGES)] \
+                .append(row)
+            velocities[_bucket_of(columns.velocities[row], VELOCITY_EDGES)] \
+                .append(row)
+            day = columns.day(row)
+            rows = new_rows_by_day.get(day)
+            if rows is None:
+                rows = new_rows_by_day[day] = []
+            rows.append(row)
+        # The row lists of the days are replaced, never extended in place,
+        # so that a `copy` of the index doesn't see the new rows.
+        for day, rows in new_rows_by_day.items():
+            if day in rows_by_day:
+                rows_by_day[day] = rows_by_day[day] + rows
+            else:
+                rows_by_day[day] = rows
+                new_days.append(day)
+
+        def bits(rows):
+            return bitmap_from_rows((row - start for row in rows),
+                                    size - start) << start
+
+        self.size = size
+        self.all = full_bitmap(size)
+        self.hazardous |= bits(hazardous)
+        self.not_hazardous = self.all & ~self.hazardous
+        self.diameter_known |= bits(known)
+        for attribute, rows in (('distance', distances),
+                                ('velocity', velocities),
+                                ('diameter', diameters)):
+            bitmaps = self.buckets[attribute][1]
+            for bucket, bucket_rows in enumerate(rows):
+                if bucket_rows:
+                    bitmaps[bucket] |= bits(bucket_rows)
+
+        # Only the row counts from the earliest day with new rows onwards
+        # change.
+        if new_days:
+            self._days = sorted(self._days + new_days)
+        first = bisect.bisect_left(
+            self._days,
+            columns.day(min(range(start, size),
+                            key=columns.minutes.__getitem__)))
+        offsets = self._day_offsets
+        del offsets[first + 1:]
+        for day in self._days[first:]:
+            offsets.append(offsets[-1] + len(rows_by_day[day]))
+
+    def copy(self):
+        """Copy the index, sharing its bitmaps and the rows of each day.
+
+        Only the containers that `append` changes in place are copied, so
+        the copy can be extended while this index is still being read.
+
+        :return: A new `BitmapIndex` over the same rows.
+        """
+        index = copy.copy(self)
+        index.buckets = {attribute: (edges, list(bitmaps))
+                         for attribute, (edges, bitmaps)
+                         in self.buckets.items()}
+        index._rows_by_day = dict(self._rows_by_day)
+        index._day_offsets = list(self._day_offsets)
+        return index
+
+    def count_dates(self, filters):
+        """Count the rows matching a collection of date filters.
+
+        The matching days form one contiguous range of the sorted days, so the
+        count is the width of that range in rows, found by binary search.
+
+        :param filters: A collection of `AttributeFilter`s.
+        :return: The number of matching rows, or None if any filter isn't a
+        date filter understood by this index.
+        """
+        start, stop = 0, len(self._days)
+        for approach_filter in filters:
+            if getattr(approach_filter, 'attribute', None) != 'date':
+                return None
+            bounds = _day_range(approach_filter.op,
+                                approach_filter.value.toordinal(), self._days)
+            if bounds is None:
+                return None
+            start, stop = max(start, bounds[0]), min(stop, bounds[1])
+        if start >= stop:
+            return 0
+        return self._day_offsets[stop] - self._day_offsets[start]
+
+    def select_filter(self, approach_filter):
+        """Select the rows of a single filter.
+
+        :param approach_filter: An `AttributeFilter`.
+        :return: A tuple `(exact, candidates)` of bitmaps: the rows known to
+        match, and the rows that might match. `candidates` is None if the
+        filter can't be answered from this index.
+        """
+        attribute = getattr(approach_filter, 'attribute', None)
+        if attribute is None:
+            return 0, None
+        op, value = approach_filter.op, approach_filter.value
+
+        if attribute == 'hazardous' and op is operator.eq:
+            rows = self.hazardous if value else self.not_hazardous
+            return rows, rows
+
+        if attribute == 'date':
+            bounds = _day_range(op, value.toordinal(), self._days)
+            if bounds is None:
+                return 0, None
+            rows = bitmap_from_rows(
+                (row for day in self._days[bounds[0]:bounds[1]]
+                 for row in self._rows_by_day[day]),
+                self.size)
+            return rows, rows
+
+        if attribute in self.buckets:
+            edges, bitmaps = self.buckets[attribute]
+            exact = candidates = 0
+            for bucket, rows in enumerate(bitmaps):
+                low = edges[bucket - 1] if bucket else -math.inf
+                high = edges[bucket] if bucket < len(edges) else math.inf
+                match = _bucket_match(op, value, low, high)
+                if match is None:
+                    return 0, None
+                if match == 'all':
+                    exact |= rows
+                    candidates |= rows
+                elif match == 'some':
+                    candidates |= rows
+            return exact, candidates
+
+        return 0, None
+
+
+# How to fetch each sortable attribute from a linked `CloseApproach`.
+SORT_KEYS = {
+    'time': operator.attrgetter('minutes'),
+    'distance': operator.attrgetter('distance'),
+    'velocity': operator.attrgetter('velocity'),
+    'diameter': operator.attrgetter('neo.diameter'),
+}
+
+
+def rank_key(sort_by, descending=False):
+    """Build a key function that sorts missing (NaN) values last.
+
+    Unknown diameters are NaN, which doesn't compare consistently with other
+    floats. The key pairs each value with a flag so that missing values sort
+    after all known ones, whichever the direction.
+
+    :param sort_by: One of the keys of `SORT_KEYS`.
+    :param descending: Whether the key is for a descending sort.
+    :return: A 1-argument key function on a `CloseApproach`.
+    """
+    get = SORT_KEYS[sort_by]
+
+    def key(approach):
+        value = get(approach)
+        known = value == value
+        return (known, value) if descending else (not known, value)
+    return key
+
+
+class ZoneMap:
+    """The range of values of each fixed-size block of approach rows.
+
+    For every block of `block_size` consecutive rows, a zone map records the
+    smallest and largest day, distance, velocity and NEO diameter. A block
+    whose ranges can't satisfy a filter can be skipped without visiting any
+    of its rows. This prunes well when the rows are clustered on an
+    attribute, as the time-ordered data files are on dates.
+    """
+
+    def __init__(self, columns, block_size=BLOCK_SIZE):
+        """Create a new `ZoneMap`.
+
+        :param columns: The `ApproachColumns` of the database's approaches.
+        :param block_size: The number of rows per block, a multiple of 8.
+        """
+        if block_size <= 0 or block_size % 8:
+            raise ValueError("The block size must be a positive multiple "
+                             "of 8.")
+        self.block_size = block_size
+        self.size = 0
+        # The (lows, highs) dictionaries of each block, as expected by
+        # `filters_may_match`.
+        self.blocks = []
+        self.append(columns, 0)
+
+    def append(self, columns, start):
+        """Cover the rows appended to the columns since row `start`.
+
+        The block holding row `start`, if partly filled, is recomputed.
+
+        :param columns: The `ApproachColumns` of the database's approaches.
+        :param start: The first new row; rows before it are already covered.
+        """
+        size, block_size = len(columns), self.block_size
+        first = start // block_size
+        del self.blocks[first:]
+        diameters = columns.neo_diameters
+        for low in range(first * block_size, size, block_size):
+            high = min(low + block_size, size)
+            minutes = columns.minutes[low:high]
+            bounds = {
+                'date': (minutes_to_ordinal(min(minutes)),
+                         minutes_to_ordinal(max(minutes))),
+                'distance': value_range(columns.distances[low:high]),
+                'velocity': value_range(columns.velocities[low:high]),
+                'diameter': value_range([diameters[neo] for neo
+                                         in columns.neo_rows[low:high]]),
+            }
+            self.blocks.append((
+                {attribute: bound[0] for attribute, bound in bounds.items()},
+                {attribute: bound[1] for attribute, bound in bounds.items()}))
+        self.size = size
+
+    def copy(self):
+        """Copy the zone map, sharing the ranges of its blocks.
+
+        :return: A new `ZoneMap` that `append` can extend without changing
+        this one.
+        """
+        zones = copy.copy(self)
+        zones.blocks = list(self.blocks)
+        return zones
+
+    def select_filter(self, approach_filter):
+        """Select the rows of a date filter, one block at a time.
+
+        Only date filters are answered: times are never missing, so a block
+        whose whole range of days matches is known to match on every row.
+
+        :param approach_filter: An `AttributeFilter`.
+        :return: A tuple `(exact, candidates)` of bitmaps: the rows of the
+        blocks that match entirely, and the rows of the blocks that may
+        match. None if the filter isn't a date filter understood here.
+        """
+        if getattr(approach_filter, 'attribute', None) != 'date':
+            return None
+        op, ordinal = approach_filter.op, approach_filter.value.toordinal()
+        matches = [range_match(op, ordinal, lows['date'], highs['date'])
+                   for lows, highs in self.blocks]
+        if None in matches:
+            return None
+        return (self._bitmap([match == 'all' for match in matches]),
+                self._bitmap([match != 'none' for match in matches]))
+
+    def select(self, filters):
+        """Select the rows of the blocks that may match every filter.
+
+        :param filters: A collection of filters.
+        :return: A bitmap of the rows of the blocks that aren't ruled out, or
+        None if no block is ruled out.
+        """
+        filters = [f for f in filters
+                   if getattr(f, 'attribute', None) in ZONE_ATTRIBUTES]
+        if not filters:
+            return None
+        keep = [filters_may_match(filters, lows, highs)
+                for lows, highs in self.blocks]
+        if all(keep):
+            return None
+        return self._bitmap(keep)
+
+    def _bitmap(self, blocks):
+        """Build the bitmap of the rows of some blocks.
+
+        :param blocks: A flag for each block, set to include its rows.
+        :return: A bitmap of approach rows.
+        """
+        width = self.block_size >> 3
+        buffer = bytearray((self.size + 7) >> 3)
+        ones = b'\xff' * width
+        for block, included in enumerate(blocks):
+            if included:
+                offset = block * width
+                buffer[offset:offset + width] = ones[:len(buffer) - offset]
+        return int.from_bytes(buffer, 'little') & full_bitmap(self.size)
+
+
+class _Values:
+    """The values of a list of rows, as a sequence for `bisect`."""
+
+    def __init__(self, rows, get):
+        """Wrap a sorted list of rows and a function fetching their values."""
+        self.rows, self.get = rows, get
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.rows)
+
+    def __getitem__(self, position):
+        """Return the value of the row at a position of the list."""
+        return self.get(self.rows[position])
+
+
+class SortedIndex:
+    """The approach rows of an `NEODatabase`, in order of one attribute.
+
+    Rows whose value is missing (NaN) are kept apart and always scanned last,
+    matching the order produced by `rank_key`.
+    """
+
+    def __init__(self, columns, sort_by, presorted=False, size=None):
+        """Create a new `SortedIndex`.
+
+        :param columns: The `ApproachColumns` of the database's approaches.
+        :param sort_by: One of the keys of `SORT_KEYS`.
+        :param presorted: Whether the rows are already in ascending order of
+        `sort_by`, so they needn't be sorted or stored.
+        :param size: The number of rows to index, or None for every row of
+        the columns.
+        """
+        self.sort_by = sort_by
+        if size is None:
+            size = len(columns)
+        if presorted:
+            self.rows, self.missing = range(size), []
+            return
+        values = columns.values(sort_by)
+        self.rows = sorted((row for row, value
+                            in enumerate(islice(values, size))
+                            if value == value), key=values.__getitem__)
+        self.missing = [row for row, value in enumerate(islice(values, size))
+                        if value != value]
+
+    @staticmethod
+    def is_sorted(columns, sort_by):
+        """Return whether the rows are in ascending order of `sort_by`."""
+        values = columns.values(sort_by)
+        return all(a <= b for a, b in zip(values, islice(values, 1, None)))
+
+    def append(self, columns, start):
+        """Insert the rows appended to the columns since row `start`.
+
+        Each new row is placed by binary search. A presorted index stays a
+        `range` as long as the new rows keep the order.
+
+        :param columns: The `ApproachColumns` of the database's approaches.
+        :param start: The first new row; rows before it are already indexed.
+        """
+        get = columns.getter(self.sort_by)
+        rows = self.rows
+        for row in range(start, len(columns)):
+            value = get(row)
+            if value != value:
+                self.missing.append(row)
+                continue
+            if isinstance(rows, range):
+                if row == rows.stop and (not rows or get(rows[-1]) <= value):
+                    rows = range(rows.start, row + 1)
+                    continue
+                rows = list(rows)
+            rows.insert(bisect.bisect_right(_Values(rows, get), value), row)
+        self.rows = rows
+
+    def copy(self):
+        """Copy the index, sharing no list that `append` changes.
+
+        :return: A new `SortedIndex` over the same rows.
+        """
+        index = copy.copy(self)
+        if not isinstance(self.rows, range):
+            index.rows = list(self.rows)
+        index.missing = list(self.missing)
+        return index
+
+    def scan(self, columns, descending=False, start=0):
+        """Generate the row IDs in order.
+
+        Rows with equal values come in row order whichever the direction, as
+        `rank_key` and SQLite rank them, so a query returns the same rows
+        with or without an index.
+
+        :param columns: The `ApproachColumns` of the database's approaches.
+        :param descending: Whether to generate the largest values first.
+        :param start: The number of rows to skip, as from `position`.
+        :yield: Row IDs, with the rows of missing values last.
+        """
+        rows, missing = self.rows, self.missing
+        if descending:
+            yield from self._descending(columns.getter(self.sort_by), start)
+        elif not start:
+            yield from rows
+        elif start < len(rows):
+            yield from map(rows.__getitem__, range(start, len(rows)))
+        yield from map(missing.__getitem__,
+                       range(max(start - len(rows), 0), len(missing)))
+
+    def _descending(self, get, start=0):
+        """Generate the indexed rows from the largest value down.
+
+        The rows are walked backwards, and each run of equal values is
+        generated forwards.
+
+        :param get: A function fetching the value of a row.
+        :param start: The number of rows to skip.
+        :yield: Row IDs.
+        """
+        rows = self.rows
+        if start >= len(rows):
+            return
+        # The run holding the first row to generate, and where to start in it.
+        value = get(rows[len(rows) - 1 - start])
+        low = bisect.bisect_left(_Values(rows, get), value)
+        high = bisect.bisect_right(_Values(rows, get), value, low)
+        yield from rows[low + start - (len(rows) - high):high]
+        run = []
+        for row in islice(reversed(rows), len(rows) - low, None):
+            current = get(row)
+            if current != value:
+                yield from reversed(run)
+                run.clear()
+                value = current
+            run.append(row)
+        yield from reversed(run)
+
+    def position(self, columns, row, descending=False):
+        """Find where a scan resumes after a row, by binary search.
+
+        Rows with equal values are kept in row order, so the position of a
+        row is found from its value, then its row ID.
+
+        :param columns: The `ApproachColumns` of the database's approaches.
+        :param row: An indexed row ID.
+        :param descending: Whether the scan generates the largest values
+        first.
+        :return: The number of rows that `scan` generates up to and
+        including `row`.
+        """
+        get = columns.getter(self.sort_by)
+        value = get(row)
+        if value != value:
+            return len(self.rows) + bisect.bisect_right(self.missing, row)
+        low = bisect.bisect_left(_Values(self.rows, get), value)
+        high = bisect.bisect_right(_Values(self.rows, get), value, low)
+        after = bisect.bisect_right(self.rows, row, low, high)
+        return len(self.rows) - high + after - low if descending else after
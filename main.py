@@ -5,7 +5,7 @@ See `README.md` for a detailed discussion of this project.
 
 This script can be invoked from the command line::
 
-    $ python3 main.py {inspect,query,interactive} [args]
+    $ python3 main.py {inspect,query,stats,convert,interactive} [args]
 
 The `inspect` subcommand looks up an NEO by name or by primary designation, and
 optionally lists all of that NEO's known close approaches:
@@ -27,32 +27,125 @@ The `query` subcommand searches for close approaches that match given criteria:
      --not-hazardous
     $ python3 main.py query --hazardous --max-distance 0.05 --min-velocity 30
 
+Criteria can also be combined with AND, OR, NOT and parentheses in a `--where`
+expression, which is ANDed with the other filters:
+
+    $ python3 main.py query --where "hazardous OR diameter > 1 km AND NOT
+    velocity < 5"
+
+The results can be sorted by time, distance, velocity or diameter:
+
+    $ python3 main.py query --sort-by distance --limit 10
+    $ python3 main.py query --hazardous --sort-by diameter --desc
+
 The set of results can be limited in size and/or saved to an output file in CSV
 or JSON format:
 
     $ python3 main.py query --limit 5 --outfile results.csv
     $ python3 main.py query --limit 15 --outfile results.json
 
+To page through the results, `--offset` skips the first matches. When more
+results are left, a resume token is printed to stderr; passing it back with
+`--resume` fetches the next page without scanning the earlier ones again:
+
+    $ python3 main.py query --sort-by distance --limit 10 --offset 20
+    $ python3 main.py query --sort-by distance --limit 10 --resume TOKEN
+
+Or only counted:
+
+    $ python3 main.py query --hazardous --max-distance 0.05 --count
+
+With `--explain`, a query prints how it would be answered - the normalized
+filters, the index or scan behind each of them, the sort strategy, and the
+estimated number of matches - instead of running. With `--explain analyze`, it
+also runs, and reports the rows examined and returned and the time spent
+planning, filtering, formatting and writing:
+
+    $ python3 main.py query --start-date 2020-01-01 --max-distance 0.05
+    --explain
+    $ python3 main.py query --hazardous --sort-by distance --explain analyze
+
+The `stats` subcommand summarizes the matching close approaches - counts,
+distinct NEOs, and minimum, mean and maximum distance and velocity -
+optionally grouped by day, month, year, NEO or hazard flag:
+
+    $ python3 main.py stats --start-date 2020-01-01 --group-by month
+    $ python3 main.py stats --hazardous --metrics count neos
+
 The `interactive` subcommand loads the NEO database and spawns an interactive
 command shell that can repeatedly execute `inspect` and `query` commands
 without having to wait to reload the database each time. However, it doesn't
-hot-reload.
+hot-reload. New close approach data can be added to the loaded database with
+the shell's `ingest` command.
 
 If needed, the script can load data from data files other than the default with
 `--neofile` or `--cadfile`.
+
+For data sets that don't fit in memory, `--backend sqlite` ingests the data
+files once into an indexed SQLite file (`--dbfile`) and queries it from disk:
+
+    $ python3 main.py --backend sqlite query --hazardous --max-distance 0.05
+
+Alternatively, `--backend mapped` converts the close approaches once into a
+binary file of fixed-width columns (`--binfile`), which is then mapped into
+memory at startup without any parsing:
+
+    $ python3 main.py --backend mapped query --date 2020-03-14
+
+The `convert` subcommand splits the close approaches into per-year (or
+per-month) partitions in `--partdir`, with a manifest of the range of values
+in each. With `--backend partitioned`, only the partitions that can match the
+filters of a query are loaded:
+
+    $ python3 main.py convert --by year
+    $ python3 main.py --backend partitioned query --start-date 2020-01-01
+    --end-date 2020-12-31
+
+To serve queries from several processes without a copy of the data in each,
+the `share` subcommand loads the data files once into a shared memory segment
+(`--segment`) and keeps it until interrupted. Any number of processes then
+query it with `--backend shared`, without parsing or copying the columns:
+
+    $ python3 main.py share &
+    $ python3 main.py --backend shared query --hazardous --limit 5
+
+With the default in-memory backend, `--jobs` parses both data files at the
+same time on a pool of processes, each handling a range of records:
+
+    $ python3 main.py --jobs 0 interactive
+
+For batch jobs that only need a subset, `--preload-filter` applies the filters
+of a `query` or `stats` command while the data files are parsed, so only the
+matching approaches (and their NEOs) are kept in memory:
+
+    $ python3 main.py --preload-filter stats --start-date 2000-01-01
+    --end-date 2009-12-31
 """
 import argparse
 import cmd
 import datetime
+import logging
 import pathlib
 import shlex
+import signal
 import sys
 import time
 
-from extract import load_neos, load_approaches
+from extract import load_neos, load_approaches, prune_neos
+from aggregates import METRICS
+from cursors import TokenError
 from database import NEODatabase
-from filters import create_filters, limit
-from write import write_to_csv, write_to_json
+from expressions import ExpressionError, parse_expression
+from mapped import ApproachFileError, MappedApproaches, convert_approaches
+from parallel import load_parallel
+from partitions import (MANIFEST, PARTITION_KEYS, convert_partitions,
+                        load_partitions)
+from shared import SharedApproaches
+from sqlite_database import SQLiteNEODatabase, ingest
+from filters import create_filters
+from write import (approach_to_row, convert_results_to_dictionary,
+                   write_data_to_json, write_rows_to_csv, write_to_csv,
+                   write_to_json)
 
 
 # Paths to the root of the project and the `data` subfolder.
@@ -80,10 +173,38 @@ def date_fromisoformat(date_string):
                                          f"date. Use YYYY-MM-DD.")
 
 
+def non_negative_int(text):
+    """Return the integer value of a `--limit`, `--offset` or `--jobs` option.
+
+    :param text: A non-negative integer, as a string.
+    :return: The integer.
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"'{text}' is not a non-negative "
+                                         f"integer.")
+    return value
+
+
+def where_expression(text):
+    """Compile the text of a `--where` option into a filter.
+
+    :param text: A filter expression, as described in `expressions`.
+    :return: A filter for use with the database.
+    """
+    try:
+        return parse_expression(text)
+    except ExpressionError as err:
+        raise argparse.ArgumentTypeError(str(err))
+
+
 def make_parser():
     """Create an ArgumentParser for this script.
 
-    :return: A tuple of the top-level, inspect, and query parsers.
+    :return: A tuple of the top-level, inspect, query, and stats parsers.
     """
     parser = argparse.ArgumentParser(
         description="Explore past and future close approaches of near-Earth "
@@ -97,6 +218,48 @@ def make_parser():
     parser.add_argument('--cadfile', default=(DATA_ROOT / 'cad.json'),
                         type=pathlib.Path,
                         help="Path to JSON file of close approach data.")
+    parser.add_argument('--backend',
+                        choices=('memory', 'sqlite', 'mapped', 'partitioned',
+                                 'shared'),
+                        default='memory',
+                        help="Where to keep the loaded data. The sqlite "
+                             "backend ingests the data files into --dbfile "
+                             "once, then queries that file. The mapped "
+                             "backend converts the close approaches into "
+                             "--binfile once, then maps that file into "
+                             "memory. The partitioned backend only maps the "
+                             "partitions of --partdir that the filters can "
+                             "match. The shared backend reads the shared "
+                             "memory segment --segment, kept by `share`.")
+    parser.add_argument('--dbfile', default=(DATA_ROOT / 'neos.sqlite3'),
+                        type=pathlib.Path,
+                        help="Path to the SQLite database file used by "
+                             "--backend sqlite.")
+    parser.add_argument('--binfile', default=(DATA_ROOT / 'cad.bin'),
+                        type=pathlib.Path,
+                        help="Path to the binary close approach file used by "
+                             "--backend mapped.")
+    parser.add_argument('--partdir', default=(DATA_ROOT / 'partitions'),
+                        type=pathlib.Path,
+                        help="Path to the directory of close approach "
+                             "partitions used by --backend partitioned and "
+                             "written by `convert`.")
+    parser.add_argument('--segment', default='neo-database',
+                        help="Name of the shared memory segment written by "
+                             "`share` and read by --backend shared.")
+    parser.add_argument('-j', '--jobs', type=non_negative_int, default=1,
+                        help="Number of processes that parse the data files "
+                             "for --backend memory or `share` (0 for one per "
+                             "CPU).")
+    parser.add_argument('--preload-filter', action='store_true',
+                        help="For --backend memory, drop the approaches that "
+                             "fail the filters of `query` or `stats` while "
+                             "loading the data files, along with the NEOs "
+                             "left without approaches. The data files are "
+                             "then parsed by a single process.")
+    parser.add_argument('--debug', action='store_true',
+                        help="Print debugging information to stderr, such "
+                             "as the order in which filters are checked.")
     subparsers = parser.add_subparsers(dest='cmd')
 
     # Add the `inspect` subcommand parser.
@@ -114,16 +277,14 @@ def make_parser():
                             help="The IAU name of the NEO to inspect "
                                  "(e.g. 'Halley').")
 
-    # Add the `query` subcommand parser.
-    query = subparsers.add_parser('query',
-                                  description="Query for close approaches "
-                                              "that "
-                                              "match a collection of filters.")
-    filters = query.add_argument_group('Filters',
-                                       description="Filter close approaches "
-                                                   "by their attributes "
-                                                   "or the attributes of "
-                                                   "their NEOs.")
+    # Add the filter options shared by the `query` and `stats` subcommands.
+    filter_parser = argparse.ArgumentParser(add_help=False)
+    filters = filter_parser.add_argument_group('Filters',
+                                               description="Filter close "
+                                                           "approaches by "
+                                                           "their attributes "
+                                                           "or the attributes "
+                                                           "of their NEOs.")
     filters.add_argument('-d', '--date', type=date_fromisoformat,
                          help="Only return close approaches on the given date,"
                               "in YYYY-MM-DD format (e.g. 2020-12-31).")
@@ -177,13 +338,79 @@ def make_parser():
                          help="If specified, only return close approaches of "
                               "NEOs that "
                               "are not potentially hazardous.")
-    query.add_argument('-l', '--limit', type=int,
+    filters.add_argument('-w', '--where', type=where_expression,
+                         help="Only return close approaches matching a "
+                              "boolean expression of comparisons on date, "
+                              "distance, velocity, diameter and hazardous, "
+                              "combined with AND, OR, NOT and parentheses "
+                              "(e.g. \"hazardous OR diameter > 1 km AND NOT "
+                              "velocity < 5\").")
+
+    # Add the `query` subcommand parser.
+    query = subparsers.add_parser('query', parents=[filter_parser],
+                                  description="Query for close approaches "
+                                              "that "
+                                              "match a collection of filters.")
+    query.add_argument('--sort-by', choices=('time', 'distance', 'velocity',
+                                             'diameter'),
+                       help="Sort the matches by this attribute instead of "
+                            "returning them in internal order.")
+    query.add_argument('--desc', action='store_true',
+                       help="With --sort-by, sort from the largest value "
+                            "down.")
+    query.add_argument('-c', '--count', action='store_true',
+                       help="Only print the number of matches, without "
+                            "listing or saving them.")
+    query.add_argument('-l', '--limit', type=non_negative_int,
                        help="The maximum number of matches to return. "
-                            "Defaults to 10 if no --outfile is given.")
+                            "Defaults to 10 if no --outfile is given; 0 "
+                            "returns every match.")
+    query.add_argument('--offset', type=non_negative_int, default=0,
+                       help="The number of matches to skip before the first "
+                            "one returned.")
+    query.add_argument('--resume', metavar='TOKEN',
+                       help="Continue a query with --limit from the resume "
+                            "token printed with its previous page.")
     query.add_argument('-o', '--outfile', type=pathlib.Path,
                        help="File in which to save structured results. "
                             "If omitted, results are printed to standard "
                             "output.")
+    query.add_argument('--explain', nargs='?', const='plan',
+                       choices=('plan', 'analyze'),
+                       help="Print how the query would be answered instead "
+                            "of running it. With `analyze`, run it too, and "
+                            "print the rows examined and the time of each "
+                            "stage after the results.")
+
+    # Add the `stats` subcommand parser.
+    stats = subparsers.add_parser('stats', parents=[filter_parser],
+                                  description="Summarize the close approaches "
+                                              "that match a collection of "
+                                              "filters.")
+    stats.add_argument('-g', '--group-by',
+                       choices=('day', 'month', 'year', 'neo', 'hazardous'),
+                       help="Summarize each group of matches separately.")
+    stats.add_argument('-m', '--metrics', nargs='+', choices=METRICS,
+                       default=list(METRICS),
+                       help="The statistics to report. Defaults to all of "
+                            "them.")
+
+    # Add the `convert` subcommand parser.
+    convert = subparsers.add_parser('convert',
+                                    description="Split the close approaches "
+                                                "into date partitions in "
+                                                "--partdir, for --backend "
+                                                "partitioned.")
+    convert.add_argument('--by', choices=tuple(PARTITION_KEYS),
+                         default='year',
+                         help="The span of time of each partition.")
+
+    # Add the `share` subcommand parser.
+    subparsers.add_parser('share',
+                          description="Load the data files into the shared "
+                                      "memory segment --segment, for "
+                                      "--backend shared, and keep it until "
+                                      "interrupted.")
 
     repl = subparsers.add_parser('interactive',
                                  description="Start an interactive command "
@@ -193,7 +420,103 @@ def make_parser():
     repl.add_argument('-a', '--aggressive', action='store_true',
                       help="If specified, kill the session whenever a "
                            "project file is modified.")
-    return parser, inspect, query
+    return parser, inspect, query, stats
+
+
+def is_stale(path, *sources):
+    """Return whether a derived file is missing or older than its sources.
+
+    :param path: A path to a file derived from the data files.
+    :param sources: Paths to the data files it was derived from.
+    :return: Whether the derived file should be rebuilt.
+    """
+    if not path.exists():
+        return True
+    built = path.stat().st_mtime
+    return any(source.stat().st_mtime > built for source in sources)
+
+
+def load_database(args):
+    """Create the database chosen with `--backend` from the data files.
+
+    The SQLite database file, the binary approach file and the partitions are
+    (re)built from the data files when they don't exist yet or are older than
+    the data.
+
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser.
+    :return: An `NEODatabase` or a `SQLiteNEODatabase`.
+    """
+    if args.backend == 'sqlite':
+        if is_stale(args.dbfile, args.neofile, args.cadfile):
+            ingest(args.neofile, args.cadfile, args.dbfile)
+        return SQLiteNEODatabase(args.dbfile)
+
+    if args.backend == 'shared':
+        try:
+            approaches = SharedApproaches.attach(args.segment)
+        except FileNotFoundError:
+            sys.exit(f"There's no shared memory segment {args.segment!r}; "
+                     f"start one with `share`.")
+        return NEODatabase(approaches.neos, approaches)
+
+    if args.backend == 'memory' and args.preload_filter and \
+            args.cmd in ('query', 'stats'):
+        filters = filters_from_args(args)
+        neos = load_neos(args.neofile, filters)
+        approaches = load_approaches(args.cadfile, filters, neos)
+        return NEODatabase(prune_neos(neos, approaches), approaches)
+
+    if args.backend == 'memory' and args.jobs != 1:
+        return NEODatabase(*load_parallel(args.neofile, args.cadfile,
+                                          args.jobs or None))
+
+    neos = load_neos(args.neofile)
+    if args.backend == 'mapped':
+        if is_stale(args.binfile, args.neofile, args.cadfile):
+            convert_approaches(args.cadfile, neos, args.binfile)
+        try:
+            approaches = MappedApproaches(args.binfile, neos)
+        except ApproachFileError as err:
+            sys.exit(f"Couldn't map the binary approach file: {err}")
+        return NEODatabase(neos, approaches)
+    if args.backend == 'partitioned':
+        if is_stale(args.partdir / MANIFEST, args.neofile, args.cadfile):
+            convert_partitions(args.cadfile, neos, args.partdir)
+        # Only the partitions that the filters of this command can match are
+        # loaded; other commands need every approach.
+        filters = filters_from_args(args) \
+            if args.cmd in ('query', 'stats') else ()
+        return NEODatabase(neos, load_partitions(args.partdir, neos,
+                                                 filters))
+    return NEODatabase(neos, load_approaches(args.cadfile))
+
+
+def share(args):
+    """Keep the data files in a shared memory segment until interrupted.
+
+    The segment is unlinked when the command stops, on an interrupt or a
+    SIGTERM.
+
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser.
+    """
+    if args.jobs != 1:
+        neos, approaches = load_parallel(args.neofile, args.cadfile,
+                                         args.jobs or None)
+    else:
+        neos = load_neos(args.neofile)
+        approaches = load_approaches(args.cadfile)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with SharedApproaches.create(neos, approaches, args.segment) as shared:
+        print(f"Sharing {len(shared)} close approaches and "
+              f"{len(shared.neos)} NEOs in the segment {shared.name!r}. "
+              f"Press Ctrl-C to stop.")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
 
 
 def inspect(database, pdes=None, name=None, verbose=False):
@@ -236,48 +559,185 @@ def inspect(database, pdes=None, name=None, verbose=False):
     return neo
 
 
+def filters_from_args(args):
+    """Create a collection of filters from the filter options of a subcommand.
+
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser.
+    :return: A collection of filters for use with the database.
+    """
+    return create_filters(
+        date=args.date, start_date=args.start_date, end_date=args.end_date,
+        distance_min=args.distance_min, distance_max=args.distance_max,
+        velocity_min=args.velocity_min, velocity_max=args.velocity_max,
+        diameter_min=args.diameter_min, diameter_max=args.diameter_max,
+        hazardous=args.hazardous
+    ) + ([args.where] if args.where is not None else [])
+
+
 def query(database, args):
     """Perform the `query` subcommand.
 
     Create a collection of filters with `create_filters` and supply them to the
     database's `query` method to produce a stream of matching results.
 
+    If `--count` was given, only print the number of matches.
+
     If an output file wasn't given, print these results to stdout, limiting to
     10 entries if no limit was specified. If an output file was given, use the
     file's extension to infer whether the file should hold CSV or JSON data,
     and
     then write the results to the output file in that format.
 
+    With a limit, the results are fetched as a page with the database's
+    `paginate` method, starting from the token of `--resume` if given.
+
     :param database: The `NEODatabase` containing data on NEOs and their close
     approaches.
     :param args: All arguments from the command line, as parsed by the
     top-level parser.
+    :return: The resume token of the next page of results, or None.
     """
+    if args.explain:
+        explain(database, args)
+        return None
+
     # Construct a collection of filters from arguments supplied at the
     # command line.
-    filters = create_filters(
-        date=args.date, start_date=args.start_date, end_date=args.end_date,
-        distance_min=args.distance_min, distance_max=args.distance_max,
-        velocity_min=args.velocity_min, velocity_max=args.velocity_max,
-        diameter_min=args.diameter_min, diameter_max=args.diameter_max,
-        hazardous=args.hazardous
-    )
-    # Query the database with the collection of filters.
-    results = database.query(filters)
+    filters = filters_from_args(args)
+    if args.count:
+        # Count the matches without producing or formatting any of them.
+        print(database.count(filters))
+        return None
+
+    # Query the database with the collection of filters. The database stops
+    # scanning once the results within the limit are found, limiting to 10
+    # entries if not specified and writing to stdout.
+    n = args.limit if args.outfile else \
+        10 if args.limit is None else args.limit
+    token = None
+    if n:
+        try:
+            results, token = database.paginate(
+                filters, sort_by=args.sort_by, descending=args.desc, size=n,
+                offset=args.offset, token=args.resume)
+        except TokenError as err:
+            print(err, file=sys.stderr)
+            return None
+    elif args.resume:
+        print("Please use --resume with a --limit.", file=sys.stderr)
+        return None
+    else:
+        results = database.query(filters, sort_by=args.sort_by,
+                                 descending=args.desc, offset=args.offset)
 
     if not args.outfile:
-        # Write the results to stdout, limiting to 10 entries if not specified.
-        for result in limit(results, args.limit or 10):
+        # Write the results to stdout.
+        for result in results:
             print(result)
     else:
         # Write the results to a file.
         if args.outfile.suffix == '.csv':
-            write_to_csv(limit(results, args.limit), args.outfile)
+            write_to_csv(results, args.outfile)
         elif args.outfile.suffix == '.json':
-            write_to_json(limit(results, args.limit), args.outfile)
+            write_to_json(results, args.outfile)
         else:
             print("Please use an output file that ends with `.csv` or "
                   "`.json`.", file=sys.stderr)
+            return None
+    return token
+
+
+def explain(database, args):
+    """Perform the `query` subcommand with `--explain`.
+
+    Print the plan of the query from the database's `explain` method. With
+    `--explain analyze`, first run the query with the plan, which records the
+    rows examined, and output the results as `query` does, timing the
+    filtering, formatting and writing of the results separately.
+
+    :param database: The `NEODatabase` containing data on NEOs and their close
+    approaches.
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser.
+    :return: The `QueryPlan`.
+    """
+    filters = filters_from_args(args)
+    n = args.limit if args.outfile else \
+        10 if args.limit is None else args.limit
+    if args.count:
+        plan = database.explain(filters)
+    else:
+        plan = database.explain(filters, sort_by=args.sort_by,
+                                descending=args.desc, limit=n,
+                                offset=args.offset)
+    if args.explain == 'analyze':
+        start = time.perf_counter()
+        if args.count:
+            plan.returned = database.count(filters, plan=plan)
+            plan.record('filtering', start)
+            print(plan.returned)
+        else:
+            results = list(database.query(filters, sort_by=args.sort_by,
+                                          descending=args.desc, limit=n,
+                                          offset=args.offset, plan=plan))
+            start = plan.record('filtering', start)
+            plan.returned = len(results)
+            _write_analyzed(results, args, plan, start)
+    for line in plan.lines():
+        print(line)
+    return plan
+
+
+def _write_analyzed(results, args, plan, start):
+    """Output the results of `explain`, timing formatting and writing."""
+    if not args.outfile:
+        lines = [str(result) for result in results]
+        start = plan.record('formatting', start)
+        for line in lines:
+            print(line)
+    elif args.outfile.suffix == '.csv':
+        rows = [approach_to_row(result) for result in results]
+        start = plan.record('formatting', start)
+        write_rows_to_csv(rows, args.outfile)
+    elif args.outfile.suffix == '.json':
+        data = convert_results_to_dictionary(results)
+        start = plan.record('formatting', start)
+        write_data_to_json(data, args.outfile)
+    else:
+        print("Please use an output file that ends with `.csv` or "
+              "`.json`.", file=sys.stderr)
+        return
+    plan.record('writing', start)
+
+
+def stats(database, args):
+    """Perform the `stats` subcommand.
+
+    Summarize the close approaches that match the filters with the database's
+    `aggregate` method, and print one line of statistics per group (or a
+    single line if no grouping was requested).
+
+    :param database: The `NEODatabase` containing data on NEOs and their close
+    approaches.
+    :param args: All arguments from the command line, as parsed by the
+    top-level parser.
+    :return: The result of `NEODatabase.aggregate`.
+    """
+    summary = database.aggregate(filters_from_args(args),
+                                 group_by=args.group_by, metrics=args.metrics)
+    groups = summary.items() if args.group_by else [('all', summary)]
+
+    print('\t'.join([args.group_by or 'group'] + args.metrics))
+    for group, values in groups:
+        cells = [str(group)]
+        for metric in args.metrics:
+            value = values[metric]
+            cells.append('-' if value is None else
+                         f"{value:.6g}" if isinstance(value, float) else
+                         str(value))
+        print('\t'.join(cells))
+    return summary
 
 
 class NEOShell(cmd.Cmd):
@@ -299,7 +759,7 @@ class NEOShell(cmd.Cmd):
     prompt = '(neo) '
 
     def __init__(self, database, inspect_parser, query_parser,
-                 aggressive=False, **kwargs):
+                 stats_parser=None, aggressive=False, **kwargs):
         """Create a new `NEOShell`.
 
         Creating this object doesn't start the session - for that, use
@@ -309,6 +769,7 @@ class NEOShell(cmd.Cmd):
         close approaches.
         :param inspect_parser: The subparser for the `inspect` subcommand.
         :param query_parser: The subparser for the `query` subcommand.
+        :param stats_parser: The subparser for the `stats` subcommand.
         :param aggressive: Whether to kill the session whenever a project file
         is changed.
         :param kwargs: A dictionary of excess keyword arguments passed to the
@@ -318,7 +779,14 @@ class NEOShell(cmd.Cmd):
         self.db = database
         self.inspect = inspect_parser
         self.query = query_parser
+        self.stats = stats_parser
         self.aggressive = aggressive
+        # The arguments of the last query with more results, and the resume
+        # token of its next page, for the `next` command.
+        self.last_query = None
+        self.token = None
+        # The attributes the shell built a sorted index on for `next`.
+        self.indexed = set()
 
     @classmethod
     def parse_arg_with(cls, arg, parser):
@@ -388,12 +856,20 @@ class NEOShell(cmd.Cmd):
 
         You can use any of the other filters: `--start-date`, `--end-date`,
         `--min-distance`, `--max-distance`, `--min-velocity`, `--max-velocity`,
-        `--min-diameter`, `--max-diameter`, `--hazardous`, `--not-hazardous`.
+        `--min-diameter`, `--max-diameter`, `--hazardous`, `--not-hazardous`,
+        and `--where` with a quoted expression:
+
+            (neo) query --where "hazardous OR NOT distance > 0.1"
 
         The number of results shown can be limited to a maximum number with
-        `--limit`:
+        `--limit`, after skipping some with `--offset`:
 
             (neo) query --limit 2
+            (neo) query --limit 2 --offset 4
+
+        The results can be sorted with `--sort-by` (and `--desc`):
+
+            (neo) query --sort-by velocity --desc --limit 5
 
         The results can be saved to a file (instead of displayed to stdout)
         with
@@ -407,7 +883,113 @@ class NEOShell(cmd.Cmd):
             return
 
         # Run the `inspect` subcommand.
-        query(self.db, args)
+        self.last_query, self.token = args, query(self.db, args)
+        if self.token:
+            print("Type `next` for more results.")
+
+    def do_n(self, arg):
+        """Shorthand for `next`."""
+        self.do_next(arg)
+
+    def do_next(self, arg):
+        """Show the next page of results of the last `query` command.
+
+        The query resumes from where its previous page stopped, so each page
+        takes about as long as the first:
+
+            (neo) query --sort-by distance --limit 5
+            (neo) next
+            (neo) next
+        """
+        if self.token is None:
+            print("There are no more results. Run a `query` first.",
+                  file=sys.stderr)
+            return
+        self.last_query.resume = self.token
+        self.last_query.offset = 0
+        # The shell keeps its database, so a sorted index pays for itself
+        # over the pages; a single `--resume` ranks the rows instead.
+        sort_by = self.last_query.sort_by
+        create_index = getattr(self.db, 'create_sorted_index', None)
+        if sort_by is not None and create_index and \
+                sort_by not in self.indexed:
+            create_index(sort_by)
+            self.indexed.add(sort_by)
+        self.token = query(self.db, self.last_query)
+        if self.token:
+            print("Type `next` for more results.")
+
+    def do_explain(self, arg):
+        """Explain how a `query` command would be answered.
+
+        Take the same options as `query`, and print the normalized filters,
+        the index or scan behind each filter, the sort strategy, and the
+        estimated number of matches, without running the query:
+
+            (neo) explain --start-date 2020-01-01 --max-distance 0.05
+
+        With `analyze` first, also run the query, and print the rows examined
+        and returned and the time spent planning, filtering, formatting and
+        writing:
+
+            (neo) explain analyze --hazardous --sort-by distance --limit 5
+        """
+        words = arg.split(None, 1)
+        mode = 'plan'
+        if words and words[0].lower() == 'analyze':
+            mode, arg = 'analyze', words[1] if len(words) > 1 else ''
+        args = self.parse_arg_with(arg, self.query)
+        if not args:
+            return
+
+        args.explain = mode
+        explain(self.db, args)
+
+    def do_stats(self, arg):
+        """Perform the `stats` subcommand within the REPL session.
+
+        Summarize the close approaches that match any of the `query` filters,
+        optionally grouped by day, month, year, NEO or hazard flag:
+
+            (neo) stats --hazardous --group-by month
+            (neo) stats --max-distance 0.05 --metrics count neos
+        """
+        if self.stats is None:
+            print("The `stats` command isn't available in this session.",
+                  file=sys.stderr)
+            return
+        args = self.parse_arg_with(arg, self.stats)
+        if not args:
+            return
+
+        # Run the `stats` subcommand.
+        stats(self.db, args)
+
+    def do_ingest(self, arg):
+        """Add the close approaches of a JSON file to the loaded database.
+
+        The file must be formatted like the close approach data file, and
+        each approach must belong to a known NEO. The new approaches are
+        indexed as they are added, so later commands include them without
+        reloading anything:
+
+            (neo) ingest data/cad-update.json
+        """
+        try:
+            paths = shlex.split(arg)
+        except ValueError as err:
+            print(err, file=sys.stderr)
+            return
+        if len(paths) != 1:
+            print("Usage: ingest CADFILE", file=sys.stderr)
+            return
+
+        try:
+            count = self.db.append_approaches(load_approaches(paths[0]))
+        except (OSError, ValueError, KeyError) as err:
+            print(f"Couldn't ingest {paths[0]}: {err}", file=sys.stderr)
+            return
+        print(f"Added {count} close approaches.")
 
     def do_EOF(self, _arg):
         """Exit the interactive session."""
@@ -439,20 +1021,36 @@ class NEOShell(cmd.Cmd):
 
 def main():
     """Run the main script."""
-    parser, inspect_parser, query_parser = make_parser()
+    parser, inspect_parser, query_parser, stats_parser = make_parser()
     args = parser.parse_args()
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(name)s: %(message)s')
+
+    if args.cmd == 'convert':
+        manifest = convert_partitions(args.cadfile, load_neos(args.neofile),
+                                      args.partdir, by=args.by)
+        print(f"Wrote {len(manifest['partitions'])} partitions to "
+              f"{args.partdir}.")
+        return
+    if args.cmd == 'share':
+        share(args)
+        return
 
     # Extract data from the data files into structured Python objects.
-    database = NEODatabase(load_neos(args.neofile),
-                           load_approaches(args.cadfile))
+    database = load_database(args)
 
     # Run the chosen subcommand.
     if args.cmd == 'inspect':
         inspect(database, pdes=args.pdes, name=args.name, verbose=args.verbose)
     elif args.cmd == 'query':
-        query(database, args)
+        token = query(database, args)
+        if token:
+            print(f"More results: --resume {token}", file=sys.stderr)
+    elif args.cmd == 'stats':
+        stats(database, args)
     elif args.cmd == 'interactive':
-        NEOShell(database, inspect_parser, query_parser,
+        NEOShell(database, inspect_parser, query_parser, stats_parser,
                  aggressive=args.aggressive).cmdloop()
 
 
@@ -0,0 +1,230 @@
+"""Store close approaches in a memory-mapped binary file.
+
+The `convert_approaches` function reads close approach data from a JSON file
+once, and writes it to a binary file of fixed-width records. The file starts
+with a small header, followed by one contiguous little-endian column per
+attribute, with one fixed-width entry per approach:
+
+    minutes     int64    Time of closest approach, in minutes since the epoch.
+    distance    float64  Nominal approach distance, in au.
+    velocity    float64  Relative approach velocity, in km/s.
+    jd, dist_min, dist_max, v_inf, h
+                float64  The other numeric JPL columns (NaN if missing).
+    neo         int32    Position of the approach's NEO in the NEO CSV file.
+
+and ends with the primary designations of the NEOs, in CSV order, as UTF-8
+text separated by newlines. The lower-level `write_approaches` can leave that
+table out, for files (such as partitions) that are checked by other means.
+Approaches whose NEO isn't in the NEO file are orphans: like the
+`NEODatabase`, the converters set them aside with a warning.
+
+A `MappedApproaches` opens such a file with `mmap` and exposes each column as
+a typed `memoryview` without parsing or copying anything, so the pages are
+shared through the page cache by every process that maps the file. It is an
+`ApproachSequence`, so its `CloseApproach`es are built (and linked to their
+NEO) only when a row is accessed. Closing it, or leaving the `with` block it
+was opened in, releases the map:
+
+    with MappedApproaches(path, neos) as approaches:
+        database = NEODatabase(neos, approaches)
+        ...
+"""
+from array import array
+import json
+import logging
+import math
+import mmap
+import struct
+import sys
+
+from columns import ApproachColumns, ApproachSequence
+from helpers import cd_to_minutes
+
+
+MAGIC = b'NEOCAD01'
+
+# Magic, approach count, NEO count, size of the designation table.
+HEADER = struct.Struct('<8sqqq')
+
+# The JPL fields stored besides time, distance and velocity, with their
+# positions in each record of the JSON data.
+EXTRA_FIELDS = (('jd', 2), ('dist_min', 5), ('dist_max', 6), ('v_inf', 8),
+                ('h', 10))
+
+# The float64 columns, in file order, with their positions in each record.
+FLOAT_FIELDS = (('distance', 4), ('velocity', 7)) + EXTRA_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+class ApproachFileError(ValueError):
+    """A binary approach file is malformed or doesn't match the NEOs."""
+
+
+def _number(value):
+    """Convert a JPL field to a float, with NaN for missing values."""
+    return math.nan if value in (None, '') else float(value)
+
+
+def known_records(records, neo_row):
+    """Set aside the close approach records of NEOs that aren't known.
+
+    :param records: A sequence of records of the "data" array of a close
+    approach JSON file.
+    :param neo_row: A dictionary mapping each NEO designation to the position
+    of the NEO in the NEO CSV file.
+    :return: The records whose NEO is in `neo_row`, in order.
+    """
+    known = [record for record in records if record[0] in neo_row]
+    if len(known) < len(records):
+        orphan = next(record for record in records
+                      if record[0] not in neo_row)
+        logger.warning("Set aside %d close approaches of unknown NEOs, such "
+                       "as %r.", len(records) - len(known), orphan[0])
+    return known
+
+
+def write_approaches(records, neo_row, path, table=True):
+    """Write close approach records from the JSON data into a binary file.
+
+    :param records: A sequence of records of the "data" array of a close
+    approach JSON file.
+    :param neo_row: A dictionary mapping each NEO designation to the position
+    of the NEO in the NEO CSV file.
+    :param path: A path to the binary file to write.
+    :param table: Whether to end the file with the designation table. Files
+    without it are only checked against the number of NEOs when mapped.
+
+    The records of NEOs missing from `neo_row` are left out of the file.
+    """
+    if sys.byteorder != 'little':
+        raise ApproachFileError("Binary approach files are little-endian.")
+    records = known_records(records, neo_row)
+    designations = sorted(neo_row, key=neo_row.__getitem__)
+    table = '\n'.join(designations).encode('utf-8') if table else b''
+    count = len(records)
+
+    with open(path, 'wb') as outfile:
+        outfile.write(HEADER.pack(MAGIC, count, len(designations),
+                                  len(table)))
+        array('q', (cd_to_minutes(record[3])
+                    for record in records)).tofile(outfile)
+        for _, field in FLOAT_FIELDS:
+            array('d', (_number(record[field])
+                        for record in records)).tofile(outfile)
+        array('i', (neo_row[record[0]] for record in records)).tofile(outfile)
+        outfile.write(table)
+
+
+def convert_approaches(cad_json_path, neos, path):
+    """Convert close approach data from a JSON file into a binary file.
+
+    :param cad_json_path: A path to a JSON file containing data about close
+    approaches.
+    :param neos: The collection of `NearEarthObject`s loaded from the NEO CSV
+    file, in file order.
+    :param path: A path to the binary file to write.
+    """
+    with open(cad_json_path, 'r') as infile:
+        records = json.load(infile)['data']
+    write_approaches(records, {neo.designation: row
+                               for row, neo in enumerate(neos)}, path)
+
+
+class MappedApproaches(ApproachSequence):
+    """A read-only sequence of close approaches backed by a binary file.
+
+    The columns of the file are available as `memoryview`s in `columns` (an
+    `ApproachColumns`) and in `extras` (a dictionary of the other JPL
+    columns).
+    """
+
+    def __init__(self, path, neos):
+        """Map a binary approach file written by `convert_approaches`.
+
+        :param path: A path to the binary file.
+        :param neos: The collection of `NearEarthObject`s loaded from the same
+        NEO CSV file that the binary file was converted against.
+        :raise ApproachFileError: If the file is empty, truncated or malformed,
+        or was converted against other NEOs.
+        """
+        if sys.byteorder != 'little':
+            raise ApproachFileError("Binary approach files are little-endian.")
+        with open(path, 'rb') as infile:
+            try:
+                self._map = mmap.mmap(infile.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ApproachFileError(f"{path} is empty.")
+        try:
+            self._map_columns(path, neos)
+        except BaseException:
+            self.close()
+            raise
+
+    def _map_columns(self, path, neos):
+        """Expose the columns of the mapped file, checking it against the NEOs.
+
+        :param path: The path to the binary file, for error messages.
+        :param neos: The collection of `NearEarthObject`s.
+        :raise ApproachFileError: If the file is malformed or was converted
+        against other NEOs.
+        """
+        view = memoryview(self._map)
+        # Every view over the map, released by `close`, in reverse order.
+        self._views = [view]
+
+        if len(view) < HEADER.size:
+            raise ApproachFileError(f"{path} isn't a binary approach file.")
+        magic, count, neo_count, table_size = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ApproachFileError(f"{path} isn't a binary approach file.")
+        offset = HEADER.size
+        record_size = 8 + 8 * len(FLOAT_FIELDS) + 4
+        if count < 0 or table_size < 0 or \
+                offset + count * record_size + table_size > len(view):
+            raise ApproachFileError(f"{path} is truncated.")
+
+        def column(fmt, size):
+            nonlocal offset
+            data = view[offset:offset + size * count]
+            self._views.extend((data, data.cast(fmt)))
+            offset += size * count
+            return self._views[-1]
+
+        minutes = column('q', 8)
+        floats = {name: column('d', 8) for name, _ in FLOAT_FIELDS}
+        neo_rows = column('i', 4)
+        if neo_count != len(neos):
+            raise ApproachFileError(f"{path} was converted against other "
+                                    f"NEOs.")
+        if table_size:
+            table = bytes(view[offset:offset + table_size]).decode('utf-8')
+            if table.split('\n') != [neo.designation for neo in neos]:
+                raise ApproachFileError(f"{path} was converted against other "
+                                        f"NEOs.")
+
+        super().__init__(ApproachColumns(minutes, floats['distance'],
+                                         floats['velocity'], neo_rows, neos),
+                         neos)
+        self.extras = {name: floats[name] for name, _ in EXTRA_FIELDS}
+
+    def close(self):
+        """Release the views over the mapped file, and unmap it.
+
+        The columns can't be read anymore afterwards, unless approaches were
+        appended to them (which copies them), nor can the `CloseApproach`
+        objects not built yet. Closing again does nothing.
+        """
+        for view in reversed(getattr(self, '_views', ())):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def __enter__(self):
+        """Enter a `with` block that closes the sequence when it's left."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the sequence."""
+        self.close()
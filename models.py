@@ -17,9 +17,11 @@ quirks of the data set, such as missing names and unknown diameters.
 
 You'll edit this file in Task 1.
 """
+import datetime
 import math
 
-from helpers import cd_to_datetime, datetime_to_str
+from helpers import (EPOCH_ORDINAL, MINUTES_PER_DAY, cd_to_minutes,
+                     datetime_to_minutes, datetime_to_str, minutes_to_datetime)
 
 
 class NearEarthObject:
@@ -148,16 +150,42 @@ class CloseApproach:
         """
         # onto attributes named `_designation`, `time`, `distance`, and
         # `velocity`. You should coerce these values to their appropriate
-        # data type and handle any edge cases. The `cd_to_datetime` function
+        # data type and handle any edge cases. The `cd_to_minutes` function
         # will be useful.
         self._designation = designation
-        self.time = cd_to_datetime(time)
+        # The time is kept as an integer number of minutes since the epoch;
+        # `time` builds a `datetime` from it on demand.
+        if isinstance(time, int):
+            # Already converted, e.g. when built from a binary approach file.
+            self.minutes = time
+        elif isinstance(time, datetime.datetime):
+            self.minutes = datetime_to_minutes(time)
+        else:
+            self.minutes = cd_to_minutes(time)
         self.distance = float(distance)
         self.velocity = float(velocity)
 
         # Create an attribute for the referenced NEO, originally None.
         self.neo = None
 
+    @property
+    def time(self):
+        """Return the time of closest approach, as a naive `datetime`."""
+        return minutes_to_datetime(self.minutes)
+
+    @time.setter
+    def time(self, value):
+        """Set the time of closest approach.
+
+        :param value: A naive `datetime`, with no seconds.
+        """
+        self.minutes = datetime_to_minutes(value)
+
+    @property
+    def day(self):
+        """Return the day ordinal (as in `date.toordinal`) of this approach."""
+        return EPOCH_ORDINAL + self.minutes // MINUTES_PER_DAY
+
     @property
     def time_str(self):
         """Return a formatted representation of this `CloseApproach`'s time.
@@ -0,0 +1,248 @@
+"""Load the NEO and close approach data files in parallel.
+
+The `load_parallel` function parses the NEO CSV file and the close approach
+JSON file at the same time, on a pool of worker processes. Each file is split
+into byte ranges that start and end on record boundaries:
+
+- In the CSV file, records are lines, so chunks are split after a newline.
+- In the JSON file, the records are the inner arrays of the "data" array, and
+  none of their fields contain brackets, so chunks are split before an
+  opening bracket.
+
+Each worker parses its byte range independently and sends back compact
+columns - typed arrays for numbers and newline-joined strings for text -
+rather than pickled model objects. The main process stitches the chunks
+together in file order, builds the `NearEarthObject`s, and finally joins the
+approaches to their NEOs by designation in a single pass over the
+designation column. Approaches of NEOs missing from the CSV file are dropped,
+with a warning, as `NEODatabase` sets them aside.
+
+The close approaches come back as an `ApproachSequence`, so an
+`NEODatabase` indexes the columns directly and only builds `CloseApproach`
+objects for the rows it returns.
+"""
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import itertools
+import json
+import logging
+import mmap
+import os
+
+from columns import ApproachColumns, ApproachSequence
+from helpers import cd_to_minutes
+from models import NearEarthObject
+
+
+# The CSV columns used to build a `NearEarthObject`, in constructor order.
+NEO_FIELDS = ('pdes', 'name', 'diameter', 'pha')
+
+# The positions of the fields used in each record of the JSON data.
+DESIGNATION, CALENDAR_DATE, DISTANCE, VELOCITY = 0, 3, 4, 7
+
+# How many chunks each worker gets on average, to even out the load.
+CHUNKS_PER_WORKER = 4
+
+# How far to look for a record boundary after a tentative split point.
+_WINDOW = 1 << 16
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkError(ValueError):
+    """A data file can't be split into records."""
+
+
+def _find(data, token, start, end):
+    """Find a token in a mapped file, reading one window at a time."""
+    while start < end:
+        stop = min(start + _WINDOW, end)
+        found = data.find(token, start, stop)
+        if found >= 0:
+            return found
+        start = stop - len(token) + 1 if stop < end else stop
+    return -1
+
+
+def split_ranges(data, start, end, count, boundary, after=False):
+    """Split a byte range of a mapped file into chunks on record boundaries.
+
+    :param data: An `mmap` (or bytes) of the whole file.
+    :param start: The offset of the first record.
+    :param end: The offset just past the last record.
+    :param count: The desired number of chunks.
+    :param boundary: The byte string that delimits records.
+    :param after: Whether chunks start after the boundary (as after a newline)
+    rather than at it (as at an opening bracket).
+    :return: A list of (start, end) offsets, in file order, covering the
+    range without gaps.
+    """
+    offsets = [start]
+    for number in range(1, count):
+        tentative = max(start + (end - start) * number // count, offsets[-1])
+        found = _find(data, boundary, tentative, end)
+        if found < 0:
+            break
+        offset = found + len(boundary) if after else found
+        if offsets[-1] < offset < end:
+            offsets.append(offset)
+    offsets.append(end)
+    return list(zip(offsets, offsets[1:]))
+
+
+def _read(path, start, end):
+    """Read a byte range of a file."""
+    with open(path, 'rb') as infile:
+        infile.seek(start)
+        return infile.read(end - start)
+
+
+def parse_neo_chunk(path, start, end, positions):
+    """Parse a chunk of lines of the NEO CSV file into columns.
+
+    :param path: A path to the NEO CSV file.
+    :param start: The offset of the first line of the chunk.
+    :param end: The offset just past the last line of the chunk.
+    :param positions: The positions of the `NEO_FIELDS` in each row.
+    :return: A tuple with one newline-joined string per field of
+    `NEO_FIELDS`, and the number of rows.
+    """
+    text = _read(path, start, end).decode('utf-8')
+    columns = tuple([] for _ in positions)
+    for row in csv.reader(text.splitlines()):
+        if not row:
+            continue
+        for column, position in zip(columns, positions):
+            column.append(row[position])
+    return tuple('\n'.join(column) for column in columns), len(columns[0])
+
+
+def parse_approach_chunk(path, start, end):
+    """Parse a chunk of records of the close approach JSON file into columns.
+
+    :param path: A path to the close approach JSON file.
+    :param start: The offset of the opening bracket of the first record.
+    :param end: The offset of the opening bracket of the next chunk's first
+    record, or of the closing bracket of the "data" array.
+    :return: A tuple of the newline-joined designations, and typed arrays
+    of the times (in minutes since the epoch), distances and velocities.
+    """
+    chunk = _read(path, start, end).rstrip(b' \t\r\n,')
+    records = json.loads(b'[' + chunk + b']') if chunk else []
+    minutes = array('q', [cd_to_minutes(record[CALENDAR_DATE])
+                          for record in records])
+    distances = array('d', [float(record[DISTANCE]) for record in records])
+    velocities = array('d', [float(record[VELOCITY]) for record in records])
+    designations = '\n'.join([record[DESIGNATION] for record in records])
+    return designations, minutes, distances, velocities
+
+
+def neo_ranges(path, count):
+    """Split the rows of the NEO CSV file into byte ranges.
+
+    :param path: A path to the NEO CSV file.
+    :param count: The desired number of chunks.
+    :return: The positions of the `NEO_FIELDS` in each row, and a list of
+    (start, end) offsets.
+    """
+    with open(path, 'rb') as infile:
+        header = infile.readline()
+        size = os.fstat(infile.fileno()).st_size
+        positions = [next(csv.reader([header.decode('utf-8')])).index(field)
+                     for field in NEO_FIELDS]
+        if size <= len(header):
+            return positions, []
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return positions, split_ranges(data, len(header), size, count,
+                                           b'\n', after=True)
+
+
+def approach_ranges(path, count):
+    """Split the records of the close approach JSON file into byte ranges.
+
+    :param path: A path to the close approach JSON file.
+    :param count: The desired number of chunks.
+    :return: A list of (start, end) offsets.
+    """
+    with open(path, 'rb') as infile:
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            key = _find(data, b'"data"', 0, len(data))
+            opening = _find(data, b'[', key, len(data)) if key >= 0 else -1
+            if opening < 0:
+                raise ChunkError(f"{path} has no close approach data.")
+            first = _find(data, b'[', opening + 1, len(data))
+            closing = _find(data, b']', opening + 1, len(data))
+            if first < 0 or closing < first:
+                return []
+
+            # The data array ends at the last closing bracket that directly
+            # follows another one, which is always near the end of the file.
+            end = len(data)
+            while True:
+                end = data.rfind(b']', first, end)
+                if end < 0:
+                    raise ChunkError(f"{path} has unterminated close "
+                                     f"approach data.")
+                previous = data[max(first, end - _WINDOW):end]
+                if previous.rstrip().endswith(b']'):
+                    break
+            return split_ranges(data, first, end, count, b'[')
+
+
+def load_parallel(neo_csv_path, cad_json_path, jobs=None):
+    """Load the NEOs and their close approaches on a pool of processes.
+
+    :param neo_csv_path: A path to a CSV file containing data about
+    near-Earth objects.
+    :param cad_json_path: A path to a JSON file containing data about close
+    approaches.
+    :param jobs: The number of worker processes, or None for one per CPU.
+    :return: A list of `NearEarthObject`s, in file order, and an
+    `ApproachSequence` of their close approaches, in file order.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    positions, neo_chunks = neo_ranges(neo_csv_path, jobs)
+    approach_chunks = approach_ranges(cad_json_path,
+                                      jobs * CHUNKS_PER_WORKER)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        neo_futures = [executor.submit(parse_neo_chunk, neo_csv_path, start,
+                                       end, positions)
+                       for start, end in neo_chunks]
+        approach_futures = [executor.submit(parse_approach_chunk,
+                                            cad_json_path, start, end)
+                            for start, end in approach_chunks]
+
+        neos = []
+        for future in neo_futures:
+            fields, count = future.result()
+            if count:
+                neos.extend(map(NearEarthObject,
+                                *(field.split('\n') for field in fields)))
+
+        designations = []
+        minutes, distances, velocities = array('q'), array('d'), array('d')
+        for future in approach_futures:
+            chunk_designations, *chunk_columns = future.result()
+            if len(chunk_columns[0]):
+                designations.extend(chunk_designations.split('\n'))
+            for column, chunk_column in zip((minutes, distances, velocities),
+                                            chunk_columns):
+                column.extend(chunk_column)
+
+    # Join the approaches to their NEOs in one pass over the designations.
+    neo_row_by_designation = {neo.designation: row
+                              for row, neo in enumerate(neos)}
+    neo_rows = list(map(neo_row_by_designation.get, designations))
+    if None in neo_rows:
+        found = [row is not None for row in neo_rows]
+        logger.warning("Dropped %d close approaches of unknown NEOs.",
+                       len(found) - sum(found))
+        minutes, distances, velocities = (
+            array(column.typecode, itertools.compress(column, found))
+            for column in (minutes, distances, velocities))
+        neo_rows = itertools.compress(neo_rows, found)
+    columns = ApproachColumns(minutes, distances, velocities,
+                              array('i', neo_rows), neos)
+    return neos, ApproachSequence(columns, neos)
@@ -0,0 +1,187 @@
+"""Split the close approaches into date partitions, and load only some.
+
+The `convert_partitions` function reads the close approach JSON file once and
+writes one binary approach file (in the format of `mapped`) per year or per
+month of approach time into a directory, along with a `manifest.json` that
+records, for each partition, its file, its number of approaches, and the
+smallest and largest day, distance, velocity and NEO diameter among its
+approaches.
+
+The `load_partitions` function reads only the manifest up front, and then
+maps just the partitions whose ranges can satisfy the given filters - usually
+the date filters of a query - so partitions outside the requested window are
+never opened. The selected partitions are stitched into a single
+`ApproachSequence` for an `NEODatabase`.
+"""
+import hashlib
+import json
+import pathlib
+
+from columns import ApproachColumns, ApproachSequence
+from filters import normalize_filters
+from helpers import MONTHS, cd_to_minutes, minutes_to_ordinal
+from indexes import filters_may_match, value_range
+from mapped import (ApproachFileError, MappedApproaches, known_records,
+                    write_approaches)
+
+
+# The name of the manifest file in a partition directory.
+MANIFEST = 'manifest.json'
+
+# How to compute the partition of a close approach from its `cd` field.
+PARTITION_KEYS = {
+    'year': lambda calendar_date: calendar_date[:4],
+    'month': lambda calendar_date: f"{calendar_date[:4]}-"
+                                   f"{MONTHS[calendar_date[5:8]]:02d}",
+}
+
+
+def neo_digest(neos):
+    """Return a fingerprint of the designations of a collection of NEOs.
+
+    :param neos: A collection of `NearEarthObject`s, in file order.
+    :return: A hexadecimal SHA-256 digest.
+    """
+    text = '\n'.join(neo.designation for neo in neos)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def convert_partitions(cad_json_path, neos, directory, by='year'):
+    """Split close approach data from a JSON file into partition files.
+
+    :param cad_json_path: A path to a JSON file containing data about close
+    approaches.
+    :param neos: The collection of `NearEarthObject`s loaded from the NEO CSV
+    file, in file order.
+    :param directory: A path to the directory to write the partitions and the
+    manifest into. It's created if needed.
+    :param by: One of the keys of `PARTITION_KEYS`.
+    :return: The manifest, as written.
+
+    The approaches of NEOs missing from `neos` are set aside with a warning.
+    """
+    if by not in PARTITION_KEYS:
+        raise ValueError(f"Can't partition by {by!r}.")
+    key = PARTITION_KEYS[by]
+    directory = pathlib.Path(directory)
+    neo_row = {neo.designation: row for row, neo in enumerate(neos)}
+    with open(cad_json_path, 'r') as infile:
+        records = known_records(json.load(infile)['data'], neo_row)
+    groups = {}
+    for record in records:
+        groups.setdefault(key(record[3]), []).append(record)
+
+    diameters = [neo.diameter for neo in neos]
+    directory.mkdir(parents=True, exist_ok=True)
+    _remove_partitions(directory)
+
+    partitions = []
+    for name in sorted(groups):
+        records = groups[name]
+        filename = f"cad-{name}.bin"
+        write_approaches(records, neo_row, directory / filename, table=False)
+        bounds = {
+            'date': value_range(minutes_to_ordinal(cd_to_minutes(record[3]))
+                                for record in records),
+            'distance': value_range(float(record[4]) for record in records),
+            'velocity': value_range(float(record[7]) for record in records),
+            'diameter': value_range(diameters[neo_row[record[0]]]
+                                    for record in records),
+        }
+        partitions.append({
+            'name': name,
+            'file': filename,
+            'count': len(records),
+            'min': {attribute: low for attribute, (low, _) in bounds.items()},
+            'max': {attribute: high
+                    for attribute, (_, high) in bounds.items()},
+        })
+
+    manifest = {'by': by, 'neos': len(neos), 'digest': neo_digest(neos),
+                'partitions': partitions}
+    with open(directory / MANIFEST, 'w') as outfile:
+        json.dump(manifest, outfile, indent=2)
+    return manifest
+
+
+def _remove_partitions(directory):
+    """Remove the partition files listed by an existing manifest."""
+    try:
+        with open(directory / MANIFEST, 'r') as infile:
+            partitions = json.load(infile)['partitions']
+    except (OSError, ValueError, KeyError):
+        return
+    for partition in partitions:
+        path = directory / partition['file']
+        if path.exists():
+            path.unlink()
+
+
+def read_manifest(directory, neos):
+    """Read the manifest of a partition directory.
+
+    :param directory: A path to a directory written by `convert_partitions`.
+    :param neos: The collection of `NearEarthObject`s loaded from the same
+    NEO CSV file that the partitions were converted against.
+    :return: The manifest, as a dictionary.
+    """
+    path = pathlib.Path(directory) / MANIFEST
+    with open(path, 'r') as infile:
+        manifest = json.load(infile)
+    if manifest['neos'] != len(neos) or \
+            manifest['digest'] != neo_digest(neos):
+        raise ApproachFileError(f"{path} was converted against other NEOs.")
+    return manifest
+
+
+def select_partitions(manifest, filters=()):
+    """Choose the partitions that may hold approaches matching the filters.
+
+    :param manifest: A manifest, as returned by `read_manifest`.
+    :param filters: A collection of filters.
+    :return: A list of the manifest entries of the selected partitions.
+    """
+    filters = normalize_filters(filters)
+    if filters is None:
+        return []
+    return [partition for partition in manifest['partitions']
+            if filters_may_match(filters, partition['min'],
+                                 partition['max'])]
+
+
+def load_partitions(directory, neos, filters=()):
+    """Map the partitions that may hold approaches matching the filters.
+
+    The filters themselves are still to be applied by the database; this only
+    skips the partitions that can't hold any match.
+
+    :param directory: A path to a directory written by `convert_partitions`.
+    :param neos: The collection of `NearEarthObject`s loaded from the same
+    NEO CSV file that the partitions were converted against.
+    :param filters: A collection of filters.
+    :return: An `ApproachSequence` of the approaches of the selected
+    partitions, in time order. Its `source` attribute describes the
+    selection, for `explain.QueryPlan`.
+    """
+    directory = pathlib.Path(directory)
+    manifest = read_manifest(directory, neos)
+    selected = select_partitions(manifest, filters)
+    parts = [MappedApproaches(directory / partition['file'], neos)
+             for partition in selected]
+    if len(parts) == 1:
+        approaches = parts[0]
+    else:
+        approaches = ApproachSequence(
+            ApproachColumns.concatenate([part.columns for part in parts],
+                                        neos),
+            neos)
+        # The columns were copied, so the partitions can be unmapped.
+        for part in parts:
+            part.close()
+    approaches.source = (f"{len(selected)} of "
+                         f"{len(manifest['partitions'])} partitions by "
+                         f"{manifest['by']}")
+    if selected:
+        approaches.source += (f", {selected[0]['name']} to "
+                              f"{selected[-1]['name']}")
+    return approaches
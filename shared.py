@@ -0,0 +1,252 @@
+"""Share the columns of the close approaches between processes.
+
+When several worker processes serve queries, each one loading its own
+`NEODatabase` multiplies the memory used by the data by the number of
+workers. Instead, a supervisor process loads the data files once and copies
+the columns into a `multiprocessing.shared_memory` segment:
+
+    minutes        int64    Time of closest approach of each approach.
+    distance       float64  Nominal approach distance of each approach, in au.
+    velocity       float64  Relative approach velocity of each approach.
+    neo diameter   float64  Diameter of each NEO, in km (NaN if unknown).
+    neo            int32    Position of each approach's NEO.
+    neo hazardous  uint8    Whether each NEO is potentially hazardous.
+
+followed by a string table: the designations, then the names, of the NEOs,
+as UTF-8 text separated by newlines. The segment starts with a small header.
+
+Each worker attaches to the segment by name. A `SharedApproaches` exposes its
+columns as typed `memoryview`s, without parsing or copying them, so every
+worker queries the same physical pages; only the indexes of each worker's
+`NEODatabase`, and the `CloseApproach` objects it returns, are private.
+
+    # In the supervisor:
+    with SharedApproaches.create(neos, approaches, 'neo-database'):
+        ...  # Start the workers, and wait for them.
+
+    # In each worker:
+    approaches = SharedApproaches.attach('neo-database')
+    database = NEODatabase(approaches.neos, approaches)
+
+The process that creates a segment owns it: closing its `SharedApproaches`
+(or leaving the `with` block) unlinks the segment, and so does the exit of
+the interpreter. If the supervisor crashes instead, the resource tracker of
+`multiprocessing` unlinks it. Workers only ever detach; the segment stays
+mapped in the workers already attached until they close it or exit.
+
+Appending approaches to a worker's database copies the shared columns into
+private arrays first, as for a mapped file, so the other workers never see
+the new rows.
+"""
+import struct
+import weakref
+
+from columns import ApproachColumns, ApproachSequence
+from models import NearEarthObject
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Shared memory segments need Python 3.8.
+    resource_tracker = shared_memory = None
+
+
+MAGIC = b'NEOSHM01'
+
+# Magic, approach count, NEO count, size of the string table.
+HEADER = struct.Struct('<8sqqq')
+
+# The columns of the approaches and of the NEOs, in segment order: the name
+# of the column, its typecode, and whether it holds one entry per NEO rather
+# than per approach. The 8-byte columns come first, so all are aligned.
+COLUMNS = (('minutes', 'q', False), ('distances', 'd', False),
+           ('velocities', 'd', False), ('neo_diameters', 'd', True),
+           ('neo_rows', 'i', False), ('neo_hazardous', 'B', True))
+
+_ITEM_SIZES = {'q': 8, 'd': 8, 'i': 4, 'B': 1}
+
+
+class SegmentError(ValueError):
+    """A shared memory segment doesn't hold close approaches."""
+
+
+def _check_support():
+    """Raise if shared memory segments aren't available."""
+    if shared_memory is None:
+        raise SegmentError("Shared memory segments need Python 3.8 or "
+                           "later.")
+
+
+def _attach(name):
+    """Attach to an existing segment, leaving its cleanup to its creator.
+
+    Attaching to a segment registers it with the resource tracker of the
+    process, which unlinks it when the tracker exits. A worker started by
+    the supervisor through `multiprocessing` shares the supervisor's
+    tracker, so the registration changes nothing; any other worker would
+    start its own tracker and unlink the segment as it exits, so its
+    registration is withdrawn.
+
+    :param name: The name of the segment.
+    :return: A `SharedMemory`.
+    """
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # The `track` argument is new in Python 3.13.
+        pass
+    tracker = getattr(resource_tracker, '_resource_tracker', None)
+    inherited = getattr(tracker, '_fd', None) is not None
+    segment = shared_memory.SharedMemory(name)
+    if not inherited:
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+def _release(segment, views, unlink):
+    """Detach from a segment, unlinking it if asked to.
+
+    :param segment: A `SharedMemory`.
+    :param views: The `memoryview`s over the segment, released first, in
+    reverse order.
+    :param unlink: Whether to destroy the segment.
+    """
+    try:
+        for view in reversed(views):
+            view.release()
+        segment.close()
+    finally:
+        if unlink:
+            segment.unlink()
+
+
+class SharedApproaches(ApproachSequence):
+    """A read-only sequence of close approaches in shared memory.
+
+    The columns of the segment are available as `memoryview`s in `columns`
+    (an `ApproachColumns`), and the NEOs rebuilt from the segment in `neos`.
+    """
+
+    def __init__(self, segment, owner=False):
+        """Read the columns of a segment written by `create`.
+
+        Use `create` or `attach` rather than this constructor.
+
+        :param segment: A `SharedMemory` holding close approaches.
+        :param owner: Whether closing this sequence unlinks the segment.
+        :raise SegmentError: If the segment doesn't hold close approaches.
+        """
+        self._segment = segment
+        self.name = segment.name
+        self.owner = owner
+        self._views = []
+        view = segment.buf
+
+        magic, count, neo_count, table_size = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise SegmentError(f"The segment {self.name!r} doesn't hold "
+                               f"close approaches.")
+        offset = HEADER.size
+        columns = {}
+        for name, typecode, per_neo in COLUMNS:
+            size = _ITEM_SIZES[typecode] * (neo_count if per_neo else count)
+            data = view[offset:offset + size]
+            columns[name] = data.cast(typecode)
+            self._views.extend((data, columns[name]))
+            offset += size
+
+        strings = bytes(view[offset:offset + table_size]).decode('utf-8')
+        strings = strings.split('\n') if neo_count else []
+        designations, names = strings[:neo_count], strings[neo_count:]
+        diameters, hazardous = columns['neo_diameters'], \
+            columns['neo_hazardous']
+        self.neos = [NearEarthObject(designation, name, diameters[row],
+                                     'Y' if hazardous[row] else 'N')
+                     for row, (designation, name)
+                     in enumerate(zip(designations, names))]
+
+        super().__init__(ApproachColumns(
+            columns['minutes'], columns['distances'], columns['velocities'],
+            columns['neo_rows'], self.neos, columns['neo_diameters'],
+            columns['neo_hazardous']), self.neos)
+        self._finalizer = weakref.finalize(self, _release, segment,
+                                           self._views, owner)
+
+    @classmethod
+    def create(cls, neos, approaches, name=None):
+        """Copy the columns of loaded close approaches into a new segment.
+
+        :param neos: The collection of `NearEarthObject`s, in the order that
+        the approaches refer to.
+        :param approaches: A collection of linked `CloseApproach`es, or an
+        `ApproachSequence` (such as from `parallel.load_parallel`).
+        :param name: The name of the segment, or None for a random one.
+        :return: A `SharedApproaches` owning the new segment.
+        :raise FileExistsError: If a segment with that name already exists.
+        """
+        _check_support()
+        neos = list(neos)
+        columns = getattr(approaches, 'columns', None)
+        if columns is None:
+            columns = ApproachColumns.from_approaches(
+                approaches, neos, {neo.designation: row
+                                   for row, neo in enumerate(neos)})
+        table = '\n'.join([neo.designation for neo in neos]
+                          + [neo.name or '' for neo in neos]).encode('utf-8')
+        data = [memoryview(getattr(columns, name)).cast('B')
+                for name, _, _ in COLUMNS]
+        size = HEADER.size + sum(map(len, data)) + len(table)
+
+        segment = shared_memory.SharedMemory(name, create=True, size=size)
+        try:
+            view = segment.buf
+            HEADER.pack_into(view, 0, MAGIC, len(columns), len(neos),
+                             len(table))
+            offset = HEADER.size
+            for column in data + [table]:
+                view[offset:offset + len(column)] = column
+                offset += len(column)
+            del view
+            return cls(segment, owner=True)
+        except BaseException:
+            segment.close()
+            segment.unlink()
+            raise
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to a segment created by `create`, in any process.
+
+        :param name: The name of the segment.
+        :return: A `SharedApproaches` reading the segment.
+        :raise FileNotFoundError: If there's no segment with that name.
+        :raise SegmentError: If the segment doesn't hold close approaches.
+        """
+        _check_support()
+        segment = _attach(name)
+        try:
+            return cls(segment)
+        except SegmentError:
+            segment.close()
+            raise
+
+    def close(self):
+        """Detach from the segment, and unlink it if this process owns it.
+
+        The columns can't be read anymore afterwards, nor can the
+        `CloseApproach` objects not built yet. Closing again does nothing.
+        """
+        self._finalizer()
+
+    def __enter__(self):
+        """Enter a `with` block that closes the sequence when it's left."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the sequence."""
+        self.close()
+
+    def __repr__(self):
+        """Represent the sequence in string format."""
+        return (f"SharedApproaches(name={self.name!r}, "
+                f"approaches={len(self)}, neos={len(self.neos)})")
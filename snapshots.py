@@ -0,0 +1,108 @@
+"""Version the indexes of an `NEODatabase`, so readers never see a write.
+
+A `Snapshot` holds one version of everything `append_approaches` changes: the
+number of rows, the bitmap index, the zone map, the sorted indexes and the
+rows of each NEO. A snapshot is never modified once the database publishes
+it. Appending approaches builds the next version from the current one:
+
+- The approach columns and the approaches themselves are append-only, so
+  every version shares them; a version only reads the rows below its size.
+- The bitmaps are immutable `int`s, and the rows of a day or of an NEO are
+  replaced rather than extended, so the next version shares all of those
+  that gain no rows. Only the containers holding them are copied.
+- The zone map shares the ranges of every block but the last, partly
+  filled one, and each sorted index copies its list of rows once.
+
+The database then publishes the new version with a single assignment. A
+query pins the version that is current when it starts and reads it until
+it's done, without any lock, while approaches are appended. A version is
+freed as soon as the last query reading it is.
+"""
+from indexes import BitmapIndex, SortedIndex, ZoneMap
+
+
+class Snapshot:
+    """One version of the indexes of an `NEODatabase`."""
+
+    def __init__(self, version, size, bitmaps, zones, sorted_indexes,
+                 rows_by_neo):
+        """Create a new `Snapshot`.
+
+        :param version: The number of versions published before this one.
+        :param size: The number of approach rows in this version.
+        :param bitmaps: A `BitmapIndex` over the rows.
+        :param zones: A `ZoneMap` over the rows.
+        :param sorted_indexes: A dictionary of `SortedIndex`es over the rows,
+        by attribute.
+        :param rows_by_neo: A list of the approach rows of each NEO, by the
+        NEO's position in the database.
+        """
+        self.version = version
+        self.size = size
+        self.bitmaps = bitmaps
+        self.zones = zones
+        self.sorted_indexes = sorted_indexes
+        self.rows_by_neo = rows_by_neo
+
+    @classmethod
+    def build(cls, columns, neo_count):
+        """Index every row of a database's approach columns.
+
+        The data files are usually in time order, in which case the time
+        index is free, so it's built along with the others.
+
+        :param columns: The `ApproachColumns` of the database's approaches.
+        :param neo_count: The number of NEOs in the database.
+        :return: The first `Snapshot` of the database.
+        """
+        rows_by_neo = [[] for _ in range(neo_count)]
+        for row, neo in enumerate(columns.neo_rows):
+            rows_by_neo[neo].append(row)
+        sorted_indexes = {}
+        if SortedIndex.is_sorted(columns, 'time'):
+            sorted_indexes['time'] = SortedIndex(columns, 'time',
+                                                 presorted=True)
+        return cls(0, len(columns), BitmapIndex(columns), ZoneMap(columns),
+                   sorted_indexes, rows_by_neo)
+
+    def extend(self, columns, start):
+        """Build the next version, with the rows appended since row `start`.
+
+        :param columns: The `ApproachColumns` of the database's approaches,
+        which end with the new rows.
+        :param start: The size of this version, where the new rows begin.
+        :return: A new `Snapshot`. This one is left unchanged.
+        """
+        bitmaps = self.bitmaps.copy()
+        bitmaps.append(columns, start)
+        zones = self.zones.copy()
+        zones.append(columns, start)
+        sorted_indexes = {}
+        for sort_by, index in self.sorted_indexes.items():
+            index = sorted_indexes[sort_by] = index.copy()
+            index.append(columns, start)
+
+        size, neo_rows = len(columns), columns.neo_rows
+        new_rows = {}
+        for row in range(start, size):
+            new_rows.setdefault(neo_rows[row], []).append(row)
+        rows_by_neo = list(self.rows_by_neo)
+        for neo, rows in new_rows.items():
+            rows_by_neo[neo] = rows_by_neo[neo] + rows
+        return Snapshot(self.version + 1, size, bitmaps, zones,
+                        sorted_indexes, rows_by_neo)
+
+    def with_index(self, sort_by, index):
+        """Build the same version with another sorted index.
+
+        :param sort_by: The attribute of the index.
+        :param index: A `SortedIndex` over the rows of this version.
+        :return: A new `Snapshot`, sharing everything else with this one.
+        """
+        return Snapshot(self.version, self.size, self.bitmaps, self.zones,
+                        dict(self.sorted_indexes, **{sort_by: index}),
+                        self.rows_by_neo)
+
+    def __repr__(self):
+        """Represent the snapshot in string format."""
+        return f"Snapshot(version={self.version}, size={self.size})"
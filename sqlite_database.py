@@ -0,0 +1,606 @@
+"""Store near-Earth objects and their close approaches in a SQLite database.
+
+The `ingest` function reads the NEO CSV file and the close approach JSON file
+once, and bulk-inserts their rows into an indexed SQLite database file, which
+only replaces the previous one once it's complete.
+
+A `SQLiteNEODatabase` answers the same `get_neo_by_designation`,
+`get_neo_by_name`, `query`, `count` and `aggregate` calls as an `NEODatabase`,
+but keeps the data on disk instead of in memory. The `AttributeFilter`s from
+`create_filters`, and the expression trees from `parse_expression`, are
+translated into a parameterized WHERE clause, and the matching rows are
+streamed from a cursor and turned into linked `NearEarthObject`s and
+`CloseApproach`es as they are consumed. New close
+approaches can be added later with `append_approaches`.
+
+The main module uses this backend with `--backend sqlite`.
+"""
+import csv
+import datetime
+import itertools
+import json
+import operator
+import os
+import pathlib
+import sqlite3
+import tempfile
+import time
+
+from aggregates import METRICS, check_aggregate, summarize
+from cursors import decode_token, encode_token, query_fingerprint
+from explain import QueryPlan
+from expressions import AllOf, AnyOf, Expression
+from filters import normalize_filters
+from helpers import cd_to_datetime, datetime_to_cd, datetime_to_str
+from models import NearEarthObject, CloseApproach
+
+
+# The number of rows fetched from a cursor at a time.
+FETCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE neos (
+    designation TEXT PRIMARY KEY,
+    name TEXT,
+    diameter REAL,
+    hazardous INTEGER NOT NULL
+);
+CREATE TABLE approaches (
+    designation TEXT NOT NULL,
+    cd TEXT NOT NULL,
+    time TEXT NOT NULL,
+    distance REAL NOT NULL,
+    velocity REAL NOT NULL
+);
+CREATE INDEX neos_name ON neos (name);
+CREATE INDEX approaches_designation ON approaches (designation);
+CREATE INDEX approaches_time ON approaches (time);
+CREATE INDEX approaches_distance ON approaches (distance);
+CREATE INDEX approaches_velocity ON approaches (velocity);
+"""
+
+# The SQL column compared by each filter attribute, and by each sort key.
+COLUMNS = {
+    'distance': 'a.distance',
+    'velocity': 'a.velocity',
+    'diameter': 'n.diameter',
+    'hazardous': 'n.hazardous',
+    'time': 'a.time',
+}
+
+OPERATORS = {
+    operator.eq: '=',
+    operator.ne: '!=',
+    operator.lt: '<',
+    operator.le: '<=',
+    operator.gt: '>',
+    operator.ge: '>=',
+}
+
+# SQL expressions computing each `aggregates.GROUP_KEYS` group, and how to
+# convert it back into the value used by the in-memory database.
+GROUPS = {
+    'day': ('substr(a.time, 1, 10)',
+            lambda day: datetime.datetime.strptime(day, '%Y-%m-%d').date()),
+    'month': ('substr(a.time, 1, 7)', str),
+    'year': ('CAST(substr(a.time, 1, 4) AS INTEGER)', int),
+    'neo': ('a.designation', str),
+    'hazardous': ('n.hazardous', bool),
+}
+
+AGGREGATES = {
+    'count': 'COUNT(*)',
+    'neos': 'COUNT(DISTINCT a.designation)',
+    'min_distance': 'MIN(a.distance)',
+    'mean_distance': 'AVG(a.distance)',
+    'max_distance': 'MAX(a.distance)',
+    'min_velocity': 'MIN(a.velocity)',
+    'mean_velocity': 'AVG(a.velocity)',
+    'max_velocity': 'MAX(a.velocity)',
+}
+
+_SELECT = """
+SELECT n.designation, n.name, n.diameter, n.hazardous,
+       a.cd, a.distance, a.velocity
+FROM approaches AS a JOIN neos AS n ON n.designation = a.designation
+"""
+
+# The columns of `_SELECT`, followed by the position of a row for a resume
+# token: its rowid and its value of the sort key.
+_SELECT_PAGE = """
+SELECT n.designation, n.name, n.diameter, n.hazardous,
+       a.cd, a.distance, a.velocity, a.rowid, {key}
+FROM approaches AS a JOIN neos AS n ON n.designation = a.designation
+"""
+
+
+def ingest(neo_csv_path, cad_json_path, db_path):
+    """Load the NEO and close approach data files into a new SQLite file.
+
+    The database is built in a temporary file next to `db_path`, and only
+    moved into place once every row is inserted, so a load that fails
+    leaves no database that looks up to date. The rows are streamed from the
+    data files into the inserts.
+
+    :param neo_csv_path: A path to a CSV file containing data about
+    near-Earth objects.
+    :param cad_json_path: A path to a JSON file containing data about close
+    approaches.
+    :param db_path: A path to the SQLite database file to create, replacing
+    any existing one.
+    """
+    db_path = pathlib.Path(db_path)
+    descriptor, build_path = tempfile.mkstemp(
+        prefix=f".{db_path.name}.", suffix='.tmp', dir=db_path.parent)
+    os.close(descriptor)
+    try:
+        connection = sqlite3.connect(build_path)
+        try:
+            with connection:
+                connection.executescript(SCHEMA)
+                with open(neo_csv_path, 'r') as infile:
+                    connection.executemany(
+                        "INSERT INTO neos VALUES (?, ?, ?, ?)",
+                        ((row['pdes'], row['name'] or None,
+                          float(row['diameter']) if row['diameter'] else None,
+                          row['pha'] == 'Y')
+                         for row in csv.DictReader(infile)))
+                with open(cad_json_path, 'r') as infile:
+                    records = json.load(infile)['data']
+                connection.executemany(
+                    "INSERT INTO approaches VALUES (?, ?, ?, ?, ?)",
+                    ((elem[0], elem[3],
+                      datetime_to_str(cd_to_datetime(elem[3])),
+                      float(elem[4]), float(elem[7])) for elem in records))
+        finally:
+            connection.close()
+        os.replace(build_path, db_path)
+    except BaseException:
+        os.unlink(build_path)
+        raise
+
+
+def _date_clause(op, value):
+    """Translate a date filter into a clause on the `time` column.
+
+    Times are stored as 'YYYY-MM-DD hh:mm' text, so a date comparison becomes
+    a range comparison against the start of that day or of the next one.
+
+    :return: A `(clause, params)` tuple, or None if `op` isn't supported.
+    """
+    day = value.isoformat()
+    next_day = (value + datetime.timedelta(days=1)).isoformat()
+    if op is operator.eq:
+        return 'a.time >= ? AND a.time < ?', [day, next_day]
+    if op is operator.ge:
+        return 'a.time >= ?', [day]
+    if op is operator.gt:
+        return 'a.time >= ?', [next_day]
+    if op is operator.le:
+        return 'a.time < ?', [next_day]
+    if op is operator.lt:
+        return 'a.time < ?', [day]
+    return None
+
+
+def _translate(f):
+    """Translate a filter, or an expression tree, into a clause.
+
+    A NOT is taken over `COALESCE(clause, 0)`, so that a comparison with an
+    unknown diameter counts as false inside it, as it does in Python.
+
+    :return: A `(clause, params)` tuple, or None if any part of the filter
+    can't be translated.
+    """
+    if isinstance(f, Expression):
+        parts = [_translate(child) for child in f.children]
+        if None in parts:
+            return None
+        params = [param for _, child_params in parts
+                  for param in child_params]
+        clauses = [f"({clause})" for clause, _ in parts]
+        # The clause is parenthesized, as `where_clause` joins it to others
+        # with AND, which binds tighter than OR.
+        if isinstance(f, AllOf):
+            return f"({' AND '.join(clauses)})", params
+        if isinstance(f, AnyOf):
+            return f"({' OR '.join(clauses)})", params
+        return f"NOT COALESCE({' OR '.join(clauses)}, 0)", params
+
+    attribute = getattr(f, 'attribute', None)
+    op = getattr(f, 'op', None)
+    if attribute == 'date':
+        return _date_clause(op, f.value)
+    if attribute in COLUMNS and op in OPERATORS:
+        return f"{COLUMNS[attribute]} {OPERATORS[op]} ?", [f.value]
+    return None
+
+
+def _keyset_clause(sort_by, descending, row, value):
+    """Select the rows after a position in the order of a paged query.
+
+    The rows are ordered by whether their sort value is missing, then by the
+    value, then by rowid.
+
+    :param sort_by: The attribute the query is sorted by, or None.
+    :param descending: Whether the values are sorted from the largest down.
+    :param row: The rowid of the last row of the previous page.
+    :param value: Its value of `sort_by`, or None if it's missing.
+    :return: A `(clause, params)` tuple.
+    """
+    if sort_by is None:
+        return "a.rowid > ?", [row]
+    column = COLUMNS[sort_by]
+    if value is None:
+        return f"({column} IS NULL AND a.rowid > ?)", [row]
+    comparator = '<' if descending else '>'
+    return (f"({column} IS NULL OR {column} {comparator} ? OR "
+            f"({column} = ? AND a.rowid > ?))", [value, value, row])
+
+
+def where_clause(filters):
+    """Translate a collection of filters into a parameterized WHERE clause.
+
+    Filters with an unknown attribute or comparator can't be translated, and
+    are returned to be evaluated on each `CloseApproach` instead. Filters that
+    can't all match (see `normalize_filters`) become `WHERE 0`.
+
+    :param filters: A collection of filters capturing user-specified
+    criteria.
+    :return: A tuple `(sql, params, residual)`: the WHERE clause (or an empty
+    string), its parameters, and the untranslated filters.
+    """
+    filters = normalize_filters(filters)
+    if filters is None:
+        return ' WHERE 0', [], []
+    clauses, params, residual = [], [], []
+    for f in filters:
+        translated = _translate(f)
+        if translated is None:
+            residual.append(f)
+            continue
+        clauses.append(translated[0])
+        params.extend(translated[1])
+    sql = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    return sql, params, residual
+
+
+class SQLiteNEODatabase:
+    """A database of near-Earth objects and close approaches in SQLite.
+
+    A `SQLiteNEODatabase` is a drop-in replacement for an `NEODatabase` whose
+    data lives in a file created by `ingest`. NEOs are built on demand and
+    cached by designation, so every result refers to the same
+    `NearEarthObject` for the same NEO.
+    """
+
+    def __init__(self, db_path):
+        """Open a `SQLiteNEODatabase` on a file created by `ingest`.
+
+        :param db_path: A path to the SQLite database file.
+        """
+        self._connection = sqlite3.connect(str(db_path))
+        self._neos = {}
+
+    def close(self):
+        """Close the underlying database connection."""
+        self._connection.close()
+
+    def _neo(self, designation, name, diameter, hazardous):
+        """Build (or fetch from the cache) the NEO of a row."""
+        neo = self._neos.get(designation)
+        if neo is None:
+            neo = NearEarthObject(designation, name,
+                                  '' if diameter is None else diameter,
+                                  'Y' if hazardous else 'N')
+            self._neos[designation] = neo
+        return neo
+
+    def _approaches(self, sql, params, residual=(), positions=None):
+        """Stream the linked `CloseApproach`es of the rows of a query.
+
+        :param sql: A query selecting the columns of `_SELECT`, optionally
+        followed by more columns.
+        :param params: The parameters of the query.
+        :param residual: Filters to evaluate on each approach.
+        :param positions: A list to append the extra columns of the row of
+        each generated approach to, or None.
+        :yield: The matching `CloseApproach` objects.
+        """
+        cursor = self._connection.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    return
+                for row in rows:
+                    neo = self._neo(*row[:4])
+                    approach = CloseApproach(neo.designation, *row[4:7])
+                    approach.neo = neo
+                    if all(f(approach) for f in residual):
+                        if positions is not None:
+                            positions.append(row[7:])
+                        yield approach
+        finally:
+            cursor.close()
+
+    def append_approaches(self, approaches):
+        """Insert new close approaches into the database file.
+
+        The rows are inserted in one transaction. NEOs whose approaches were
+        already fetched get the new approaches appended; no other cached NEO
+        is touched.
+
+        :param approaches: An iterable of unlinked `CloseApproach`es, each of
+        an NEO already in the database.
+        :return: The number of approaches added.
+        :raise KeyError: If an approach's NEO isn't in the database. No
+        approach is added then.
+        """
+        approaches = list(approaches)
+        missing = sorted(
+            designation
+            for designation in {approach._designation
+                                for approach in approaches}
+            if self._connection.execute(
+                "SELECT 1 FROM neos WHERE designation = ?",
+                (designation,)).fetchone() is None)
+        if missing:
+            raise KeyError(f"No NEO with designation {missing[0]!r}.")
+
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO approaches VALUES (?, ?, ?, ?, ?)",
+                ((approach._designation, datetime_to_cd(approach.time),
+                  datetime_to_str(approach.time), approach.distance,
+                  approach.velocity) for approach in approaches))
+
+        for approach in approaches:
+            neo = self._neos.get(approach._designation)
+            if neo is not None and neo.approaches:
+                approach.neo = neo
+                neo.approaches.append(approach)
+        return len(approaches)
+
+    def _fetch_neo(self, column, value):
+        """Fetch the first NEO whose `column` equals `value`, with approaches.
+
+        :return: The `NearEarthObject`, or None.
+        """
+        row = self._connection.execute(
+            "SELECT designation, name, diameter, hazardous FROM neos "
+            f"WHERE {column} = ? ORDER BY rowid LIMIT 1", (value,)).fetchone()
+        if row is None:
+            return None
+        neo = self._neo(*row)
+        if not neo.approaches:
+            neo.approaches.extend(self._approaches(
+                _SELECT + " WHERE a.designation = ? ORDER BY a.rowid",
+                (neo.designation,)))
+        return neo
+
+    def get_neo_by_designation(self, designation):
+        """Find and return an NEO by its primary designation.
+
+        :param designation: The primary designation of the NEO to search for.
+        :return: The `NearEarthObject` with the desired primary designation, or
+        `None`.
+        """
+        return self._fetch_neo('designation', designation)
+
+    def get_neo_by_name(self, name):
+        """Find and return an NEO by its name.
+
+        :param name: The name, as a string, of the NEO to search for.
+        :return: The `NearEarthObject` with the desired name, or `None`.
+        """
+        if not name:
+            return None
+        return self._fetch_neo('name', name)
+
+    def _query_sql(self, filters, sort_by, descending, limit, offset):
+        """Build the SQL of a query.
+
+        The limit and the offset become a LIMIT clause unless some filters
+        must be evaluated on each approach.
+
+        :return: A tuple `(sql, params, residual)`: the query, its
+        parameters, and the filters to evaluate on each approach.
+        """
+        where, params, residual = where_clause(filters)
+        sql = _SELECT + where
+        if sort_by is None:
+            sql += " ORDER BY a.rowid"
+        else:
+            column = COLUMNS[sort_by]
+            direction = ' DESC' if descending else ''
+            sql += (f" ORDER BY {column} IS NULL, {column}{direction},"
+                    f" a.rowid")
+        if (limit or offset) and not residual:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [limit or -1, offset]
+        return sql, params, residual
+
+    def explain(self, filters=(), sort_by=None, descending=False,
+                limit=None, offset=0):
+        """Describe how `query` would answer a query, without running it.
+
+        The access path is SQLite's own `EXPLAIN QUERY PLAN`, followed by the
+        filters that couldn't be translated into SQL. SQLite doesn't estimate
+        the number of results, so none is given.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param sort_by: An attribute to sort by, as for `query`.
+        :param descending: Whether to sort from the largest value down.
+        :param limit: The maximum number of results, as for `query`.
+        :param offset: The number of results to skip, as for `query`.
+        :return: A `QueryPlan`, whose planning time is recorded.
+        """
+        start = time.perf_counter()
+        filters = tuple(filters)
+        plan = QueryPlan(filters)
+        normalized = normalize_filters(filters)
+        plan.normalized = normalized if normalized is None \
+            else [str(f) for f in normalized]
+        sql, params, residual = self._query_sql(filters, sort_by, descending,
+                                                limit, offset)
+        plan.access = [
+            f"SQLite: {row[-1]}" for row in self._connection.execute(
+                "EXPLAIN QUERY PLAN " + sql, params)]
+        plan.access.extend(f"{f}: checked on every row" for f in residual)
+        plan.order = 'file order' if sort_by is None else \
+            f"by {sort_by}{', descending' if descending else ''}, in SQLite"
+        plan.total = self._connection.execute(
+            "SELECT COUNT(*) FROM approaches").fetchone()[0]
+        plan.record('planning', start)
+        return plan
+
+    def query(self, filters=(), sort_by=None, descending=False, limit=None,
+              offset=0, plan=None):
+        """Query approaches to generate those that match the filters.
+
+        Results come in the order of the data file unless `sort_by` is given.
+        The sort is done by SQLite, using the index on `sort_by` where one
+        exists; approaches of NEOs with an unknown diameter come last.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param sort_by: An attribute to sort by: 'time', 'distance',
+        'velocity' or 'diameter'.
+        :param descending: Whether to sort from the largest value down.
+        :param limit: The maximum number of results. If 0 or None, don't
+        limit the results at all.
+        :param offset: The number of results to skip before the first one.
+        :param plan: Accepted for compatibility with `NEODatabase.query`;
+        SQLite doesn't report the rows it examines.
+        :return: A stream of matching `CloseApproach` objects.
+        :raise ValueError: If `limit` or `offset` is negative.
+        """
+        if (limit or 0) < 0 or offset < 0:
+            raise ValueError("The limit and the offset can't be negative.")
+        sql, params, residual = self._query_sql(filters, sort_by, descending,
+                                                limit, offset)
+        approaches = self._approaches(sql, params, residual)
+        if residual:
+            return itertools.islice(approaches, offset,
+                                    offset + limit if limit else None)
+        return approaches
+
+    def paginate(self, filters=(), sort_by=None, descending=False, size=10,
+                 offset=0, token=None):
+        """Fetch a page of the results of a query, and a token for the next.
+
+        The token records the rowid and the sort value of the last row of the
+        page, and the next page selects only the rows after it in the sort
+        order (a keyset), so SQLite can start from that key in its index
+        instead of skipping the earlier pages.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param sort_by: An attribute to sort by, as for `query`.
+        :param descending: Whether to sort from the largest value down.
+        :param size: The maximum number of results in the page.
+        :param offset: The number of results to skip before the first page.
+        It's ignored when resuming from a token.
+        :param token: The token returned with the previous page of the same
+        query, or None for the first page.
+        :return: The same structure as `NEODatabase.paginate`.
+        :raise cursors.TokenError: If the token is malformed or was issued
+        for another query.
+        """
+        if size < 1 or offset < 0:
+            raise ValueError("The page size must be positive, and the offset "
+                             "can't be negative.")
+        filters = tuple(filters)
+        query = query_fingerprint('sqlite', filters, sort_by, descending)
+        where, params, residual = where_clause(filters)
+        column = COLUMNS[sort_by] if sort_by is not None else 'NULL'
+        if token is not None:
+            state, offset = decode_token(token, query), 0
+            clause, clause_params = _keyset_clause(
+                sort_by, descending, state['row'], state.get('value'))
+            if where:
+                # Parenthesize the clauses of the filters, so the keyset
+                # constrains all of them rather than the last operand of an
+                # OR among them.
+                where = f" WHERE ({where[len(' WHERE '):]}) AND {clause}"
+            else:
+                where = f" WHERE {clause}"
+            params = params + clause_params
+
+        sql = _SELECT_PAGE.format(key=column) + where
+        if sort_by is None:
+            sql += " ORDER BY a.rowid"
+        else:
+            direction = ' DESC' if descending else ''
+            sql += (f" ORDER BY {column} IS NULL, {column}{direction},"
+                    f" a.rowid")
+        if not residual:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [size + 1, offset]
+            offset = 0
+
+        positions = []
+        approaches = list(itertools.islice(
+            self._approaches(sql, params, residual, positions), offset,
+            offset + size + 1))
+        if len(approaches) <= size:
+            return approaches, None
+        row, value = positions[offset + size - 1]
+        return approaches[:size], encode_token(query, row=row, value=value)
+
+    def count(self, filters=(), plan=None):
+        """Count the close approaches that match a collection of filters.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param plan: Accepted for compatibility with `NEODatabase.count`.
+        :return: The number of matching `CloseApproach` objects.
+        """
+        where, params, residual = where_clause(filters)
+        if residual:
+            return sum(1 for _ in self._approaches(_SELECT + where, params,
+                                                   residual))
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM approaches AS a "
+            "JOIN neos AS n ON n.designation = a.designation" + where,
+            params).fetchone()[0]
+
+    def aggregate(self, filters=(), group_by=None, metrics=METRICS):
+        """Summarize the close approaches that match a collection of filters.
+
+        The summary is computed by SQLite with GROUP BY. If some filters
+        can't be translated into SQL, the matching approaches are streamed
+        through `Accumulator`s instead.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param group_by: None, or one of 'day', 'month', 'year', 'neo' or
+        'hazardous'.
+        :param metrics: A collection of metric names from
+        `aggregates.METRICS`.
+        :return: The same structure as `NEODatabase.aggregate`.
+        """
+        check_aggregate(group_by, metrics)
+        where, params, residual = where_clause(filters)
+        if residual:
+            return summarize(self._approaches(_SELECT + where, params,
+                                              residual),
+                             group_by, metrics)
+        columns = [AGGREGATES[metric] for metric in metrics]
+        source = ("FROM approaches AS a "
+                  "JOIN neos AS n ON n.designation = a.designation" + where)
+        if group_by is None:
+            row = self._connection.execute(
+                f"SELECT {', '.join(columns) or 'NULL'} {source}",
+                params).fetchone()
+            return dict(zip(metrics, row))
+
+        expression, convert = GROUPS[group_by]
+        cursor = self._connection.execute(
+            f"SELECT {expression} AS grp, {', '.join(columns + ['NULL'])} "
+            f"{source} GROUP BY grp ORDER BY grp", params)
+        return {convert(row[0]): dict(zip(metrics, row[1:]))
+                for row in cursor}
+
@@ -0,0 +1,87 @@
+"""Stream the results of a blocking query to asyncio code in batches.
+
+A query of an `NEODatabase` is a plain generator: consuming it on an event
+loop would block the loop for as long as the scan runs, which can be seconds
+for a broad query. The `stream_batches` function instead advances the
+generator in an executor, one batch at a time, and hands the batches to the
+loop through a bounded queue:
+
+- The loop only ever waits on the executor, so other tasks keep running
+  while a batch is computed.
+- At most `queue_size` batches wait in the queue; the next batch isn't
+  computed until the consumer makes room, so a slow consumer (such as a
+  client reading a large export) holds back the scan instead of filling
+  memory.
+- Closing the async generator (as `aclose`, a `break` out of `async for`, or
+  the cancellation of the consuming task do) cancels the producer. The scan
+  stops after the batch being computed, if any.
+
+`NEODatabase.aquery` streams a query this way.
+"""
+import asyncio
+import itertools
+
+
+# The number of results in each batch.
+BATCH_SIZE = 1000
+
+# The number of computed batches that may wait for the consumer.
+QUEUE_SIZE = 4
+
+
+def _running_loop():
+    """Return the event loop running the current coroutine."""
+    try:
+        return asyncio.get_running_loop()
+    except AttributeError:
+        # `get_running_loop` is new in Python 3.7; until then,
+        # `get_event_loop` returns the running loop inside a coroutine.
+        return asyncio.get_event_loop()
+
+
+async def stream_batches(iterable, batch_size=BATCH_SIZE,
+                         queue_size=QUEUE_SIZE, executor=None):
+    """Generate the values of a blocking iterable in batches, asynchronously.
+
+    The iterable is only iterated in the executor, one batch at a time, so
+    a generator doesn't start running until the first batch is requested.
+
+    :param iterable: An iterable of values.
+    :param batch_size: The maximum number of values in each batch.
+    :param queue_size: The maximum number of batches computed ahead of the
+    consumer.
+    :param executor: A `concurrent.futures.Executor`, or None for the loop's
+    default executor.
+    :yield: Non-empty lists of values, in order.
+    """
+    loop = _running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    iterator = iter(iterable)
+
+    def take():
+        return list(itertools.islice(iterator, batch_size))
+
+    async def produce():
+        try:
+            while True:
+                batch = await loop.run_in_executor(executor, take)
+                if batch:
+                    await queue.put(batch)
+                if len(batch) < batch_size:
+                    break
+        except Exception as err:
+            await queue.put(err)
+            return
+        await queue.put(None)
+
+    producer = loop.create_task(produce())
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        producer.cancel()
@@ -0,0 +1,176 @@
+"""Notify standing queries of the close approaches added to a database.
+
+A subscription registers a collection of filters - from `create_filters`, or
+`--where` expressions - with an `NEODatabase`, along with where to send the
+matches: a callback, or an `asyncio.Queue`. Whenever `append_approaches` adds
+approaches, only the new rows are evaluated against the subscriptions, and
+each subscription receives the new approaches matching all of its filters.
+
+Many subscriptions tend to share filters, such as `hazardous = True`, so a
+`Subscriptions` set keeps one entry per distinct filter - its predicate index
+- and evaluates each filter at most once per append, on every new row, no
+matter how many subscriptions use it. A subscription's matches are then the
+intersection of the bitmaps of its filters, and a subscription stops
+evaluating its filters as soon as the intersection is empty.
+
+A callback that raises is logged, and doesn't prevent the other
+subscriptions from being notified nor the append from completing.
+"""
+import asyncio
+import logging
+
+from expressions import Expression
+from filters import normalize_filters
+from indexes import bitmap_from_rows, iter_rows
+
+
+logger = logging.getLogger(__name__)
+
+
+def filter_key(approach_filter):
+    """Identify a filter, so that equal filters are evaluated once.
+
+    :param approach_filter: A filter, or an expression tree.
+    :return: A hashable key, equal for filters that match the same rows.
+    """
+    if isinstance(approach_filter, Expression):
+        return str(approach_filter)
+    attribute = getattr(approach_filter, 'attribute', None)
+    if attribute is None:
+        return approach_filter
+    return (attribute, approach_filter.op, approach_filter.value)
+
+
+class Subscription:
+    """A standing query on the approaches added to a database."""
+
+    def __init__(self, filters, target, loop=None):
+        """Create a new `Subscription`.
+
+        :param filters: A collection of filters capturing user-specified
+        criteria.
+        :param target: A 1-argument callable, called with the list of new
+        matching `CloseApproach`es after each append that has any, or an
+        `asyncio.Queue` to put each new match into.
+        :param loop: With a queue, the event loop running its consumers, if
+        the approaches are appended from another thread; None otherwise.
+        """
+        self.filters = list(filters)
+        # The filters as simplified by `normalize_filters`, or None if they
+        # can't all match.
+        self.normalized = normalize_filters(self.filters)
+        self.keys = [] if self.normalized is None \
+            else [filter_key(f) for f in self.normalized]
+        self.target = target
+        self.loop = loop
+        self.active = True
+        # The number of matches delivered so far.
+        self.delivered = 0
+
+    def deliver(self, approaches):
+        """Send new matching approaches to the target.
+
+        :param approaches: A non-empty list of `CloseApproach`es.
+        """
+        self.delivered += len(approaches)
+        if not isinstance(self.target, asyncio.Queue):
+            self.target(approaches)
+        elif self.loop is None:
+            for approach in approaches:
+                self.target.put_nowait(approach)
+        else:
+            for approach in approaches:
+                self.loop.call_soon_threadsafe(self.target.put_nowait,
+                                               approach)
+
+    def __repr__(self):
+        """Represent the subscription in string format."""
+        filters = ', '.join(str(f) for f in self.filters) or 'everything'
+        return (f"Subscription({filters}, delivered={self.delivered}, "
+                f"active={self.active})")
+
+
+class Subscriptions:
+    """The subscriptions of a database, with an index of their filters."""
+
+    def __init__(self):
+        """Create an empty set of subscriptions."""
+        self._subscriptions = []
+        # The distinct filters of the subscriptions: for each key, a filter
+        # and the number of subscriptions using it.
+        self._filters = {}
+
+    def __len__(self):
+        """Return the number of active subscriptions."""
+        return len(self._subscriptions)
+
+    def __iter__(self):
+        """Iterate over the active subscriptions."""
+        return iter(list(self._subscriptions))
+
+    def add(self, filters, target, loop=None):
+        """Register a new subscription.
+
+        :param filters: A collection of filters.
+        :param target: A callback or an `asyncio.Queue`, as for
+        `Subscription`.
+        :param loop: The event loop of the queue, as for `Subscription`.
+        :return: The new `Subscription`.
+        """
+        subscription = Subscription(filters, target, loop)
+        for key, f in zip(subscription.keys, subscription.normalized or ()):
+            entry = self._filters.setdefault(key, [f, 0])
+            entry[1] += 1
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def remove(self, subscription):
+        """Cancel a subscription. Cancelling it again does nothing.
+
+        :param subscription: A `Subscription` returned by `add`.
+        """
+        if not subscription.active:
+            return
+        subscription.active = False
+        self._subscriptions.remove(subscription)
+        for key in subscription.keys:
+            entry = self._filters[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._filters[key]
+
+    def notify(self, start, approaches, row_check):
+        """Deliver the matches among newly added rows to the subscriptions.
+
+        :param start: The row ID of the first new approach.
+        :param approaches: The list of new `CloseApproach`es, in row order.
+        :param row_check: A function building a predicate on row IDs from a
+        filter.
+        :return: The number of matches delivered, over all subscriptions.
+        """
+        size = len(approaches)
+        everything = (1 << size) - 1
+        selections = {}
+        delivered = 0
+        for subscription in list(self._subscriptions):
+            if subscription.normalized is None:
+                continue
+            selected = everything
+            for key in subscription.keys:
+                if key not in selections:
+                    check = row_check(self._filters[key][0])
+                    selections[key] = bitmap_from_rows(
+                        (offset for offset in range(size)
+                         if check(start + offset)), size)
+                selected &= selections[key]
+                if not selected:
+                    break
+            if not selected:
+                continue
+            matches = [approaches[offset] for offset in iter_rows(selected)]
+            try:
+                subscription.deliver(matches)
+            except Exception:
+                logger.exception("The target of %r failed.", subscription)
+            delivered += len(matches)
+        return delivered
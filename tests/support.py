@@ -0,0 +1,50 @@
+"""Share the test data files and the comparison helpers of the test modules.
+
+Many modules check a database, a backend or a loader by comparing its results
+with those of the in-memory `NEODatabase` over the same test data files: they
+compare the `summary` of each approach, and their test cases derive from
+`MemoryDatabaseTestCase`, which loads that database once per class.
+"""
+import pathlib
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def summary(approach):
+    """Describe a close approach by values comparable across databases."""
+    return (approach.neo.designation, approach.time, approach.distance,
+            approach.velocity)
+
+
+def summaries(approaches):
+    """Describe a collection of close approaches with `summary`."""
+    return [summary(approach) for approach in approaches]
+
+
+class MemoryDatabaseTestCase(unittest.TestCase):
+    """A test case comparing results with the in-memory database, `memory`."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.memory = NEODatabase(load_neos(TEST_NEO_FILE),
+                                 load_approaches(TEST_CAD_FILE))
+
+    def assertSameResults(self, db, filters=(), **query):
+        """Check that a query answers as it does on the in-memory database.
+
+        :param db: A database, such as an `NEODatabase` over another backend.
+        :param filters: A collection of filters.
+        :param query: Other arguments of `query`.
+        :return: The summaries of the expected results.
+        """
+        expected = summaries(self.memory.query(filters, **query))
+        self.assertEqual(summaries(db.query(filters, **query)), expected)
+        return expected
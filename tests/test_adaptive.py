@@ -0,0 +1,75 @@
+"""Check that row checks are reordered from what they observe on the data.
+
+An `AdaptiveChecks` must always return the same answer as checking every
+predicate, while learning to run the cheapest, most selective predicates
+first - and learning again when the data changes during a scan.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_adaptive
+"""
+import unittest
+
+from adaptive import AdaptiveChecks
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE, summary
+
+
+class RowFilter:
+    """A filter with no attribute, so that it's checked row by row."""
+
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def __call__(self, approach):
+        return self.predicate(approach)
+
+
+class TestAdaptiveChecks(unittest.TestCase):
+    def test_selective_checks_move_first(self):
+        checks = AdaptiveChecks(
+            [lambda row: True, lambda row: row % 10 == 0,
+             lambda row: row % 2 == 0],
+            ['always', 'tenth', 'even'], sample_size=100, interval=1000)
+        results = [checks(row) for row in range(5000)]
+        self.assertEqual(results, [row % 10 == 0 for row in range(5000)])
+        rows, labels, pass_rates, costs = checks.history[0]
+        self.assertEqual(rows, 100)
+        self.assertEqual(labels, ['tenth', 'even', 'always'])
+        self.assertEqual(pass_rates, [0.1, 0.5, 1.0])
+        self.assertEqual(len(costs), 3)
+
+    def test_order_follows_a_shift_in_the_data(self):
+        checks = AdaptiveChecks(
+            [lambda row: row >= 1000, lambda row: row < 1000 or row % 5],
+            ['late', 'early'], sample_size=50, interval=500)
+        for row in range(3000):
+            self.assertEqual(checks(row), row >= 1000 and row % 5 != 0)
+        orders = [labels[0] for _, labels, _, _ in checks.history]
+        self.assertEqual(orders[0], 'late')
+        self.assertEqual(orders[-1], 'early')
+
+
+class TestAdaptiveQueries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), cls.approaches)
+
+    def test_queries_match_a_scan(self):
+        filters = [RowFilter(lambda a: a.velocity < 100),
+                   RowFilter(lambda a: a.neo.name is None),
+                   RowFilter(lambda a: a.distance < 0.05)] + \
+            create_filters(velocity_min=10.5)
+        expected = [summary(a) for a in self.approaches
+                    if all(f(a) for f in filters)]
+        self.assertTrue(expected)
+        self.assertEqual([summary(a) for a in self.db.query(filters)],
+                         expected)
+        self.assertEqual(self.db.count(filters), len(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Check that `NEODatabase.aggregate` summarizes matching close approaches.
+
+Every summary is compared against statistics computed directly from the
+approaches that match the same filters.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_aggregates
+"""
+import datetime
+import unittest
+from unittest import mock
+
+from aggregates import UnsupportedMetricError, summarize
+from columns import ApproachColumns, ApproachSequence
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE, summary
+
+
+class TestAggregate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+
+    def test_aggregate_without_grouping(self):
+        filters = create_filters(hazardous=True, distance_max=0.3)
+        matches = [approach for approach in self.approaches
+                   if all(f(approach) for f in filters)]
+        distances = [approach.distance for approach in matches]
+
+        summary = self.db.aggregate(filters)
+        self.assertEqual(summary['count'], len(matches))
+        self.assertEqual(summary['neos'],
+                         len({approach.neo for approach in matches}))
+        self.assertEqual(summary['min_distance'], min(distances))
+        self.assertEqual(summary['max_distance'], max(distances))
+        self.assertAlmostEqual(summary['mean_distance'],
+                               sum(distances) / len(distances))
+        self.assertEqual(summary['max_velocity'],
+                         max(approach.velocity for approach in matches))
+
+    def test_aggregate_grouped_by_month(self):
+        summary = self.db.aggregate(group_by='month', metrics=('count',))
+        self.assertEqual(list(summary), sorted(summary))
+        self.assertEqual(sum(group['count'] for group in summary.values()),
+                         len(self.approaches))
+        self.assertEqual(summary['2020-03']['count'], sum(
+            1 for approach in self.approaches
+            if (approach.time.year, approach.time.month) == (2020, 3)))
+
+    def test_aggregate_grouped_by_hazardous(self):
+        summary = self.db.aggregate(group_by='hazardous',
+                                    metrics=('count', 'neos'))
+        self.assertEqual(set(summary), {False, True})
+        self.assertEqual(summary[True]['count'],
+                         self.db.count(create_filters(hazardous=True)))
+
+    def test_aggregate_matches_a_fold_of_the_approaches(self):
+        filters = create_filters(distance_max=0.2)
+        matches = list(self.db.query(filters))
+        for group_by in (None, 'day', 'month', 'year', 'neo', 'hazardous'):
+            with self.subTest(group_by=group_by):
+                self.assertEqual(self.db.aggregate(filters, group_by),
+                                 summarize(matches, group_by))
+
+    def test_aggregate_builds_no_approaches(self):
+        neos = load_neos(TEST_NEO_FILE)
+        columns = ApproachColumns.from_approaches(
+            self.approaches, neos,
+            {neo.designation: row for row, neo in enumerate(neos)})
+        db = NEODatabase(neos, ApproachSequence(columns, neos))
+        filters = create_filters(hazardous=True, distance_max=0.3)
+        with mock.patch.object(ApproachSequence, '__getitem__',
+                               side_effect=AssertionError):
+            for group_by in (None, 'month', 'neo'):
+                self.assertEqual(db.aggregate(filters, group_by),
+                                 self.db.aggregate(filters, group_by))
+
+    def test_aggregate_of_no_matches(self):
+        filters = create_filters(start_date=datetime.date(2021, 1, 1))
+        summary = self.db.aggregate(filters)
+        self.assertEqual(summary['count'], 0)
+        self.assertIsNone(summary['mean_velocity'])
+        self.assertEqual(self.db.aggregate(filters, group_by='day'), {})
+
+    def test_aggregate_rejects_unknown_metrics(self):
+        with self.assertRaises(UnsupportedMetricError):
+            self.db.aggregate(metrics=('median_distance',))
+        with self.assertRaises(UnsupportedMetricError):
+            self.db.aggregate(group_by='week')
+
+
+if __name__ == '__main__':
+    unittest.main()
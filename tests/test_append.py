@@ -0,0 +1,133 @@
+"""Check that close approaches can be appended to a loaded database.
+
+The test close approaches are split in two: a database is built from the
+first part, and the second part is appended to it (out of time order). Every
+query, count and lookup must then match a database built from all of them.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_append
+"""
+import datetime
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from mapped import MappedApproaches, convert_approaches
+from models import CloseApproach
+from sqlite_database import SQLiteNEODatabase, ingest
+from tests.support import (TEST_NEO_FILE, TEST_CAD_FILE,
+                           MemoryDatabaseTestCase, summary)
+
+
+CRITERIA = (
+    {},
+    {'date': datetime.date(2020, 3, 2)},
+    {'start_date': datetime.date(2020, 8, 1)},
+    {'distance_max': 0.1, 'velocity_min': 20},
+    {'diameter_min': 0.5, 'hazardous': True},
+)
+
+# The first approaches are loaded; the others are appended in two batches.
+SPLIT = 3000
+
+
+class TestAppendApproaches(MemoryDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.memory.create_sorted_index('distance')
+
+        approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), approaches[:SPLIT])
+        cls.db.create_sorted_index('distance')
+        cls.db.append_approaches(approaches[SPLIT + 500:])
+        cls.db.append_approaches(approaches[SPLIT:SPLIT + 500])
+
+    def assertSameApproaches(self, db):
+        for criteria in CRITERIA:
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                self.assertEqual(
+                    sorted(summary(a) for a in db.query(filters)),
+                    sorted(summary(a) for a in self.memory.query(filters)))
+                self.assertEqual(db.count(filters), self.memory.count(filters))
+
+    def test_queries_match_a_full_load(self):
+        self.assertSameApproaches(self.db)
+
+    def test_sorted_indexes_are_updated(self):
+        filters = create_filters(hazardous=True)
+        for sort_by in ('time', 'distance'):
+            with self.subTest(sort_by=sort_by):
+                received = [getattr(a, 'minutes' if sort_by == 'time'
+                                    else sort_by)
+                            for a in self.db.query(filters, sort_by=sort_by)]
+                self.assertEqual(received, sorted(received))
+                self.assertEqual(len(received), self.memory.count(filters))
+
+    def test_new_approaches_are_linked(self):
+        for designation in ('1865', '2020 BS'):
+            neo = self.db.get_neo_by_designation(designation)
+            expected = self.memory.get_neo_by_designation(designation)
+            self.assertEqual(sorted(summary(a) for a in neo.approaches),
+                             sorted(summary(a) for a in expected.approaches))
+
+    def test_unknown_neo_adds_nothing(self):
+        db = NEODatabase(load_neos(TEST_NEO_FILE),
+                         load_approaches(TEST_CAD_FILE)[:10])
+        approaches = load_approaches(TEST_CAD_FILE)[10:20]
+        approaches.append(CloseApproach('not-real', '2020-Jan-01 00:00',
+                                        0.1, 10))
+        with self.assertRaises(KeyError):
+            db.append_approaches(approaches)
+        self.assertEqual(db.count(), 10)
+
+    def test_append_to_a_mapped_database(self):
+        neos = load_neos(TEST_NEO_FILE)
+        approaches = load_approaches(TEST_CAD_FILE)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'cad.bin'
+            convert_approaches(TEST_CAD_FILE, neos, path)
+            db = NEODatabase(neos, MappedApproaches(path, neos))
+            # Link one NEO before the append, but not the others.
+            db.get_neo_by_designation('1865')
+            db.append_approaches(approaches[:SPLIT])
+            self.assertEqual(db.count(), len(approaches) + SPLIT)
+            for designation in ('1865', '2020 BS'):
+                expected = [a for a in approaches + approaches[:SPLIT]
+                            if a._designation == designation]
+                self.assertEqual(
+                    len(db.get_neo_by_designation(designation).approaches),
+                    len(expected))
+
+    def test_append_to_a_sqlite_database(self):
+        neos = load_neos(TEST_NEO_FILE)
+        approaches = load_approaches(TEST_CAD_FILE)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'neos.sqlite3'
+            ingest(TEST_NEO_FILE, TEST_CAD_FILE, path)
+            db = SQLiteNEODatabase(path)
+            try:
+                before = len(db.get_neo_by_designation('1865').approaches)
+                count = db.append_approaches(approaches[:SPLIT])
+                self.assertEqual(count, SPLIT)
+                self.assertEqual(db.count(), len(approaches) + SPLIT)
+                added = [a for a in approaches[:SPLIT]
+                         if a._designation == '1865']
+                self.assertEqual(
+                    len(db.get_neo_by_designation('1865').approaches),
+                    before + len(added))
+                with self.assertRaises(KeyError):
+                    db.append_approaches([CloseApproach(
+                        'not-real', '2020-Jan-01 00:00', 0.1, 10)])
+                self.assertEqual(db.count(), len(approaches) + SPLIT)
+            finally:
+                db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""Check that queries can be streamed to asyncio code without blocking it.
+
+`aquery` must yield the same approaches as `query`, in batches, while other
+tasks keep running; it must not compute more batches than its queue holds
+ahead of a slow consumer, and must stop scanning once closed.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_async_query
+"""
+import asyncio
+import time
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from streaming import stream_batches
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+class Counted:
+    """An iterator of integers that records how many were taken."""
+
+    def __init__(self, n, delay=0.0):
+        self.n, self.delay, self.taken = n, delay, 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.taken >= self.n:
+            raise StopIteration
+        time.sleep(self.delay)
+        self.taken += 1
+        return self.taken - 1
+
+
+class TestStreamBatches(unittest.TestCase):
+    def test_batches_keep_the_order(self):
+        async def collect():
+            return [batch async for batch in stream_batches(range(25), 10)]
+        self.assertEqual(run(collect()),
+                         [list(range(10)), list(range(10, 20)),
+                          list(range(20, 25))])
+
+    def test_closing_stops_the_scan(self):
+        values = Counted(10000)
+
+        async def first():
+            batches = stream_batches(values, 10, queue_size=2)
+            batch = await batches.__anext__()
+            await batches.aclose()
+            await asyncio.sleep(0.05)
+            return batch
+
+        self.assertEqual(run(first()), list(range(10)))
+        # The first batch, two queued, and at most one in flight.
+        self.assertLessEqual(values.taken, 40)
+
+    def test_slow_consumer_holds_back_the_producer(self):
+        values = Counted(10000)
+
+        async def consume():
+            taken = []
+            async for _ in stream_batches(values, 10, queue_size=1):
+                await asyncio.sleep(0.01)
+                taken.append(values.taken)
+                if len(taken) == 5:
+                    break
+            return taken
+
+        for consumed, taken in enumerate(run(consume()), 1):
+            self.assertLessEqual(taken, (consumed + 2) * 10)
+
+    def test_errors_reach_the_consumer(self):
+        def failing():
+            yield 1
+            raise KeyError('boom')
+
+        async def collect():
+            return [batch async for batch in stream_batches(failing(), 10)]
+        with self.assertRaises(KeyError):
+            run(collect())
+
+    def test_loop_keeps_running(self):
+        values = Counted(20, delay=0.005)
+
+        async def ticker(ticks):
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0.001)
+
+        async def main():
+            ticks = []
+            task = asyncio.ensure_future(ticker(ticks))
+            batches = [batch async for batch in stream_batches(values, 20)]
+            task.cancel()
+            return batches, ticks
+
+        batches, ticks = run(main())
+        self.assertEqual(batches, [list(range(20))])
+        self.assertGreater(len(ticks), 5)
+
+
+class TestAsyncQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                             load_approaches(TEST_CAD_FILE))
+
+    def test_aquery_matches_query(self):
+        for filters, sort_by in ((create_filters(distance_max=0.1), None),
+                                 (create_filters(hazardous=True), 'velocity'),
+                                 ((), None)):
+            with self.subTest(filters=filters, sort_by=sort_by):
+                async def collect():
+                    return [batch async for batch in self.db.aquery(
+                        filters, sort_by=sort_by, batch_size=300)]
+                batches = run(collect())
+                self.assertTrue(all(0 < len(batch) <= 300
+                                    for batch in batches))
+                self.assertEqual(sum(batches, []),
+                                 list(self.db.query(filters,
+                                                    sort_by=sort_by)))
+
+    def test_aquery_errors(self):
+        async def collect():
+            return [batch async for batch in self.db.aquery(limit=-1)]
+        with self.assertRaises(ValueError):
+            run(collect())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""Check that query plans describe how the databases answer queries.
+
+`explain` must describe a query without changing its results, estimate the
+number of matches from the indexes, and record the rows examined and the
+order of the row checks when the plan is passed to `query` or `count`.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_explain
+"""
+import datetime
+import io
+import pathlib
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from database import NEODatabase
+from explain import STAGES, QueryPlan
+from extract import load_neos, load_approaches
+from filters import create_filters
+from main import make_parser, query
+from sqlite_database import SQLiteNEODatabase, ingest
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE
+
+
+class TestExplain(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                             load_approaches(TEST_CAD_FILE))
+
+    def test_plan_of_indexed_filters(self):
+        filters = create_filters(start_date=datetime.date(2020, 1, 1),
+                                 distance_max=0.05, hazardous=True)
+        plan = self.db.explain(filters)
+        self.assertIsInstance(plan, QueryPlan)
+        self.assertEqual(len(plan.normalized), 3)
+        self.assertEqual(plan.total, 4700)
+        self.assertTrue(any('bitmap index' in step for step in plan.access))
+        self.assertEqual(plan.order, 'internal order')
+        self.assertIn('planning', plan.timings)
+        self.assertEqual(plan.estimated, self.db.count(filters))
+
+    def test_plan_of_contradiction(self):
+        plan = self.db.explain(create_filters(distance_min=0.3,
+                                              distance_max=0.1))
+        self.assertIsNone(plan.normalized)
+        self.assertEqual(plan.estimated, 0)
+        self.assertIn("Access:      none, no row can match", plan.lines())
+
+    def test_sort_strategies(self):
+        self.assertIn('sorted index on time',
+                      self.db.explain(sort_by='time').order)
+        self.assertIn('bounded heap',
+                      self.db.explain(sort_by='velocity', limit=5).order)
+        self.assertIn('sort every match',
+                      self.db.explain(sort_by='velocity').order)
+
+    def test_analyze_records_rows(self):
+        filters = create_filters(velocity_min=10, velocity_max=20,
+                                 distance_max=0.2)
+        expected = list(self.db.query(filters))
+        plan = self.db.explain(filters)
+        results = list(self.db.query(filters, plan=plan))
+        self.assertEqual(results, expected)
+        self.assertGreaterEqual(plan.examined, len(results))
+        self.assertLessEqual(plan.examined, plan.exact + plan.candidates)
+
+        plan = self.db.explain(filters)
+        self.assertEqual(self.db.count(filters, plan=plan), len(expected))
+        self.assertEqual(plan.examined, plan.candidates)
+
+    def test_lines(self):
+        plan = self.db.explain(create_filters(hazardous=True))
+        plan.returned = 0
+        plan.record('writing', 0.0)
+        lines = plan.lines()
+        self.assertTrue(lines[0].startswith('Filters:'))
+        self.assertTrue(any(line.startswith('Returned:') for line in lines))
+        time_line = [line for line in lines if line.startswith('Time:')][0]
+        positions = [time_line.index(stage) for stage in STAGES
+                     if stage in plan.timings]
+        self.assertEqual(positions, sorted(positions))
+
+
+class TestExplainSQLite(unittest.TestCase):
+    def test_plan_uses_sqlite(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / 'neos.sqlite3'
+            ingest(TEST_NEO_FILE, TEST_CAD_FILE, path)
+            db = SQLiteNEODatabase(path)
+            try:
+                plan = db.explain(create_filters(distance_max=0.05),
+                                  sort_by='distance', limit=3)
+                self.assertTrue(plan.access)
+                self.assertTrue(all(step.startswith('SQLite: ')
+                                    for step in plan.access))
+                self.assertEqual(plan.total, 4700)
+                self.assertEqual(len(list(db.query(
+                    create_filters(distance_max=0.05), plan=plan))),
+                    db.count(create_filters(distance_max=0.05)))
+            finally:
+                db.close()
+
+
+class TestExplainCommand(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                             load_approaches(TEST_CAD_FILE))
+        cls.parser = make_parser()[0]
+
+    def run_query(self, *arguments):
+        args = self.parser.parse_args(['query'] + list(arguments))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            query(self.db, args)
+        return output.getvalue().splitlines()
+
+    def test_explain_doesnt_run_the_query(self):
+        lines = self.run_query('--hazardous', '--explain')
+        self.assertTrue(lines[0].startswith('Filters:'))
+        self.assertFalse(any(line.startswith('Returned:') for line in lines))
+
+    def test_explain_analyze_times_every_stage(self):
+        lines = self.run_query('--hazardous', '--limit', '3',
+                               '--explain', 'analyze')
+        self.assertEqual(len([line for line in lines
+                              if line.startswith('A close approach')]), 3)
+        self.assertIn('Returned:    3 rows', lines)
+        time_line = [line for line in lines if line.startswith('Time:')][0]
+        for stage in STAGES:
+            self.assertIn(stage, time_line)
+
+    def test_explain_analyze_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / 'results.csv'
+            lines = self.run_query('--limit', '4', '--outfile', str(path),
+                                   '--explain', 'analyze')
+            self.assertIn('Returned:    4 rows', lines)
+            self.assertEqual(len(path.read_text().splitlines()), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
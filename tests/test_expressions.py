@@ -0,0 +1,120 @@
+"""Check that boolean filter expressions parse and answer like a scan.
+
+Expressions are parsed into trees of filters, and the approaches that the
+in-memory and SQLite databases return for them are compared with evaluating
+each tree on every approach.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_expressions
+"""
+import datetime
+import math
+import operator
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from expressions import (AllOf, AnyOf, ExpressionError, NoneOf,
+                         parse_expression)
+from extract import load_neos, load_approaches
+from filters import create_filters
+from sqlite_database import SQLiteNEODatabase, ingest
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE, summary
+
+
+EXPRESSIONS = (
+    "hazardous OR diameter > 1 km AND NOT velocity < 5",
+    "NOT hazardous",
+    "NOT diameter > 0.5",
+    "hazardous = false AND diameter >= 0.1",
+    "(distance < 0.05 OR velocity > 30) AND date >= 2020-06-01",
+    "date = 2020-03-02 OR date = 2020-03-03 OR distance <= 0.001 au",
+    "NOT (date < 2020-02-01 OR date > 2020-02-29) AND velocity != 10",
+    "diameter < 0.1 OR diameter > 1",
+)
+
+
+class TestParseExpression(unittest.TestCase):
+    def test_precedence(self):
+        tree = parse_expression("hazardous OR diameter > 1 km AND NOT "
+                                "velocity < 5")
+        self.assertIsInstance(tree, AnyOf)
+        leaf, both = tree.children
+        self.assertEqual((leaf.attribute, leaf.value), ('hazardous', True))
+        self.assertIsInstance(both, AllOf)
+        diameter, negation = both.children
+        self.assertEqual((diameter.op, diameter.value), (operator.gt, 1.0))
+        self.assertIsInstance(negation, NoneOf)
+        self.assertEqual(negation.children[0].op, operator.lt)
+
+    def test_grouping_and_keywords(self):
+        tree = parse_expression("(hazardous or distance < .1) and not "
+                                "date = 2020-01-01")
+        self.assertIsInstance(tree, AllOf)
+        self.assertEqual({type(child) for child in tree.children},
+                         {AnyOf, NoneOf})
+        leaf = parse_expression("date <= 2020-12-31")
+        self.assertEqual(leaf.value, datetime.date(2020, 12, 31))
+
+    def test_neo_level(self):
+        self.assertEqual(parse_expression("hazardous OR diameter > 1").level,
+                         'neo')
+        self.assertEqual(parse_expression("hazardous OR velocity > 1").level,
+                         'approach')
+
+    def test_errors(self):
+        for text in ("", "hazardous OR", "(hazardous", "size > 1",
+                     "distance > far", "date > 2020-13-01", "hazardous < 1",
+                     "velocity > 5 km", "distance 5", "hazardous)"):
+            with self.subTest(text=text):
+                with self.assertRaises(ExpressionError):
+                    parse_expression(text)
+
+
+class TestExpressionQueries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                             load_approaches(TEST_CAD_FILE))
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = pathlib.Path(cls.tmp.name) / 'neos.sqlite3'
+        ingest(TEST_NEO_FILE, TEST_CAD_FILE, path)
+        cls.sqlite = SQLiteNEODatabase(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sqlite.close()
+        cls.tmp.cleanup()
+
+    def test_queries_match_a_scan(self):
+        for text in EXPRESSIONS:
+            with self.subTest(text=text):
+                tree = parse_expression(text)
+                expected = [summary(a) for a in self.db.query() if tree(a)]
+                self.assertTrue(expected)
+                self.assertEqual([summary(a) for a in self.db.query([tree])],
+                                 expected)
+                self.assertEqual(self.db.count([tree]), len(expected))
+                self.assertEqual(
+                    sorted(summary(a) for a in self.sqlite.query([tree])),
+                    sorted(expected))
+
+    def test_combined_with_other_filters(self):
+        filters = create_filters(start_date=datetime.date(2020, 7, 1))
+        tree = parse_expression("hazardous OR distance < 0.02")
+        expected = [summary(a) for a in self.db.query(filters) if tree(a)]
+        self.assertEqual(
+            [summary(a) for a in self.db.query(filters + [tree])], expected)
+
+    def test_unknown_diameters_under_not(self):
+        tree = parse_expression("NOT diameter > 0.5")
+        unknown = [a for a in self.db.query([tree])
+                   if math.isnan(a.neo.diameter)]
+        self.assertTrue(unknown)
+        self.assertEqual(self.sqlite.count([tree]), self.db.count([tree]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,6 +17,7 @@ import math
 import unittest
 
 from extract import load_neos, load_approaches
+from helpers import cd_to_datetime, cd_to_minutes, datetime_to_minutes
 from models import NearEarthObject, CloseApproach
 
 
@@ -118,6 +119,37 @@ class TestLoadApproaches(unittest.TestCase):
         self.assertIsNotNone(approach)
         self.assertIsInstance(approach.velocity, float)
 
+    def test_approach_time_is_stored_as_minutes(self):
+        approach = self.get_first_approach_or_none()
+        self.assertIsNotNone(approach)
+        self.assertIsInstance(approach.minutes, int)
+        self.assertEqual(datetime_to_minutes(approach.time), approach.minutes)
+        self.assertEqual(approach.day, approach.time.date().toordinal())
+
+    def test_approach_designations_are_the_neo_designations(self):
+        neos = {neo.designation: neo for neo in load_neos(TEST_NEO_FILE)}
+        for approach in self.approaches:
+            self.assertIs(approach._designation,
+                          neos[approach._designation].designation)
+
+
+class TestCalendarDates(unittest.TestCase):
+    def test_cd_to_minutes_matches_strptime(self):
+        for calendar_date in ('2020-Jan-01 00:00', '2020-Feb-29 13:45',
+                              '1900-Dec-31 23:59', '1969-Dec-31 23:59'):
+            with self.subTest(calendar_date=calendar_date):
+                self.assertEqual(
+                    cd_to_minutes(calendar_date),
+                    datetime_to_minutes(cd_to_datetime(calendar_date)))
+
+    def test_cd_to_minutes_rejects_malformed_dates(self):
+        for calendar_date in ('2019-Feb-29 00:00', '2020-Foo-01 00:00',
+                              '2020-Jan-01 24:00', '2020-01-01 00:00',
+                              '2020-Jan-01'):
+            with self.subTest(calendar_date=calendar_date):
+                with self.assertRaises(ValueError):
+                    cd_to_minutes(calendar_date)
+
 
 if __name__ == '__main__':
     unittest.main()
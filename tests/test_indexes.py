@@ -0,0 +1,94 @@
+"""Check that the bitmap index of an `NEODatabase` selects the right rows.
+
+The `BitmapIndex` answers filters from bitmaps over approach row IDs. Every
+selection is compared against a brute-force evaluation of the same filters.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_indexes
+"""
+import datetime
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from indexes import bitmap_from_rows, iter_rows, popcount
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE
+
+
+class TestBitmaps(unittest.TestCase):
+    def test_bitmap_round_trips_rows(self):
+        rows = [0, 3, 7, 8, 64, 99]
+        bitmap = bitmap_from_rows(rows, 100)
+        self.assertEqual(list(iter_rows(bitmap)), rows)
+        self.assertEqual(popcount(bitmap), len(rows))
+
+    def test_empty_bitmap_has_no_rows(self):
+        self.assertEqual(list(iter_rows(0)), [])
+        self.assertEqual(popcount(0), 0)
+
+
+class TestBitmapIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+
+    def assertSelects(self, **criteria):
+        filters = create_filters(**criteria)
+        expected = [approach for approach in self.approaches
+                    if all(f(approach) for f in filters)]
+        self.assertEqual(list(self.db.query(filters)), expected)
+        self.assertEqual(self.db.count(filters), len(expected))
+
+    def test_hazardous(self):
+        self.assertSelects(hazardous=True)
+        self.assertSelects(hazardous=False)
+
+    def test_date_ranges(self):
+        self.assertSelects(date=datetime.date(2020, 3, 2))
+        self.assertSelects(start_date=datetime.date(2020, 4, 1),
+                           end_date=datetime.date(2020, 6, 30))
+
+    def test_date_counts_from_day_ranges(self):
+        self.assertSelects(start_date=datetime.date(2020, 7, 1),
+                           end_date=datetime.date(2020, 6, 1))
+        self.assertSelects(end_date=datetime.date(2019, 12, 31))
+
+    def test_bucket_edges_and_interiors(self):
+        self.assertSelects(distance_max=0.1)
+        self.assertSelects(distance_min=0.0123)
+        self.assertSelects(velocity_min=12.5, velocity_max=33.3)
+        self.assertSelects(diameter_min=0.5)
+        self.assertSelects(diameter_max=1.234)
+
+    def test_combined_filters(self):
+        self.assertSelects(start_date=datetime.date(2020, 2, 1),
+                           distance_max=0.2, velocity_min=10,
+                           diameter_min=0.1, hazardous=True)
+
+    def test_unindexed_filter_is_scanned(self):
+        def early(approach):
+            return approach.time.hour < 6
+
+        expected = [approach for approach in self.approaches
+                    if early(approach)]
+        self.assertEqual(list(self.db.query([early])), expected)
+        self.assertEqual(self.db.count([early]), len(expected))
+
+    def test_neo_filters_are_pushed_down_to_neos(self):
+        filters = create_filters(diameter_min=0.123, diameter_max=1.234,
+                                 distance_max=0.1)
+        _, _, residual = self.db._select(filters)
+        self.assertEqual([f.level for f in residual], ['approach'])
+        self.assertSelects(diameter_min=0.123, diameter_max=1.234,
+                           distance_max=0.1)
+
+    def test_count_without_filters(self):
+        self.assertEqual(self.db.count(), len(self.approaches))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -41,6 +41,12 @@ class TestLimit(unittest.TestCase):
         self.assertEqual(tuple(limit(iter(self.iterable), 0)), (0, 1, 2, 3, 4))
         self.assertEqual(tuple(limit(iter(self.iterable), None)), (0, 1, 2, 3, 4))
 
+    def test_limit_iterator_with_offset(self):
+        self.assertEqual(tuple(limit(iter(self.iterable), 2, 1)), (1, 2))
+        self.assertEqual(tuple(limit(iter(self.iterable), 0, 3)), (3, 4))
+        self.assertEqual(tuple(limit(iter(self.iterable), None, 3)), (3, 4))
+        self.assertEqual(tuple(limit(iter(self.iterable), 3, 4)), (4,))
+
     def test_limit_produces_an_iterable(self):
         self.assertIsInstance(limit(self.iterable, 3), collections.abc.Iterable)
         self.assertIsInstance(limit(self.iterable, 5), collections.abc.Iterable)
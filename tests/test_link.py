@@ -0,0 +1,119 @@
+"""Check that close approaches are joined to their NEOs, orphans aside.
+
+An approach whose designation isn't in the NEO collection mustn't abort the
+load: the `NEODatabase` sets it aside in `orphans`, reports it in its
+`link_stats`, and answers queries from the other approaches, as do the
+parallel loader and the databases over binary files and partitions.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_link
+"""
+import csv
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from mapped import MappedApproaches, convert_approaches
+from parallel import load_parallel
+from partitions import convert_partitions, load_partitions
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE
+
+
+# NEOs left out of the NEO collection, making their approaches orphans.
+MISSING = {'1865', '2020 BP13', '2019 SC8'}
+
+
+class TestLinkApproaches(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.orphans = [approach for approach in cls.approaches
+                       if approach._designation in MISSING]
+
+    def test_link_stats(self):
+        neos = load_neos(TEST_NEO_FILE)
+        db = NEODatabase(neos, load_approaches(TEST_CAD_FILE))
+        stats = db.link_stats
+        self.assertEqual(stats.approaches, len(self.approaches))
+        self.assertEqual(stats.linked, len(self.approaches))
+        self.assertEqual(stats.orphans, 0)
+        self.assertEqual(stats.neos, len({approach._designation
+                                          for approach in self.approaches}))
+        self.assertGreater(stats.throughput, 0)
+        self.assertIn('set aside 0 orphans', str(stats))
+        self.assertEqual(db.orphans, [])
+
+    def test_orphans_are_set_aside(self):
+        self.assertTrue(self.orphans)
+        neos = [neo for neo in load_neos(TEST_NEO_FILE)
+                if neo.designation not in MISSING]
+        approaches = load_approaches(TEST_CAD_FILE)
+        with self.assertLogs('database', 'WARNING'):
+            db = NEODatabase(neos, approaches)
+
+        self.assertEqual(len(db.orphans), len(self.orphans))
+        self.assertTrue(all(approach.neo is None and
+                            approach._designation in MISSING
+                            for approach in db.orphans))
+        self.assertEqual(db.link_stats.orphans, len(self.orphans))
+        self.assertEqual(db.count(), len(approaches) - len(self.orphans))
+        self.assertEqual(sum(len(neo.approaches) for neo in neos),
+                         db.count())
+        self.assertTrue(all(approach.neo is not None
+                            for approach in db.query()))
+        self.assertEqual(
+            db.count(create_filters(hazardous=True)),
+            sum(1 for approach in approaches
+                if approach.neo is not None and approach.neo.hazardous))
+
+    def test_parallel_loader_drops_orphans(self):
+        with open(TEST_NEO_FILE, newline='') as infile:
+            rows = list(csv.reader(infile))
+        kept = [row for row in rows if row[3] not in MISSING]
+        self.assertEqual(len(kept), len(rows) - len(MISSING))
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / 'neos.csv'
+            with open(path, 'w', newline='') as outfile:
+                csv.writer(outfile).writerows(kept)
+            with self.assertLogs('parallel', 'WARNING'):
+                neos, approaches = load_parallel(path, TEST_CAD_FILE, jobs=2)
+            memory = NEODatabase(load_neos(path),
+                                 load_approaches(TEST_CAD_FILE))
+        self.assertEqual(len(approaches),
+                         len(self.approaches) - len(self.orphans))
+        db = NEODatabase(neos, approaches)
+        self.assertEqual([str(approach) for approach in db.query()],
+                         [str(approach) for approach in memory.query()])
+
+    def test_converters_set_orphans_aside(self):
+        neos = [neo for neo in load_neos(TEST_NEO_FILE)
+                if neo.designation not in MISSING]
+        expected = NEODatabase(neos, load_approaches(TEST_CAD_FILE))
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / 'cad.bin'
+            with self.assertLogs('mapped', 'WARNING'):
+                convert_approaches(TEST_CAD_FILE, neos, path)
+            with MappedApproaches(path, neos) as mapped:
+                db = NEODatabase(neos, mapped)
+                self.assertEqual(len(mapped),
+                                 len(self.approaches) - len(self.orphans))
+                self.assertEqual([str(approach) for approach in db.query()],
+                                 [str(approach)
+                                  for approach in expected.query()])
+
+            partitions = pathlib.Path(directory) / 'partitions'
+            with self.assertLogs('mapped', 'WARNING'):
+                manifest = convert_partitions(TEST_CAD_FILE, neos, partitions)
+            self.assertEqual(sum(partition['count']
+                                 for partition in manifest['partitions']),
+                             len(self.approaches) - len(self.orphans))
+            db = NEODatabase(neos, load_partitions(partitions, neos))
+            self.assertEqual(db.count(), expected.count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Check that an `NEODatabase` can run straight off a binary approach file.
+
+The test close approaches are converted into a temporary binary file, and a
+database over the mapped file is compared with the in-memory database.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_mapped
+"""
+import datetime
+import math
+import pathlib
+import tempfile
+import unittest
+import weakref
+
+from columns import CACHE_SIZE
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from mapped import ApproachFileError, MappedApproaches, convert_approaches
+from tests.support import (TEST_NEO_FILE, TEST_CAD_FILE,
+                           MemoryDatabaseTestCase, summaries)
+
+
+class TestMappedApproaches(MemoryDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = pathlib.Path(cls.tmp.name) / 'cad.bin'
+        neos = load_neos(TEST_NEO_FILE)
+        convert_approaches(TEST_CAD_FILE, neos, cls.path)
+        cls.mapped = MappedApproaches(cls.path, neos)
+        cls.db = NEODatabase(neos, cls.mapped)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.mapped.close()
+        cls.tmp.cleanup()
+
+    def test_columns_match_the_json_data(self):
+        approaches = load_approaches(TEST_CAD_FILE)
+        self.assertEqual(len(self.mapped), len(approaches))
+        for row in (0, 10, len(approaches) - 1):
+            approach, expected = self.mapped[row], approaches[row]
+            self.assertEqual(approach.neo.designation, expected._designation)
+            self.assertEqual(approach.time, expected.time)
+            self.assertEqual(approach.distance, expected.distance)
+            self.assertEqual(approach.velocity, expected.velocity)
+        self.assertEqual(len(self.mapped.extras['jd']), len(approaches))
+
+    def test_rows_are_built_once(self):
+        self.assertIs(self.mapped[3], self.mapped[3])
+
+    def test_built_approaches_are_cached_for_a_while(self):
+        with MappedApproaches(self.path, load_neos(TEST_NEO_FILE)) as mapped:
+            first = weakref.ref(mapped[0])
+            self.assertIs(mapped[0], first())
+            for row in range(1, CACHE_SIZE + 1):
+                mapped[row]
+            self.assertIsNone(first())
+
+    def test_approaches_of_looked_up_neos_are_kept(self):
+        neos = load_neos(TEST_NEO_FILE)
+        with MappedApproaches(self.path, neos) as mapped:
+            db = NEODatabase(neos, mapped)
+            neo = db.get_neo_by_designation('1865')
+            self.assertTrue(neo.approaches)
+            list(mapped)
+            received = [approach for approach in db.query()
+                        if approach.neo is neo]
+            self.assertEqual(len(received), len(neo.approaches))
+            self.assertTrue(all(approach is expected for approach, expected
+                                in zip(received, neo.approaches)))
+
+    def test_close_releases_the_map(self):
+        mapped = MappedApproaches(self.path, load_neos(TEST_NEO_FILE))
+        mapped.close()
+        mapped.close()
+        with self.assertRaises(ValueError):
+            mapped.columns.distances[0]
+
+    def test_queries_match_the_in_memory_database(self):
+        for criteria in ({}, {'date': datetime.date(2020, 3, 2)},
+                         {'distance_max': 0.1, 'velocity_min': 20},
+                         {'diameter_min': 0.123, 'hazardous': True}):
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                self.assertSameResults(self.db, filters)
+                self.assertEqual(self.db.count(filters),
+                                 self.memory.count(filters))
+
+    def test_neo_lookup_links_its_approaches(self):
+        neo = self.db.get_neo_by_designation('1865')
+        expected = self.memory.get_neo_by_designation('1865')
+        self.assertEqual(summaries(neo.approaches),
+                         summaries(expected.approaches))
+
+    def test_file_must_match_the_neos(self):
+        neos = load_neos(TEST_NEO_FILE)[1:]
+        with self.assertRaises(ApproachFileError):
+            MappedApproaches(self.path, neos)
+
+    def test_truncated_files_are_rejected(self):
+        data = self.path.read_bytes()
+        neos = load_neos(TEST_NEO_FILE)
+        for size in (0, 8, 100, len(data) - 1):
+            with self.subTest(size=size):
+                path = pathlib.Path(self.tmp.name) / 'truncated.bin'
+                path.write_bytes(data[:size])
+                with self.assertRaises(ApproachFileError):
+                    MappedApproaches(path, neos)
+
+    def test_missing_extra_values_are_nan(self):
+        self.assertTrue(all(isinstance(h, float)
+                            for h in self.mapped.extras['h']))
+        self.assertFalse(any(math.isnan(jd)
+                             for jd in self.mapped.extras['jd']))
+
+
+if __name__ == '__main__':
+    unittest.main()
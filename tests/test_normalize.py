@@ -0,0 +1,133 @@
+"""Check that filter sets are simplified without changing their matches.
+
+Bounds on the same attribute are merged into one interval, implied filters
+are dropped, and filter sets that can't match anything are detected before
+any approach is visited.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_normalize
+"""
+import datetime
+import operator
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from expressions import parse_expression
+from extract import load_neos, load_approaches
+from filters import (DistanceFilter, MaximumDistanceFilter,
+                     MinimumDistanceFilter, create_filters, normalize_filters)
+from sqlite_database import SQLiteNEODatabase, ingest
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE, summary
+
+
+D = datetime.date
+
+CONTRADICTIONS = (
+    {'start_date': D(2021, 1, 1), 'end_date': D(2020, 1, 1)},
+    {'distance_min': 0.5, 'distance_max': 0.1},
+    {'date': D(2020, 3, 2), 'start_date': D(2020, 3, 3)},
+    {'velocity_min': 30, 'velocity_max': 29.9, 'hazardous': True},
+)
+
+CRITERIA = (
+    {'date': D(2020, 3, 2), 'start_date': D(2020, 3, 1),
+     'end_date': D(2020, 3, 31)},
+    {'start_date': D(2020, 5, 1), 'end_date': D(2020, 5, 1)},
+    {'start_date': D(2020, 2, 1), 'end_date': D(2020, 4, 30),
+     'distance_min': 0.05, 'distance_max': 0.2},
+    {'velocity_min': 10, 'velocity_max': 20, 'diameter_min': 0.1,
+     'diameter_max': 1},
+)
+
+
+class TestNormalizeFilters(unittest.TestCase):
+    def test_tightest_bounds_are_kept(self):
+        loose, tight = MinimumDistanceFilter(0.1), MinimumDistanceFilter(0.2)
+        strict = DistanceFilter(operator.gt, 0.2)
+        upper = MaximumDistanceFilter(0.4)
+        self.assertEqual(normalize_filters([loose, upper, tight]),
+                         [tight, upper])
+        self.assertEqual(normalize_filters([tight, strict, loose]), [strict])
+
+    def test_equality_implies_bounds(self):
+        filters = create_filters(date=D(2020, 3, 2), start_date=D(2020, 3, 1),
+                                 end_date=D(2020, 3, 31))
+        self.assertEqual(normalize_filters(filters), filters[:1])
+
+    def test_contradictions(self):
+        for criteria in CONTRADICTIONS:
+            with self.subTest(**criteria):
+                self.assertIsNone(normalize_filters(create_filters(
+                    **criteria)))
+        self.assertIsNone(normalize_filters(
+            create_filters(hazardous=True) + create_filters(hazardous=False)))
+        self.assertIsNone(normalize_filters([
+            DistanceFilter(operator.gt, 0.1), DistanceFilter(operator.le,
+                                                             0.1)]))
+
+    def test_other_filters_are_kept(self):
+        tree = parse_expression("hazardous OR distance < 0.1")
+        filters = create_filters(velocity_min=5) + [tree]
+        self.assertEqual(normalize_filters(filters), filters)
+
+
+class TestNormalizedQueries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), cls.approaches)
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = pathlib.Path(cls.tmp.name) / 'neos.sqlite3'
+        ingest(TEST_NEO_FILE, TEST_CAD_FILE, path)
+        cls.sqlite = SQLiteNEODatabase(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sqlite.close()
+        cls.tmp.cleanup()
+
+    def test_contradictions_match_nothing(self):
+        for criteria in CONTRADICTIONS:
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                self.assertEqual(list(self.db.query(filters)), [])
+                self.assertEqual(self.db.count(filters), 0)
+                self.assertEqual(self.db.aggregate(filters)['count'], 0)
+                self.assertEqual(self.sqlite.count(filters), 0)
+                self.assertEqual(list(self.sqlite.query(filters)), [])
+
+    def test_queries_match_a_scan(self):
+        for criteria in CRITERIA:
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                expected = [summary(a) for a in self.approaches
+                            if all(f(a) for f in filters)]
+                self.assertTrue(expected)
+                self.assertEqual([summary(a) for a in self.db.query(filters)],
+                                 expected)
+                self.assertEqual(self.db.count(filters), len(expected))
+                self.assertEqual(self.sqlite.count(filters), len(expected))
+
+    def test_interval_checks(self):
+        columns = self.db._columns
+        for lower, upper in (
+                (DistanceFilter(operator.ge, 0.1),
+                 DistanceFilter(operator.lt, 0.2)),
+                (DistanceFilter(operator.gt, 0.1),
+                 DistanceFilter(operator.le, 0.2)),
+                (create_filters(start_date=D(2020, 3, 2))[0],
+                 create_filters(end_date=D(2020, 3, 3))[0])):
+            with self.subTest(lower=lower, upper=upper):
+                check = columns.interval_predicate(lower, upper)
+                self.assertEqual(
+                    [row for row in range(len(self.approaches))
+                     if check(row)],
+                    [row for row, a in enumerate(self.approaches)
+                     if lower(a) and upper(a)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+"""Check that paged queries resume where their previous page stopped.
+
+Reading every page of a query with `paginate` must return the same results,
+in the same order, as the query itself, on both backends - in internal order
+and sorted, with or without a sorted index - and resume tokens must be
+rejected when they belong to another query.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_pagination
+"""
+import datetime
+import pathlib
+import tempfile
+import unittest
+
+from cursors import TokenError
+from database import NEODatabase
+from expressions import parse_expression
+from extract import load_neos, load_approaches
+from filters import create_filters
+from sqlite_database import SQLiteNEODatabase, ingest
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE, summary
+
+
+QUERIES = [
+    {},
+    {'filters': create_filters(hazardous=True)},
+    {'filters': create_filters(distance_max=0.05, velocity_min=10)},
+    {'filters': [lambda approach: approach.velocity > 20]},
+    {'sort_by': 'velocity', 'descending': True},
+    {'filters': create_filters(distance_max=0.1), 'sort_by': 'distance'},
+    {'sort_by': 'diameter'},
+    {'sort_by': 'diameter', 'descending': True},
+    {'filters': create_filters(start_date=datetime.date(2020, 6, 1)),
+     'sort_by': 'time', 'descending': True},
+]
+
+# Queries whose filters translate to SQL with an OR.
+EXPRESSION = parse_expression("diameter > 0.3 OR distance < 0.02")
+OR_QUERIES = [
+    {'filters': [EXPRESSION]},
+    {'filters': [EXPRESSION], 'sort_by': 'distance'},
+    {'filters': [EXPRESSION], 'sort_by': 'velocity', 'descending': True},
+    {'filters': create_filters(hazardous=False) + [EXPRESSION],
+     'sort_by': 'diameter', 'descending': True},
+]
+
+# More pages than any query of the test data can fill.
+MAX_PAGES = 1000
+
+
+def read_pages(db, size, offset=0, **query):
+    pages, token = [], None
+    for _ in range(MAX_PAGES):
+        page, token = db.paginate(size=size, offset=offset, token=token,
+                                  **query)
+        pages.append([summary(approach) for approach in page])
+        if token is None:
+            return pages
+    raise AssertionError(f"The pages never end: {len(sum(pages, []))} "
+                         f"results in {MAX_PAGES} pages.")
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                              load_approaches(TEST_CAD_FILE))
+
+    def test_pages_match_the_query(self):
+        for query in QUERIES:
+            with self.subTest(**query):
+                expected = [summary(approach)
+                            for approach in self.db.query(**query)]
+                pages = read_pages(self.db, 700, **query)
+                self.assertEqual(sum(pages, []), expected)
+                self.assertTrue(all(len(page) == 700 for page in pages[:-1]))
+
+    def test_pages_of_or_expressions(self):
+        for query in OR_QUERIES:
+            with self.subTest(**query):
+                expected = [summary(approach)
+                            for approach in self.db.query(**query)]
+                self.assertEqual(sum(read_pages(self.db, 37, **query), []),
+                                 expected)
+
+    def test_first_page_with_offset(self):
+        query = {'filters': create_filters(hazardous=True),
+                 'sort_by': 'distance'}
+        expected = [summary(approach)
+                    for approach in self.db.query(**query)][25:]
+        self.assertEqual(sum(read_pages(self.db, 40, offset=25, **query), []),
+                         expected)
+
+    def test_resuming_doesnt_build_the_sorted_index(self):
+        filters = create_filters(distance_max=0.1)
+        for descending in (False, True):
+            with self.subTest(descending=descending):
+                expected = [summary(approach) for approach in self.db.query(
+                    filters, sort_by='velocity', descending=descending)]
+                pages = read_pages(self.db, 50, filters=filters,
+                                   sort_by='velocity', descending=descending)
+                self.assertEqual(sum(pages, []), expected)
+                self.assertNotIn('velocity', self.db._sorted_indexes)
+
+    def test_token_survives_appended_approaches(self):
+        approaches = load_approaches(TEST_CAD_FILE)
+        db = NEODatabase(load_neos(TEST_NEO_FILE), approaches[:3000])
+        filters = create_filters(distance_max=0.05)
+        first, token = db.paginate(filters, size=10)
+        db.append_approaches(approaches[3000:])
+        rest = []
+        while token is not None:
+            page, token = db.paginate(filters, size=100, token=token)
+            rest.extend(page)
+        self.assertEqual([summary(approach) for approach in first + rest],
+                         [summary(approach) for approach in db.query(filters)])
+
+    def test_rejects_tokens_of_other_queries(self):
+        _, token = self.db.paginate(create_filters(hazardous=True), size=5)
+        with self.assertRaises(TokenError):
+            self.db.paginate(create_filters(hazardous=False), size=5,
+                             token=token)
+        with self.assertRaises(TokenError):
+            self.db.paginate(size=5, token='not a token')
+
+    def test_rejects_empty_pages(self):
+        with self.assertRaises(ValueError):
+            self.db.paginate(size=0)
+
+
+class TestSQLitePagination(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        path = pathlib.Path(cls.directory.name) / 'neos.sqlite3'
+        ingest(TEST_NEO_FILE, TEST_CAD_FILE, path)
+        cls.db = SQLiteNEODatabase(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+        cls.directory.cleanup()
+
+    def test_pages_match_the_query(self):
+        for query in QUERIES:
+            with self.subTest(**query):
+                expected = [summary(approach)
+                            for approach in self.db.query(**query)]
+                pages = read_pages(self.db, 700, offset=3, **query)
+                self.assertEqual(sum(pages, []), expected[3:])
+
+    def test_pages_of_or_expressions(self):
+        for query in OR_QUERIES:
+            with self.subTest(**query):
+                expected = [summary(approach)
+                            for approach in self.db.query(**query)]
+                self.assertEqual(sum(read_pages(self.db, 37, **query), []),
+                                 expected)
+
+    def test_tokens_are_not_shared_between_backends(self):
+        memory = NEODatabase(load_neos(TEST_NEO_FILE),
+                             load_approaches(TEST_CAD_FILE))
+        _, token = memory.paginate(size=5)
+        with self.assertRaises(TokenError):
+            self.db.paginate(size=5, token=token)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Check that the parallel loader reads the same data as `extract`.
+
+The test data files are split into chunks on record boundaries, parsed on a
+small pool of processes, and compared with `load_neos` and `load_approaches`.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_parallel
+"""
+from contextlib import redirect_stderr
+import io
+import json
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from main import make_parser
+from parallel import approach_ranges, load_parallel, neo_ranges
+from tests.support import (TEST_NEO_FILE, TEST_CAD_FILE,
+                           MemoryDatabaseTestCase)
+
+
+class TestParallelLoading(MemoryDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.neos, cls.approaches = load_parallel(TEST_NEO_FILE, TEST_CAD_FILE,
+                                                 jobs=3)
+
+    def test_neos_match_the_csv_data(self):
+        self.assertEqual([repr(neo) for neo in self.neos],
+                         [repr(neo) for neo in load_neos(TEST_NEO_FILE)])
+
+    def test_approaches_match_the_json_data(self):
+        expected = load_approaches(TEST_CAD_FILE)
+        self.assertEqual(len(self.approaches), len(expected))
+        for approach, other in zip(self.approaches, expected):
+            self.assertEqual(approach.neo.designation, other._designation)
+            self.assertEqual(approach.minutes, other.minutes)
+            self.assertEqual(approach.distance, other.distance)
+            self.assertEqual(approach.velocity, other.velocity)
+
+    def test_chunks_cover_the_records(self):
+        with open(TEST_CAD_FILE, 'rb') as infile:
+            data = infile.read()
+        ranges = approach_ranges(TEST_CAD_FILE, 16)
+        self.assertEqual(len(ranges), 16)
+        for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(data[start:start + 1], b'[')
+        self.assertEqual(data[ranges[-1][1]:ranges[-1][1] + 1], b']')
+
+        _, ranges = neo_ranges(TEST_NEO_FILE, 7)
+        with open(TEST_NEO_FILE, 'rb') as infile:
+            data = infile.read()
+        for start, _ in ranges:
+            self.assertEqual(data[start - 1:start], b'\n')
+
+    def test_queries_match_the_in_memory_database(self):
+        db = NEODatabase(self.neos, self.approaches)
+        for criteria in ({}, {'distance_max': 0.1, 'velocity_min': 20},
+                         {'diameter_min': 0.123, 'hazardous': True}):
+            with self.subTest(**criteria):
+                self.assertSameResults(db, create_filters(**criteria))
+
+    def test_empty_data(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'cad.json'
+            with open(path, 'w') as outfile:
+                json.dump({'count': 0, 'data': [], 'fields': ['des']}, outfile)
+            neos, approaches = load_parallel(TEST_NEO_FILE, path, jobs=2)
+        self.assertEqual(len(approaches), 0)
+        self.assertEqual(len(neos), len(self.neos))
+
+    def test_jobs_must_not_be_negative(self):
+        parser = make_parser()[0]
+        self.assertEqual(parser.parse_args(['-j', '0', 'query']).jobs, 0)
+        with redirect_stderr(io.StringIO()) as errors:
+            with self.assertRaises(SystemExit):
+                parser.parse_args(['-j', '-2', 'query'])
+        self.assertIn('-j/--jobs', errors.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
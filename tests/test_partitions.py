@@ -0,0 +1,94 @@
+"""Check that date partitions are pruned and answer like the full database.
+
+The test close approaches are split into monthly partitions in a temporary
+directory. Queries over the partitions that a query's filters can match must
+return the same approaches as the in-memory database.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_partitions
+"""
+import datetime
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from extract import load_neos
+from filters import create_filters
+from mapped import ApproachFileError
+from partitions import (convert_partitions, load_partitions, read_manifest,
+                        select_partitions)
+from tests.support import (TEST_NEO_FILE, TEST_CAD_FILE,
+                           MemoryDatabaseTestCase)
+
+
+CRITERIA = (
+    {},
+    {'date': datetime.date(2020, 3, 2)},
+    {'start_date': datetime.date(2020, 4, 15),
+     'end_date': datetime.date(2020, 6, 10)},
+    {'end_date': datetime.date(2020, 1, 31), 'distance_max': 0.1},
+    {'start_date': datetime.date(2020, 11, 30), 'hazardous': True},
+)
+
+
+class TestPartitions(MemoryDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.directory = pathlib.Path(cls.tmp.name) / 'partitions'
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.manifest = convert_partitions(TEST_CAD_FILE, cls.neos,
+                                          cls.directory, by='month')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_manifest_covers_every_approach(self):
+        partitions = self.manifest['partitions']
+        self.assertEqual([p['name'] for p in partitions],
+                         [f"2020-{month:02d}" for month in range(1, 13)])
+        self.assertEqual(sum(p['count'] for p in partitions), 4700)
+        march = partitions[2]
+        self.assertEqual(march['min']['date'],
+                         datetime.date(2020, 3, 1).toordinal())
+        self.assertEqual(march['max']['date'],
+                         datetime.date(2020, 3, 31).toordinal())
+        self.assertLessEqual(march['min']['distance'],
+                             march['max']['distance'])
+
+    def test_date_filters_prune_partitions(self):
+        manifest = read_manifest(self.directory, self.neos)
+        filters = create_filters(start_date=datetime.date(2020, 4, 15),
+                                 end_date=datetime.date(2020, 6, 10))
+        self.assertEqual([p['name'] for p in select_partitions(manifest,
+                                                               filters)],
+                         ['2020-04', '2020-05', '2020-06'])
+        filters = create_filters(date=datetime.date(2021, 1, 1))
+        self.assertEqual(select_partitions(manifest, filters), [])
+
+    def test_queries_match_the_in_memory_database(self):
+        for criteria in CRITERIA:
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                db = NEODatabase(self.neos, load_partitions(
+                    self.directory, self.neos, filters))
+                expected = self.assertSameResults(db, filters)
+                self.assertEqual(db.count(filters), len(expected))
+
+    def test_no_matching_partition(self):
+        filters = create_filters(start_date=datetime.date(2030, 1, 1))
+        db = NEODatabase(self.neos, load_partitions(self.directory, self.neos,
+                                                    filters))
+        self.assertEqual(list(db.query(filters)), [])
+
+    def test_partitions_must_match_the_neos(self):
+        with self.assertRaises(ApproachFileError):
+            load_partitions(self.directory, load_neos(TEST_NEO_FILE)[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Check that filters applied while loading keep exactly the matching rows.
+
+The test data files are loaded with a collection of filters. The approaches
+that are kept must be those that a full database returns for the same
+filters, and the NEOs must be those that pass the NEO-level filters.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_preload
+"""
+import datetime
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches, prune_neos
+from filters import create_filters
+from tests.support import (TEST_NEO_FILE, TEST_CAD_FILE,
+                           MemoryDatabaseTestCase, summaries)
+
+
+CRITERIA = (
+    {'date': datetime.date(2020, 3, 2)},
+    {'start_date': datetime.date(2020, 4, 15),
+     'end_date': datetime.date(2020, 6, 10), 'velocity_min': 20},
+    {'distance_max': 0.05, 'velocity_max': 10},
+    {'diameter_min': 0.5, 'hazardous': True},
+    {'start_date': datetime.date(2020, 11, 1), 'hazardous': False,
+     'distance_min': 0.2},
+)
+
+
+class TestPreloadFilters(MemoryDatabaseTestCase):
+
+    def test_preloaded_database_matches_a_full_load(self):
+        for criteria in CRITERIA:
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                neos = load_neos(TEST_NEO_FILE, filters)
+                approaches = load_approaches(TEST_CAD_FILE, filters, neos)
+                expected = summaries(self.memory.query(filters))
+                self.assertEqual(len(approaches), len(expected))
+
+                db = NEODatabase(prune_neos(neos, approaches), approaches)
+                self.assertEqual(summaries(db.query()), expected)
+                self.assertEqual(db.count(filters), len(expected))
+
+    def test_neo_filters_drop_neos(self):
+        filters = create_filters(hazardous=True, diameter_max=1)
+        neos = load_neos(TEST_NEO_FILE, filters)
+        self.assertTrue(neos)
+        for neo in neos:
+            self.assertTrue(neo.hazardous)
+            self.assertLessEqual(neo.diameter, 1)
+
+    def test_neo_filters_need_neos(self):
+        filters = create_filters(hazardous=True)
+        self.assertEqual(len(load_approaches(TEST_CAD_FILE, filters)),
+                         len(load_approaches(TEST_CAD_FILE)))
+
+    def test_prune_neos(self):
+        neos = load_neos(TEST_NEO_FILE)
+        approaches = load_approaches(TEST_CAD_FILE, create_filters(
+            date=datetime.date(2020, 1, 1)))
+        pruned = prune_neos(neos, approaches)
+        self.assertEqual({neo.designation for neo in pruned},
+                         {approach._designation for approach in approaches})
+        self.assertLess(len(pruned), len(neos))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -591,5 +591,102 @@ class TestQuery(unittest.TestCase):
         self.assertEqual(expected, received, msg="Computed results do not match expected results.")
 
 
+class TestSortedQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+
+    def assertSortedBy(self, received, key, descending=False):
+        values = [key(approach) for approach in received]
+        known = [value for value in values if value == value]
+        self.assertEqual(known, sorted(known, reverse=descending))
+        # Missing values (unknown diameters) always come last.
+        self.assertEqual(values[:len(known)], known)
+
+    def test_query_top_k_closest(self):
+        filters = create_filters(hazardous=True)
+        expected = sorted((approach for approach in self.approaches
+                           if approach.neo.hazardous),
+                          key=lambda approach: approach.distance)[:10]
+
+        received = list(self.db.query(filters, sort_by='distance', limit=10))
+        self.assertEqual([a.distance for a in received],
+                         [a.distance for a in expected])
+
+    def test_query_sorted_without_limit_returns_all_matches(self):
+        filters = create_filters(start_date=datetime.date(2020, 6, 1))
+        received = list(self.db.query(filters, sort_by='velocity',
+                                      descending=True))
+        self.assertEqual(set(received), set(self.db.query(filters)))
+        self.assertSortedBy(received, lambda a: a.velocity, descending=True)
+
+    def test_query_sorted_by_diameter_puts_unknown_diameters_last(self):
+        for descending in (False, True):
+            received = list(self.db.query(sort_by='diameter',
+                                          descending=descending))
+            self.assertEqual(len(received), len(self.approaches))
+            self.assertSortedBy(received, lambda a: a.neo.diameter,
+                                descending)
+
+    def test_query_sorted_by_time_uses_the_time_index(self):
+        self.assertIn('time', self.db._sorted_indexes)
+        received = list(self.db.query(sort_by='time', descending=True,
+                                      limit=5))
+        expected = sorted(self.approaches, key=lambda a: a.time,
+                          reverse=True)[:5]
+        self.assertEqual([a.time for a in received][:5],
+                         [a.time for a in expected])
+
+    def test_query_sorted_index_matches_top_k(self):
+        db = NEODatabase(load_neos(TEST_NEO_FILE),
+                         load_approaches(TEST_CAD_FILE))
+        filters = create_filters(distance_max=0.1)
+        ranked = [a.velocity for a in db.query(filters, sort_by='velocity',
+                                                descending=True, limit=7)]
+        db.create_sorted_index('velocity')
+        indexed = [a.velocity for a in db.query(filters, sort_by='velocity',
+                                                descending=True)][:7]
+        self.assertEqual(indexed, ranked)
+
+    def test_query_ties_come_in_row_order(self):
+        # All the approaches of an NEO have the same diameter; a stable sort
+        # keeps them in row order, whichever the direction.
+        db = NEODatabase(load_neos(TEST_NEO_FILE),
+                         load_approaches(TEST_CAD_FILE))
+        filters = create_filters(diameter_min=0.5)
+        for indexed in (False, True):
+            if indexed:
+                db.create_sorted_index('diameter')
+            for descending in (False, True):
+                with self.subTest(indexed=indexed, descending=descending):
+                    expected = sorted(db.query(filters),
+                                      key=lambda a: a.neo.diameter,
+                                      reverse=descending)[:50]
+                    received = list(db.query(filters, sort_by='diameter',
+                                             descending=descending,
+                                             limit=50))
+                    self.assertEqual(received, expected)
+
+    def test_query_limit_and_offset(self):
+        filters = create_filters(distance_max=0.1)
+        for sort_by in (None, 'time', 'velocity'):
+            with self.subTest(sort_by=sort_by):
+                everything = list(self.db.query(filters, sort_by=sort_by))
+                for limit, offset in ((5, 0), (5, 3), (None, 7), (0, 7),
+                                      (4, len(everything) - 2)):
+                    received = list(self.db.query(filters, sort_by=sort_by,
+                                                  limit=limit, offset=offset))
+                    stop = offset + limit if limit else None
+                    self.assertEqual(received, everything[offset:stop])
+
+    def test_query_rejects_negative_limit_and_offset(self):
+        with self.assertRaises(ValueError):
+            self.db.query(limit=-1)
+        with self.assertRaises(ValueError):
+            self.db.query(offset=-1)
+
+
 if __name__ == '__main__':
     unittest.main()
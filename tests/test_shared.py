@@ -0,0 +1,118 @@
+"""Check that processes can query close approaches in shared memory.
+
+A database over a shared memory segment must answer queries and lookups like
+one loaded from the data files, from the process that created the segment or
+from any other process attached to it; the segment must be unlinked when its
+owner closes it, and only then.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_shared
+"""
+import multiprocessing
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from mapped import MappedApproaches, convert_approaches
+from shared import SegmentError, SharedApproaches, shared_memory
+from tests.support import (TEST_NEO_FILE, TEST_CAD_FILE,
+                           MemoryDatabaseTestCase, summary)
+
+
+CRITERIA = (
+    {},
+    {'hazardous': True, 'distance_max': 0.1},
+    {'diameter_min': 0.5},
+    {'velocity_min': 20, 'velocity_max': 30},
+)
+
+
+def details(approach):
+    return summary(approach) + (approach.neo.name, str(approach.neo.diameter),
+                                approach.neo.hazardous)
+
+
+def count_hazardous(name):
+    approaches = SharedApproaches.attach(name)
+    try:
+        database = NEODatabase(approaches.neos, approaches)
+        return database.count(create_filters(hazardous=True))
+    finally:
+        approaches.close()
+
+
+@unittest.skipIf(shared_memory is None, "Shared memory needs Python 3.8.")
+class TestSharedApproaches(MemoryDatabaseTestCase):
+    def setUp(self):
+        self.shared = SharedApproaches.create(load_neos(TEST_NEO_FILE),
+                                              load_approaches(TEST_CAD_FILE))
+        self.addCleanup(self.shared.close)
+
+    def assertSameDetails(self, db):
+        for criteria in CRITERIA:
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                self.assertEqual(
+                    [details(approach) for approach in db.query(filters)],
+                    [details(approach)
+                     for approach in self.memory.query(filters)])
+
+    def test_attached_database_matches(self):
+        attached = SharedApproaches.attach(self.shared.name)
+        self.addCleanup(attached.close)
+        db = NEODatabase(attached.neos, attached)
+        self.assertSameDetails(db)
+        neo = db.get_neo_by_designation('2020 BP13')
+        self.assertEqual(len(neo.approaches), len(
+            self.memory.get_neo_by_designation('2020 BP13').approaches))
+
+    def test_created_from_mapped_approaches(self):
+        neos = load_neos(TEST_NEO_FILE)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = pathlib.Path(directory.name) / 'cad.bin'
+        convert_approaches(TEST_CAD_FILE, neos, path)
+        mapped = MappedApproaches(path, neos)
+        with SharedApproaches.create(neos, mapped) as shared:
+            self.assertSameDetails(NEODatabase(shared.neos, shared))
+
+    def test_other_processes_attach(self):
+        with multiprocessing.Pool(2) as pool:
+            counts = pool.map(count_hazardous, [self.shared.name] * 2)
+        expected = self.memory.count(create_filters(hazardous=True))
+        self.assertEqual(counts, [expected, expected])
+        # Detaching from the workers left the segment in place.
+        SharedApproaches.attach(self.shared.name).close()
+
+    def test_appending_doesnt_change_the_segment(self):
+        attached = SharedApproaches.attach(self.shared.name)
+        self.addCleanup(attached.close)
+        db = NEODatabase(attached.neos, attached)
+        db.append_approaches(load_approaches(TEST_CAD_FILE)[:10])
+        self.assertEqual(db.count(), len(self.shared) + 10)
+        self.assertSameDetails(NEODatabase(self.shared.neos, self.shared))
+
+    def test_owner_unlinks_the_segment(self):
+        name = self.shared.name
+        attached = SharedApproaches.attach(name)
+        attached.close()
+        SharedApproaches.attach(name).close()
+        self.shared.close()
+        self.shared.close()
+        with self.assertRaises(FileNotFoundError):
+            SharedApproaches.attach(name)
+
+    def test_rejects_other_segments(self):
+        segment = shared_memory.SharedMemory(create=True, size=64)
+        self.addCleanup(segment.unlink)
+        self.addCleanup(segment.close)
+        with self.assertRaises(SegmentError):
+            SharedApproaches.attach(segment.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
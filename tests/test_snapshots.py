@@ -0,0 +1,130 @@
+"""Check that queries read a consistent snapshot while approaches are appended.
+
+A query, or a database pinned with `snapshot`, must keep answering from the
+approaches present when it started, with the same results as a database built
+from those approaches alone, even while other threads append approaches; and
+the snapshots must be freed once no query reads them anymore.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_snapshots
+"""
+import threading
+import unittest
+import weakref
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE, summary
+
+
+# The first approaches are loaded; the others are appended.
+SPLIT = 3000
+
+QUERIES = (
+    {},
+    {'filters': create_filters(hazardous=True)},
+    {'filters': create_filters(distance_max=0.1, velocity_min=10),
+     'sort_by': 'distance'},
+    {'sort_by': 'time', 'descending': True, 'limit': 50},
+)
+
+
+def results(db, **query):
+    return [summary(approach) for approach in db.query(**query)]
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.approaches = load_approaches(TEST_CAD_FILE)
+        self.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                              self.approaches[:SPLIT])
+        self.db.create_sorted_index('distance')
+        self.expected = NEODatabase(load_neos(TEST_NEO_FILE),
+                                    load_approaches(TEST_CAD_FILE)[:SPLIT])
+
+    def test_query_doesnt_see_later_appends(self):
+        for query in QUERIES:
+            with self.subTest(**query):
+                db = NEODatabase(load_neos(TEST_NEO_FILE),
+                                 load_approaches(TEST_CAD_FILE)[:SPLIT])
+                stream = db.query(**query)
+                first = next(stream)
+                db.append_approaches(load_approaches(TEST_CAD_FILE)[SPLIT:])
+                received = [summary(first)] + [summary(approach)
+                                               for approach in stream]
+                self.assertEqual(received, results(self.expected, **query))
+
+    def test_pinned_snapshot(self):
+        snapshot = self.db.snapshot()
+        self.assertIs(snapshot.snapshot(), snapshot)
+        self.db.append_approaches(self.approaches[SPLIT:])
+        self.assertEqual(self.db.count(), len(self.approaches))
+        self.assertEqual(snapshot.count(), SPLIT)
+        for query in QUERIES:
+            with self.subTest(**query):
+                self.assertEqual(results(snapshot, **query),
+                                 results(self.expected, **query))
+        self.assertEqual(snapshot.aggregate(), self.expected.aggregate())
+
+    def test_appending_to_a_snapshot_appends_to_the_database(self):
+        snapshot = self.db.snapshot()
+        snapshot.append_approaches(self.approaches[SPLIT:SPLIT + 10])
+        self.assertEqual(snapshot.count(), SPLIT)
+        self.assertEqual(self.db.count(), SPLIT + 10)
+
+    def test_sorted_index_of_a_snapshot(self):
+        snapshot = self.db.snapshot()
+        self.db.append_approaches(self.approaches[SPLIT:])
+        snapshot.create_sorted_index('velocity')
+        self.assertIn('velocity', snapshot._sorted_indexes)
+        self.assertNotIn('velocity', self.db._sorted_indexes)
+        self.assertEqual(results(snapshot, sort_by='velocity'),
+                         results(self.expected, sort_by='velocity'))
+
+    def test_readers_during_ingest(self):
+        filters = create_filters(distance_max=0.1, velocity_min=10)
+        received, errors = [], []
+
+        def read():
+            try:
+                for _ in range(20):
+                    snapshot = self.db.snapshot()
+                    received.append((snapshot._size, results(
+                        snapshot, filters=filters, sort_by='distance')))
+            except Exception as err:
+                errors.append(err)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for start in range(SPLIT, len(self.approaches), 100):
+            self.db.append_approaches(self.approaches[start:start + 100])
+        for reader in readers:
+            reader.join()
+
+        self.assertEqual(errors, [])
+        expected = {}
+        for size, rows in received:
+            if size not in expected:
+                db = NEODatabase(load_neos(TEST_NEO_FILE),
+                                 load_approaches(TEST_CAD_FILE)[:size])
+                expected[size] = results(db, filters=filters,
+                                         sort_by='distance')
+            self.assertEqual(rows, expected[size])
+
+    def test_old_snapshots_are_freed(self):
+        first = weakref.ref(self.db._snapshot)
+        stream = self.db.query()
+        next(stream)
+        self.db.append_approaches(self.approaches[SPLIT:SPLIT + 10])
+        self.assertEqual(self.db._snapshot.version, 1)
+        self.assertIsNotNone(first())
+        self.assertEqual(len(list(stream)), SPLIT - 1)
+        del stream
+        self.assertIsNone(first())
+
+
+if __name__ == '__main__':
+    unittest.main()
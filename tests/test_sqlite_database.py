@@ -0,0 +1,151 @@
+"""Check that the SQLite backend answers like the in-memory `NEODatabase`.
+
+The test data files are ingested into a temporary SQLite file, and every
+lookup, query, count and summary is compared with the in-memory database.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_sqlite_database
+"""
+import datetime
+import json
+import pathlib
+import sqlite3
+import tempfile
+import unittest
+
+from expressions import parse_expression
+from extract import load_approaches
+from filters import create_filters
+from sqlite_database import SQLiteNEODatabase, ingest
+from tests.support import (TEST_NEO_FILE, TEST_CAD_FILE,
+                           MemoryDatabaseTestCase, summaries)
+
+
+CRITERIA = (
+    {},
+    {'date': datetime.date(2020, 3, 2)},
+    {'start_date': datetime.date(2020, 4, 1),
+     'end_date': datetime.date(2020, 6, 30)},
+    {'distance_max': 0.1, 'velocity_min': 20},
+    {'diameter_min': 0.5, 'diameter_max': 1.5},
+    {'hazardous': True, 'distance_max': 0.3},
+    {'hazardous': False, 'start_date': datetime.date(2020, 12, 1)},
+)
+
+
+class TestSQLiteDatabase(MemoryDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        db_path = pathlib.Path(cls.tmp.name) / 'neos.sqlite3'
+        ingest(TEST_NEO_FILE, TEST_CAD_FILE, db_path)
+        cls.sqlite = SQLiteNEODatabase(db_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sqlite.close()
+        cls.tmp.cleanup()
+
+    def test_get_neo_by_designation(self):
+        for designation in ('1865', '2101', '2020 BS', 'not-real'):
+            expected = self.memory.get_neo_by_designation(designation)
+            received = self.sqlite.get_neo_by_designation(designation)
+            self.assertEqual(repr(received), repr(expected))
+        neo = self.sqlite.get_neo_by_designation('1865')
+        expected = self.memory.get_neo_by_designation('1865')
+        self.assertEqual(summaries(neo.approaches),
+                         summaries(expected.approaches))
+
+    def test_get_neo_by_name(self):
+        for name in ('Lemmon', 'Jormungandr', 'not-real-name', ''):
+            self.assertEqual(repr(self.sqlite.get_neo_by_name(name)),
+                             repr(self.memory.get_neo_by_name(name)))
+
+    def test_query_and_count(self):
+        for criteria in CRITERIA:
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                expected = self.assertSameResults(self.sqlite, filters)
+                self.assertEqual(self.sqlite.count(filters), len(expected))
+
+    def test_expression_combined_with_other_filters(self):
+        tree = parse_expression("diameter > 0.3 OR distance < 0.02")
+        for criteria in ({'hazardous': False}, {'velocity_min': 10}):
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria) + [tree]
+                expected = self.assertSameResults(self.sqlite, filters)
+                self.assertEqual(self.sqlite.count(filters), len(expected))
+
+    def test_sorted_query(self):
+        filters = create_filters(hazardous=True)
+        for sort_by in ('distance', 'diameter'):
+            self.assertSameResults(self.sqlite, filters, sort_by=sort_by,
+                                   descending=True, limit=50)
+
+    def test_query_limit_and_offset(self):
+        for filters in (create_filters(hazardous=True),
+                        [lambda approach: approach.distance < 0.1]):
+            for sort_by in (None, 'distance'):
+                expected = self.assertSameResults(
+                    self.sqlite, filters, sort_by=sort_by, limit=4, offset=6)
+                self.assertEqual(len(expected), 4)
+
+    def test_results_share_their_neo(self):
+        neos = {approach.neo.designation: approach.neo
+                for approach in self.sqlite.query()}
+        for approach in self.sqlite.query():
+            self.assertIs(approach.neo, neos[approach.neo.designation])
+
+    def test_aggregate(self):
+        filters = create_filters(distance_max=0.2)
+        for group_by in (None, 'month', 'hazardous'):
+            expected = self.memory.aggregate(filters, group_by,
+                                             ('count', 'neos', 'max_velocity'))
+            received = self.sqlite.aggregate(filters, group_by,
+                                             ('count', 'neos', 'max_velocity'))
+            self.assertEqual(received, expected)
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = pathlib.Path(self.tmp.name)
+        self.db_path = self.directory / 'neos.sqlite3'
+        # An NEO file with a duplicate NEO, and an approach file whose last
+        # approach has an invalid distance.
+        lines = TEST_NEO_FILE.read_text().splitlines(keepends=True)
+        self.neo_file = self.directory / 'neos.csv'
+        self.neo_file.write_text(''.join(lines + lines[-1:]))
+        data = json.loads(TEST_CAD_FILE.read_text())
+        data['data'][-1][4] = 'far'
+        self.cad_file = self.directory / 'cad.json'
+        self.cad_file.write_text(json.dumps(data))
+        self.broken = ((self.neo_file, TEST_CAD_FILE),
+                       (TEST_NEO_FILE, self.cad_file))
+
+    def test_failed_ingest_leaves_no_database(self):
+        for neo_file, cad_file in self.broken:
+            with self.subTest(neo_file=neo_file.name, cad_file=cad_file.name):
+                with self.assertRaises((ValueError, sqlite3.Error)):
+                    ingest(neo_file, cad_file, self.db_path)
+                self.assertEqual(sorted(self.directory.iterdir()),
+                                 [self.cad_file, self.neo_file])
+
+    def test_failed_ingest_keeps_the_previous_database(self):
+        ingest(TEST_NEO_FILE, TEST_CAD_FILE, self.db_path)
+        for neo_file, cad_file in self.broken:
+            with self.subTest(neo_file=neo_file.name, cad_file=cad_file.name):
+                with self.assertRaises((ValueError, sqlite3.Error)):
+                    ingest(neo_file, cad_file, self.db_path)
+                self.assertEqual(sorted(self.directory.iterdir()),
+                                 [self.cad_file, self.neo_file, self.db_path])
+                db = SQLiteNEODatabase(self.db_path)
+                self.addCleanup(db.close)
+                self.assertEqual(db.count(),
+                                 len(load_approaches(TEST_CAD_FILE)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""Check that standing queries receive the matching appended approaches.
+
+Each subscription must receive exactly the new approaches that a query with
+its filters would return among them, through a callback or an asyncio
+queue, while each distinct filter is evaluated once per append.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_subscriptions
+"""
+import asyncio
+import unittest
+
+from database import NEODatabase
+from expressions import parse_expression
+from extract import load_neos, load_approaches
+from filters import create_filters
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE, summary
+
+
+# The first approaches are loaded; the others are appended in two batches.
+SPLIT = 3000
+
+CRITERIA = (
+    {'hazardous': True, 'distance_max': 0.05},
+    {'hazardous': True},
+    {'distance_max': 0.05, 'velocity_min': 10},
+    {},
+)
+
+
+class TestSubscriptions(unittest.TestCase):
+    def setUp(self):
+        self.approaches = load_approaches(TEST_CAD_FILE)
+        self.db = NEODatabase(load_neos(TEST_NEO_FILE),
+                              self.approaches[:SPLIT])
+        self.full = NEODatabase(load_neos(TEST_NEO_FILE),
+                                load_approaches(TEST_CAD_FILE))
+
+    def test_callbacks_receive_new_matches(self):
+        received = {}
+        for criteria in CRITERIA:
+            key = tuple(sorted(criteria.items()))
+            received[key] = []
+            self.db.subscribe(create_filters(**criteria),
+                              received[key].extend)
+        self.db.append_approaches(self.approaches[SPLIT:SPLIT + 800])
+        self.db.append_approaches(self.approaches[SPLIT + 800:])
+
+        new = {summary(approach)
+               for approach in self.approaches[SPLIT:]}
+        for criteria in CRITERIA:
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                expected = [summary(approach)
+                            for approach in self.full.query(filters)
+                            if summary(approach) in new]
+                received_here = [summary(approach) for approach in
+                                 received[tuple(sorted(criteria.items()))]]
+                self.assertEqual(received_here, expected)
+
+    def test_existing_rows_are_not_delivered(self):
+        received = []
+        self.db.subscribe(create_filters(hazardous=True), received.extend)
+        self.db.append_approaches([])
+        self.assertEqual(received, [])
+
+    def test_shared_filters_are_evaluated_once(self):
+        calls = []
+
+        def counted(approach):
+            calls.append(approach)
+            return approach.velocity > 10
+        for _ in range(5):
+            self.db.subscribe([counted], lambda approaches: None)
+        self.db.append_approaches(self.approaches[SPLIT:SPLIT + 100])
+        self.assertEqual(len(calls), 100)
+
+    def test_unsubscribe(self):
+        received = []
+        subscription = self.db.subscribe([], received.extend)
+        self.db.append_approaches(self.approaches[SPLIT:SPLIT + 10])
+        self.db.unsubscribe(subscription)
+        self.db.unsubscribe(subscription)
+        self.db.append_approaches(self.approaches[SPLIT + 10:SPLIT + 20])
+        self.assertEqual(len(received), 10)
+        self.assertEqual(subscription.delivered, 10)
+        self.assertFalse(subscription.active)
+
+    def test_failing_callback_doesnt_stop_the_append(self):
+        received = []
+
+        def fail(approaches):
+            raise RuntimeError("unreachable pager")
+        self.db.subscribe([], fail)
+        self.db.subscribe([], received.extend)
+        with self.assertLogs('subscriptions', 'ERROR'):
+            self.assertEqual(self.db.append_approaches(
+                self.approaches[SPLIT:SPLIT + 5]), 5)
+        self.assertEqual(len(received), 5)
+
+    def test_contradictions_never_match(self):
+        received = []
+        self.db.subscribe(create_filters(distance_min=0.3, distance_max=0.1),
+                          received.extend)
+        self.db.append_approaches(self.approaches[SPLIT:])
+        self.assertEqual(received, [])
+
+    def test_asyncio_queue(self):
+        tree = parse_expression('hazardous OR distance < 0.01')
+
+        async def run():
+            queue = asyncio.Queue()
+            self.db.subscribe([tree], queue)
+            self.db.append_approaches(self.approaches[SPLIT:])
+            matches = []
+            while not queue.empty():
+                matches.append(await queue.get())
+            return matches
+
+        loop = asyncio.new_event_loop()
+        try:
+            matches = loop.run_until_complete(run())
+        finally:
+            loop.close()
+        expected = [approach for approach in self.approaches[SPLIT:]
+                    if tree(approach)]
+        self.assertTrue(expected)
+        self.assertEqual(matches, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
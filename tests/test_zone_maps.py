@@ -0,0 +1,103 @@
+"""Check that zone maps skip blocks of rows without changing any result.
+
+The test close approaches are in time order, so each block of rows covers a
+short range of days and date filters rule out nearly every block. Queries
+must match a plain scan of the approaches, whether blocks are skipped or not.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_zone_maps
+"""
+import datetime
+import operator
+import unittest
+
+from columns import ApproachColumns
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from indexes import ZoneMap, iter_rows, range_match
+from tests.support import TEST_NEO_FILE, TEST_CAD_FILE, summary
+
+
+CRITERIA = (
+    {'date': datetime.date(2020, 3, 2)},
+    {'start_date': datetime.date(2020, 4, 15),
+     'end_date': datetime.date(2020, 6, 10)},
+    {'start_date': datetime.date(2020, 11, 30), 'distance_max': 0.1},
+    {'end_date': datetime.date(2020, 1, 5), 'hazardous': True},
+    {'distance_max': 0.01, 'velocity_min': 20},
+    {'diameter_min': 0.5},
+)
+
+
+class TestZoneMaps(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+        cls.rows = {neo.designation: row for row, neo in enumerate(cls.neos)}
+        cls.columns = ApproachColumns.from_approaches(cls.approaches,
+                                                      cls.neos, cls.rows)
+
+    def test_range_match(self):
+        self.assertEqual(range_match(operator.ge, 5, 5, 9), 'all')
+        self.assertEqual(range_match(operator.ge, 5, 1, 4), 'none')
+        self.assertEqual(range_match(operator.lt, 5, 1, 7), 'some')
+        self.assertEqual(range_match(operator.eq, 5, 5, 5), 'all')
+        self.assertEqual(range_match(operator.eq, 5, 6, 9), 'none')
+        self.assertEqual(range_match(operator.le, 5, None, None), 'none')
+        self.assertIsNone(range_match(operator.ne, 5, 1, 9))
+
+    def test_block_bounds(self):
+        zones = ZoneMap(self.columns, block_size=512)
+        self.assertEqual(len(zones.blocks), -(-len(self.approaches) // 512))
+        lows, highs = zones.blocks[1]
+        block = self.approaches[512:1024]
+        self.assertEqual(lows['date'], min(a.day for a in block))
+        self.assertEqual(highs['date'], max(a.day for a in block))
+        self.assertEqual(lows['distance'], min(a.distance for a in block))
+        self.assertEqual(highs['velocity'], max(a.velocity for a in block))
+
+    def test_date_filters_skip_blocks(self):
+        zones = ZoneMap(self.columns, block_size=64)
+        filters = create_filters(start_date=datetime.date(2020, 4, 15),
+                                 end_date=datetime.date(2020, 4, 20))
+        kept = list(iter_rows(zones.select(filters)))
+        self.assertLess(len(kept), len(self.approaches) // 10)
+        for f in filters:
+            exact, candidates = zones.select_filter(f)
+            self.assertEqual(exact & ~candidates, 0)
+            for row in iter_rows(exact):
+                self.assertTrue(f(self.approaches[row]))
+        for row, approach in enumerate(self.approaches):
+            if all(f(approach) for f in filters):
+                self.assertIn(row, kept)
+
+    def test_queries_match_a_scan(self):
+        for criteria in CRITERIA:
+            with self.subTest(**criteria):
+                filters = create_filters(**criteria)
+                expected = [summary(a) for a in self.approaches
+                            if all(f(a) for f in filters)]
+                self.assertEqual(
+                    [summary(a) for a in self.db.query(filters)], expected)
+                self.assertEqual(self.db.count(filters), len(expected))
+
+    def test_append_recomputes_the_last_block(self):
+        columns = ApproachColumns.from_approaches(self.approaches[:1000],
+                                                  self.neos, self.rows)
+        zones = ZoneMap(columns, block_size=512)
+        rest = self.approaches[1000:]
+        columns.extend([a.minutes for a in rest], [a.distance for a in rest],
+                       [a.velocity for a in rest],
+                       [self.columns.neo_rows[row]
+                        for row in range(1000, len(self.approaches))])
+        zones.append(columns, 1000)
+        self.assertEqual(zones.blocks,
+                         ZoneMap(self.columns, block_size=512).blocks)
+
+
+if __name__ == '__main__':
+    unittest.main()
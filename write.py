@@ -8,6 +8,11 @@ These functions are invoked by the main module with the output of the `limit`
 function and the filename supplied by the user at the command line. The file's
 extension determines which of these functions is used.
 
+Each of them formats the results first (with `approach_to_row` or
+`convert_results_to_dictionary`), then writes the formatted data (with
+`write_rows_to_csv` or `write_data_to_json`), so `query --explain analyze` can
+time the two stages separately.
+
 You'll edit this file in Part 4.
 """
 import csv
@@ -15,6 +20,41 @@ import json
 from helpers import datetime_to_str
 
 
+FIELDNAMES = (
+    'datetime_utc', 'distance_au', 'velocity_km_s',
+    'designation', 'name', 'diameter_km', 'potentially_hazardous'
+)
+
+
+def approach_to_row(approach):
+    """Format a `CloseApproach` as a row of CSV output.
+
+    :param approach: A `CloseApproach`.
+    :return: A list of values, in the order of `FIELDNAMES`.
+    """
+    return [datetime_to_str(approach.time),
+            approach.distance,
+            approach.velocity,
+            approach.neo.designation,
+            approach.neo.name if approach.neo.name else '',
+            approach.neo.diameter,
+            approach.neo.hazardous,
+            ]
+
+
+def write_rows_to_csv(rows, filename):
+    """Write rows formatted by `approach_to_row` to a CSV file.
+
+    :param rows: An iterable of lists of values.
+    :param filename: A Path-like object pointing to where the data should be
+    saved.
+    """
+    with open(filename, 'w') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(rows)
+
+
 def write_to_csv(results, filename):
     """Write an iterable of `CloseApproach` objects to a CSV file.
 
@@ -26,24 +66,7 @@ def write_to_csv(results, filename):
     :param filename: A Path-like object pointing to where the data should be
     saved.
     """
-    fieldnames = (
-        'datetime_utc', 'distance_au', 'velocity_km_s',
-        'designation', 'name', 'diameter_km', 'potentially_hazardous'
-    )
-
-    with open(filename, 'w') as outfile:
-        writer = csv.writer(outfile)
-        writer.writerow(fieldnames)
-        for approach in results:
-            new_row = [datetime_to_str(approach.time),
-                       approach.distance,
-                       approach.velocity,
-                       approach.neo.designation,
-                       approach.neo.name if approach.neo.name else '',
-                       approach.neo.diameter,
-                       approach.neo.hazardous,
-                       ]
-            writer.writerow(new_row)
+    write_rows_to_csv(map(approach_to_row, results), filename)
 
 
 def convert_results_to_dictionary(results):
@@ -80,7 +103,16 @@ def write_to_json(results, filename):
     :param filename: A Path-like object pointing to where the data should be
     saved.
     """
-    data = convert_results_to_dictionary(results)
+    write_data_to_json(convert_results_to_dictionary(results), filename)
+
+
+def write_data_to_json(data, filename):
+    """Write data formatted by `convert_results_to_dictionary` to a JSON file.
+
+    :param data: A list of dictionaries.
+    :param filename: A Path-like object pointing to where the data should be
+    saved.
+    """
     print(data)
     with open(filename, "w") as outfile:
         json.dump(data, outfile, indent=2)